@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""embeddings_* 테이블로부터 인프로세스 벡터 인덱스(FAISS) 재생성"""
+import sys
+sys.path.append('.')
+
+from database import SessionLocal
+from services.vector_index import vector_index
+
+def build_vector_index(table_names=None):
+    if not vector_index.enabled:
+        print("벡터 인덱스가 비활성화되어 있습니다. (VECTOR_INDEX_ENABLED=true, faiss 설치 필요)")
+        return
+
+    db = SessionLocal()
+    try:
+        counts = vector_index.rebuild(db, table_names)
+        for table_name, count in counts.items():
+            print(f'{table_name}: {count}개 청크')
+    except Exception as e:
+        print(f'오류 발생: {str(e)}')
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    build_vector_index(sys.argv[1:] or None)
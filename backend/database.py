@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -19,9 +20,43 @@ engine = create_engine(
     echo=False
 )
 
+@event.listens_for(engine, "connect")
+def _register_sync_vector_codec(dbapi_connection, connection_record):
+    """psycopg2 연결마다 pgvector 어댑터 등록 (NumPy 배열 바인딩, 결과를 float32 배열로 반환)"""
+    try:
+        from pgvector.psycopg2 import register_vector
+        register_vector(dbapi_connection)
+    except Exception as e:
+        # vector 확장이 아직 없는 데이터베이스 (init.sql 실행 전)
+        print(f"⚠️ pgvector 어댑터 등록 실패: {e}")
+        dbapi_connection.rollback()
+
 # 세션 팩토리 생성
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 비동기 엔진 (FastAPI 핸들러용, asyncpg 드라이버)
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    pool_pre_ping=True,
+    echo=False
+)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_codec(dbapi_connection, connection_record):
+    """asyncpg 연결마다 pgvector 타입 코덱 등록"""
+    from pgvector.asyncpg import register_vector
+    dbapi_connection.run_async(register_vector)
+
+# 비동기 세션 팩토리 생성
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base 클래스 생성
 Base = declarative_base()
 
@@ -33,6 +68,11 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """비동기 데이터베이스 세션 의존성"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def get_database_url():
     """데이터베이스 URL 반환"""
     return DATABASE_URL
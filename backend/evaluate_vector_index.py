@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""압축 벡터 인덱스(int8/binary)의 recall@k와 지연 시간을 원본 벡터 전수 검색과 비교"""
+import sys
+import json
+sys.path.append('.')
+
+from services.vector_index import vector_index
+
+def evaluate_vector_index(table_names, sample_size=100, k=10):
+    if not vector_index.enabled:
+        print("벡터 인덱스가 비활성화되어 있습니다. (VECTOR_INDEX_ENABLED=true, faiss 설치 필요)")
+        return
+
+    for table_name in table_names:
+        try:
+            report = vector_index.evaluate(table_name, sample_size, k)
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        except Exception as e:
+            print(f'{table_name}: {str(e)}')
+
+if __name__ == "__main__":
+    # 사용법: python evaluate_vector_index.py [테이블 ...] [--sample N] [--k K]
+    args = sys.argv[1:]
+    options = {"--sample": 100, "--k": 10}
+    for name in options:
+        if name in args:
+            position = args.index(name)
+            options[name] = int(args[position + 1])
+            del args[position:position + 2]
+    evaluate_vector_index(args or ["embeddings_text_embedding_3", "embeddings_qwen"],
+                          options["--sample"], options["--k"])
@@ -1,35 +1,56 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, JSON, TypeDecorator
+import numpy as np
+from typing import Optional
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, JSON, TypeDecorator, LargeBinary, Index
+from pgvector.sqlalchemy import Vector
 from sqlalchemy.sql import func
 from database import Base
 
-# VECTOR 타입을 직접 정의 (pgvector 호환)
+# ANN 인덱스용 축약 벡터 차원 (pgvector ivfflat/hnsw는 2000차원까지만 인덱싱)
+SHORT_EMBEDDING_DIM = 256
+
+def parse_vector(value) -> Optional[np.ndarray]:
+    """pgvector 값을 float32 배열로 변환 (드라이버 코덱 결과는 그대로, 텍스트는 NumPy로 한 번에 파싱)"""
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), sep=",", dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def truncate_embedding(value, dimension: int = SHORT_EMBEDDING_DIM) -> np.ndarray:
+    """앞쪽 dimension개 성분만 남기고 L2 정규화 (text-embedding-3의 dimensions 파라미터와 같은 방식)"""
+    vector = parse_vector(value)[:dimension]
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+# VECTOR 타입: pgvector.sqlalchemy.Vector(DDL, 반영, 거리 연산자)에 float32 NumPy 배열 바인딩/반환을 더함
+# 드라이버 코덱(database.py에서 등록)이 변환을 담당하며, asyncpg는 바이너리 프로토콜을 사용
+# halfvec/bit는 서버(pgvector 0.7+) 타입이라 클라이언트 버전과 관계없이 SQL 캐스트와 식 인덱스로 쓸 수 있음.
+# 컬럼은 재정렬 기준인 float32 원본으로 두고, 압축 표현은 init.sql의 인덱스와 검색 SQL에서 만든다.
 class VECTOR(TypeDecorator):
-    impl = Text
+    impl = Vector
     cache_ok = True
     
     def __init__(self, dimension=None, **kwargs):
         self.dimension = dimension
-        super().__init__(**kwargs)
+        super().__init__(dimension, **kwargs)
     
-    def load_dialect_impl(self, dialect):
-        if dialect.name == 'postgresql':
-            return dialect.type_descriptor(Text())
-        else:
-            return dialect.type_descriptor(Text())
+    def bind_processor(self, dialect):
+        # Vector.bind_processor는 값을 텍스트로 직렬화해 asyncpg 바이너리 코덱과 맞지 않으므로 배열을 그대로 넘김
+        def process(value):
+            return self.process_bind_param(value, dialect)
+        return process
     
     def process_bind_param(self, value, dialect):
-        if value is not None:
-            if isinstance(value, list):
-                return f"[{','.join(map(str, value))}]"
-            return str(value)
-        return value
+        if value is None:
+            return value
+        return np.asarray(value, dtype=np.float32)
     
     def process_result_value(self, value, dialect):
-        if value is not None:
-            # 벡터 문자열을 파싱하여 리스트로 변환
-            if isinstance(value, str) and value.startswith('[') and value.endswith(']'):
-                return [float(x.strip()) for x in value[1:-1].split(',')]
-        return value
+        return parse_vector(value)
 
 class User(Base):
     __tablename__ = "users"
@@ -58,31 +79,37 @@ class Policy(Base):
     file_path = Column(String(500))  # 원본 파일 경로
     created_at = Column(TIMESTAMP, server_default=func.now())
     security_level = Column(String(20))
+    content_hash = Column(String(64), index=True)  # 원본 파일 SHA-256 (동일 파일 재사용)
+    status = Column(String(20), nullable=False, server_default="ready")  # processing / ready / error
 
 class EmbeddingTextEmbedding3(Base):
     __tablename__ = "embeddings_text_embedding_3"
+    __table_args__ = (Index("uq_embeddings_text_embedding_3_policy_chunk", "policy_id", "chunk_index", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.policy_id"), nullable=False)
     chunk_text = Column(Text, nullable=False)
     embedding = Column(VECTOR(3072), nullable=False)
+    embedding_short = Column(VECTOR(SHORT_EMBEDDING_DIM))  # HNSW 1차 검색용 축약 벡터
     model = Column(String(100), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
 class EmbeddingQwen(Base):
     __tablename__ = "embeddings_qwen"
+    __table_args__ = (Index("uq_embeddings_qwen_policy_chunk", "policy_id", "chunk_index", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.policy_id"), nullable=False)
     chunk_text = Column(Text, nullable=False)
-    embedding = Column(VECTOR(4096), nullable=False)
+    embedding = Column(VECTOR(1024), nullable=False)  # 2000차원 이하라 원본 벡터에 바로 인덱싱
     model = Column(String(100), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
 class EmbeddingMultilingualE5(Base):
     __tablename__ = "embeddings_multilingual_e5"
+    __table_args__ = (Index("uq_embeddings_multilingual_e5_policy_chunk", "policy_id", "chunk_index", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.policy_id"), nullable=False)
@@ -94,6 +121,7 @@ class EmbeddingMultilingualE5(Base):
 
 class EmbeddingSnowflakeArctic(Base):
     __tablename__ = "embeddings_snowflake_arctic"
+    __table_args__ = (Index("uq_embeddings_snowflake_arctic_policy_chunk", "policy_id", "chunk_index", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.policy_id"), nullable=False)
@@ -103,6 +131,45 @@ class EmbeddingSnowflakeArctic(Base):
     chunk_index = Column(Integer, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+class ChunkEmbeddingCache(Base):
+    __tablename__ = "chunk_embedding_cache"
+    
+    model = Column(String(100), primary_key=True)
+    chunk_hash = Column(String(64), primary_key=True)  # 정규화된 청크 텍스트 SHA-256
+    embedding = Column(LargeBinary, nullable=False)  # float32 바이트
+    dimension = Column(Integer, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+class EmbeddingCheckpoint(Base):
+    __tablename__ = "embedding_checkpoints"
+    
+    policy_id = Column(Integer, ForeignKey("policies.policy_id"), primary_key=True)
+    model = Column(String(100), primary_key=True)
+    chunk_count = Column(Integer, nullable=False)
+    next_chunk_index = Column(Integer, nullable=False, default=0)  # 이 인덱스 전까지 처리(성공 또는 pending)
+    pending_chunks = Column(JSON, nullable=False, default=list)  # 실패해서 재처리가 필요한 chunk_index
+    status = Column(String(20), nullable=False)  # in_progress / pending / completed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    chunk_signature = Column(String(64))  # 청크 목록 SHA-256 (재개 시 같은 청킹 결과인지 확인)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+class IngestionJobRecord(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    job_id = Column(String(100), primary_key=True)  # workflow_id와 같음
+    job_type = Column(String(50), nullable=False)  # policy_upload / embedding_resume
+    priority = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False)  # 재시작 후 작업을 다시 만들 때 쓰는 인자
+    job_metadata = Column(JSON)
+    status = Column(String(20), nullable=False)  # queued / running / completed / error
+    policy_id = Column(Integer)
+    error_message = Column(Text)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())  # 실행 중에는 주기적으로 갱신
+
 class WorkflowLog(Base):
     __tablename__ = "workflow_logs"
     
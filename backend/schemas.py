@@ -38,6 +38,7 @@ class PolicyResponse(BaseModel):
     file_path: Optional[str]
     created_at: datetime
     security_level: Optional[str]
+    status: Optional[str] = None  # processing / ready / error
 
     class Config:
         from_attributes = True
@@ -47,6 +48,15 @@ class SearchRequest(BaseModel):
     policy_ids: Optional[List[int]] = None
     limit: int = 10
     security_level: str = "public"
+    # ANN 검색 튜닝 파라미터 (미지정 시 서버 기본값 사용)
+    candidate_k: Optional[int] = None
+    ivfflat_probes: Optional[int] = None
+    hnsw_ef_search: Optional[int] = None
+    # BM25 점수 융합 가중치 (0~1, 0이면 벡터 검색만 사용)
+    lexical_weight: Optional[float] = None
+
+class BatchSearchRequest(BaseModel):
+    requests: List[SearchRequest]
 
 class SearchResult(BaseModel):
     policy_id: int
@@ -58,6 +68,11 @@ class SearchResult(BaseModel):
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
+    # 배치 검색에서 이 요청만 실패한 경우의 오류 메시지
+    error: Optional[str] = None
+
+class BatchSearchResponse(BaseModel):
+    responses: List[SearchResponse]
 
 class WorkflowLogResponse(BaseModel):
     log_id: int
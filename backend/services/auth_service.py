@@ -1,7 +1,8 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User
 from schemas import UserCreate
 import os
@@ -26,10 +27,15 @@ class AuthService:
         """비밀번호 해싱"""
         return pwd_context.hash(password)
 
-    def create_user(self, user_data: UserCreate, db: Session) -> User:
+    async def _get_user_by_email(self, email: str, db: AsyncSession) -> User:
+        """이메일로 사용자 조회"""
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    async def create_user(self, user_data: UserCreate, db: AsyncSession) -> User:
         """사용자 생성"""
         # 이메일 중복 확인
-        existing_user = db.query(User).filter(User.email == user_data.email).first()
+        existing_user = await self._get_user_by_email(user_data.email, db)
         if existing_user:
             raise ValueError("Email already registered")
         
@@ -44,13 +50,13 @@ class AuthService:
         )
         
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         return user
 
-    def authenticate_user(self, email: str, password: str, db: Session) -> str:
+    async def authenticate_user(self, email: str, password: str, db: AsyncSession) -> str:
         """사용자 인증 및 토큰 생성"""
-        user = db.query(User).filter(User.email == email).first()
+        user = await self._get_user_by_email(email, db)
         if not user or not self.verify_password(password, user.password_hash):
             raise ValueError("Invalid credentials")
         
@@ -73,7 +79,7 @@ class AuthService:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
 
-    def verify_token(self, token: str, db: Session) -> User:
+    async def verify_token(self, token: str, db: AsyncSession) -> User:
         """토큰 검증"""
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -83,5 +89,5 @@ class AuthService:
         except JWTError:
             return None
         
-        user = db.query(User).filter(User.email == email).first()
+        user = await self._get_user_by_email(email, db)
         return user
@@ -0,0 +1,87 @@
+"""
+청크 임베딩 캐시 (모델별 청크 해시 → 임베딩, PostgreSQL 영구 저장)
+
+보험약관은 계약안내, 보험금 지급 조항, 특약 정의 등 공통 문구가 많아
+같은 청크를 약관마다 다시 임베딩하지 않도록 chunk_embedding_cache 테이블에 보관한다.
+"""
+import os
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from models import ChunkEmbeddingCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_EMBEDDING_CACHE_ENABLED = os.getenv("CHUNK_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+# IN 조회/INSERT 한 번에 처리하는 해시 수
+CHUNK_EMBEDDING_CACHE_LOOKUP_BATCH = int(os.getenv("CHUNK_EMBEDDING_CACHE_LOOKUP_BATCH", "500"))
+
+
+def chunk_hash(chunk: str) -> str:
+    """유니코드 정규화 + 공백 정리 후 SHA-256 (대소문자는 임베딩에 영향이 있으므로 유지)"""
+    normalized = " ".join(unicodedata.normalize("NFC", chunk).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """모델별 청크 임베딩 영구 캐시"""
+
+    def __init__(self, enabled: bool = CHUNK_EMBEDDING_CACHE_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, db: Session, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """캐시에 있는 해시의 임베딩 반환"""
+        found: Dict[str, List[float]] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        if self.enabled:
+            for i in range(0, len(unique_hashes), CHUNK_EMBEDDING_CACHE_LOOKUP_BATCH):
+                batch = unique_hashes[i:i + CHUNK_EMBEDDING_CACHE_LOOKUP_BATCH]
+                rows = db.query(ChunkEmbeddingCache.chunk_hash, ChunkEmbeddingCache.embedding).filter(
+                    ChunkEmbeddingCache.model == model,
+                    ChunkEmbeddingCache.chunk_hash.in_(batch)
+                ).all()
+                for row_hash, embedding in rows:
+                    found[row_hash] = np.frombuffer(embedding, dtype=np.float32).tolist()
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(unique_hashes) - len(found)
+        return found
+
+    def store(self, db: Session, model: str, embeddings: Dict[str, List[float]]):
+        """새로 만든 임베딩 저장 (커밋은 호출 측 트랜잭션에서)"""
+        if not self.enabled or not embeddings:
+            return
+        rows = [
+            {
+                "model": model,
+                "chunk_hash": key,
+                "embedding": np.asarray(embedding, dtype=np.float32).tobytes(),
+                "dimension": len(embedding),
+            }
+            for key, embedding in embeddings.items()
+        ]
+        for i in range(0, len(rows), CHUNK_EMBEDDING_CACHE_LOOKUP_BATCH):
+            db.execute(insert(ChunkEmbeddingCache).values(rows[i:i + CHUNK_EMBEDDING_CACHE_LOOKUP_BATCH])
+                       .on_conflict_do_nothing(index_elements=["model", "chunk_hash"]))
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# 서비스 간 공유 인스턴스
+chunk_embedding_cache = ChunkEmbeddingStore()
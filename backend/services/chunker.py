@@ -0,0 +1,221 @@
+"""
+약관 구조 기반 청킹 (장/조/항 경계 + 토큰 예산)
+
+조(條) 단위를 자르지 않고 토큰 예산까지 이어 붙이며, 장(章)이 바뀌면 새 청크를 시작한다.
+예산을 넘는 조는 항 단위로, 그래도 넘는 항은 줄/문자 구간으로 나눈다.
+토큰 수는 tiktoken(cl100k_base, text-embedding-3와 동일)으로 세고, 없으면 문자 수로 추정한다.
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "400"))
+# 예산 초과 구간을 문자 단위로 자를 때 앞 구간과 겹치는 토큰 수
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "cl100k_base")
+
+# _convert_to_markdown이 붙이는 '## ' 접두어는 무시
+CHAPTER_PATTERN = re.compile(r"^\s*(?:#+\s*)?제\s*\d+\s*(?:편|장|관)")
+ARTICLE_PATTERN = re.compile(r"^\s*(?:#+\s*)?제\s*\d+\s*조(?:의\s*\d+)?")
+PARAGRAPH_PATTERN = re.compile(r"^\s*(?:#+\s*)?(?:[①-⑳]|\(\d+\)|\d+\.\s)")
+LINE_PATTERN = re.compile(r"[^\n]*\n?")
+
+
+@dataclass
+class Chunk:
+    """청크와 원문 내 위치 (start/end는 입력 텍스트의 문자 오프셋)"""
+    index: int
+    text: str
+    start: int
+    end: int
+    token_count: int
+    heading: Optional[str] = None
+
+
+class TokenCounter:
+    """tiktoken 토큰 수 (미설치 시 한글 1자≈1토큰, 그 외 4자≈1토큰으로 추정)"""
+
+    def __init__(self, encoding_name: str = CHUNK_TOKENIZER):
+        self.encoding = None
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"⚠️ tiktoken을 사용할 수 없어 토큰 수를 추정합니다: {e}")
+
+    def count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+        others = sum(1 for ch in text if not ch.isspace()) - hangul
+        return hangul + (others + 3) // 4
+
+
+class _Section:
+    """조(또는 장 머리말/서문) 단위 구간과 그 안의 항 구간들"""
+
+    def __init__(self, start: int, chapter: bool, heading: Optional[str]):
+        self.start = start
+        self.end = start
+        self.chapter = chapter
+        self.heading = heading
+        self.blocks: List[List[int]] = [[start, start]]
+
+
+class PolicyChunker:
+    """장/조/항 구조를 따르는 토큰 예산 청커"""
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.counter = TokenCounter()
+
+    def split(self, text: str) -> List[Chunk]:
+        """텍스트를 청크 목록으로 분할"""
+        spans: List[Tuple[int, int, Optional[str]]] = []
+        current: Optional[List] = None  # [start, end, tokens, heading, 장 제목만 있는지]
+
+        def flush():
+            nonlocal current
+            if current is not None:
+                spans.append((current[0], current[1], current[3]))
+                current = None
+
+        for section in self._sections(text):
+            section_tokens = self.counter.count(text[section.start:section.end])
+            if section.chapter:
+                flush()
+            if section_tokens <= self.max_tokens:
+                if current is not None and current[2] + section_tokens > self.max_tokens:
+                    flush()
+                if current is None:
+                    current = [section.start, section.end, section_tokens, section.heading, section.chapter]
+                else:
+                    current[1] = section.end
+                    current[2] += section_tokens
+                    current[4] = False
+                continue
+
+            # 예산을 넘는 조: 항 단위로 이어 붙이고, 그래도 넘는 항은 다시 분할
+            # (장 제목만 모인 청크는 조 첫 부분과 합침)
+            if current is not None and not current[4]:
+                flush()
+            for block_start, block_end in section.blocks:
+                block_tokens = self.counter.count(text[block_start:block_end])
+                if block_tokens > self.max_tokens:
+                    flush()
+                    for piece_start, piece_end in self._split_oversized(text, block_start, block_end):
+                        spans.append((piece_start, piece_end, section.heading))
+                    continue
+                if current is not None and current[2] + block_tokens > self.max_tokens:
+                    flush()
+                if current is None:
+                    current = [block_start, block_end, block_tokens, section.heading, False]
+                else:
+                    current[1] = block_end
+                    current[2] += block_tokens
+                    current[4] = False
+        flush()
+
+        chunks: List[Chunk] = []
+        for start, end, heading in spans:
+            start, end = self._strip_span(text, start, end)
+            if start >= end:
+                continue
+            chunk_text = text[start:end]
+            chunks.append(Chunk(
+                index=len(chunks),
+                text=chunk_text,
+                start=start,
+                end=end,
+                token_count=self.counter.count(chunk_text),
+                heading=heading
+            ))
+        return chunks
+
+    def _sections(self, text: str) -> List[_Section]:
+        sections = [_Section(0, False, None)]
+        for match in LINE_PATTERN.finditer(text):
+            line_start, line_end = match.span()
+            if line_start == line_end:
+                continue
+            line = match.group()
+            if CHAPTER_PATTERN.match(line) or ARTICLE_PATTERN.match(line):
+                sections.append(_Section(line_start, bool(CHAPTER_PATTERN.match(line)),
+                                         line.strip().lstrip("#").strip()))
+            elif PARAGRAPH_PATTERN.match(line):
+                sections[-1].blocks.append([line_start, line_start])
+            sections[-1].end = line_end
+            sections[-1].blocks[-1][1] = line_end
+        return [section for section in sections if section.end > section.start]
+
+    def _split_oversized(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """예산을 넘는 구간을 줄 단위로 묶고, 한 줄이 넘으면 문자 구간(겹침 포함)으로 분할"""
+        pieces: List[Tuple[int, int]] = []
+        piece_start, piece_tokens = start, 0
+        for match in LINE_PATTERN.finditer(text, start, end):
+            line_start, line_end = match.span()
+            if line_start == line_end:
+                continue
+            line_tokens = self.counter.count(match.group())
+            if line_tokens > self.max_tokens:
+                if piece_start < line_start:
+                    pieces.append((piece_start, line_start))
+                pieces.extend(self._split_by_characters(text, line_start, line_end, line_tokens))
+                piece_start, piece_tokens = line_end, 0
+                continue
+            if piece_tokens + line_tokens > self.max_tokens and piece_start < line_start:
+                pieces.append((piece_start, line_start))
+                piece_start, piece_tokens = line_start, 0
+            piece_tokens += line_tokens
+        if piece_start < end:
+            pieces.append((piece_start, end))
+        return pieces
+
+    def _split_by_characters(self, text: str, start: int, end: int, tokens: int) -> List[Tuple[int, int]]:
+        chars_per_token = (end - start) / max(tokens, 1)
+        window = max(int(self.max_tokens * chars_per_token * 0.9), 1)
+        step = max(window - int(self.overlap_tokens * chars_per_token), 1)
+        pieces = []
+        for piece_start in range(start, end, step):
+            piece_end = min(piece_start + window, end)
+            pieces.append((piece_start, piece_end))
+            if piece_end == end:
+                break
+        return pieces
+
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+
+def summarize_chunks(chunks: List[Chunk]) -> dict:
+    """청킹 결과 요약 (로그용, 청크별 경계 대신 구조 단위 수와 토큰 분포만)
+
+    articles/chapters는 청크 머리말 기준으로 센 조/장 수이고, paragraph_chunks는
+    예산을 넘어 항 단위 이하로 나뉜 조에서 나온 청크 수다.
+    """
+    token_counts = [chunk.token_count for chunk in chunks]
+    chunks_per_heading = Counter(chunk.heading for chunk in chunks if chunk.heading)
+    return {
+        "chunk_count": len(chunks),
+        "chapters": sum(1 for heading in chunks_per_heading if CHAPTER_PATTERN.match(heading)),
+        "articles": sum(1 for heading in chunks_per_heading if ARTICLE_PATTERN.match(heading)),
+        "paragraph_chunks": sum(count for count in chunks_per_heading.values() if count > 1),
+        "min_tokens": min(token_counts, default=0),
+        "avg_tokens": round(sum(token_counts) / len(token_counts), 1) if token_counts else 0,
+        "max_tokens": max(token_counts, default=0),
+    }
+
+
+# 서비스 간 공유 인스턴스
+policy_chunker = PolicyChunker()
@@ -0,0 +1,188 @@
+"""
+쿼리 임베딩 캐시 (인프로세스 LRU + 선택적 SQLite 디스크 계층)
+
+키는 (모델명, 정규화된 쿼리)이며, 두 계층 모두 TTL을 적용한다.
+디스크 계층은 주기적으로 만료 행을 지우고, 행 수 상한을 넘으면 마지막 사용 시각 기준 LRU로 축출한다.
+SearchService와 SearchWorkflow가 같은 인스턴스를 공유한다.
+"""
+import os
+import time
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400"))
+# 지정 시 SQLite 파일을 2차 캐시로 사용 (프로세스 재시작/워커 간 공유)
+QUERY_EMBEDDING_CACHE_DB = os.getenv("QUERY_EMBEDDING_CACHE_DB")
+# 디스크 캐시 최대 행 수와 만료/축출 정리 주기(초)
+QUERY_EMBEDDING_CACHE_DB_MAX_ROWS = int(os.getenv("QUERY_EMBEDDING_CACHE_DB_MAX_ROWS", "100000"))
+QUERY_EMBEDDING_CACHE_DB_PRUNE_SECONDS = int(os.getenv("QUERY_EMBEDDING_CACHE_DB_PRUNE_SECONDS", "300"))
+
+
+def normalize_query(query: str) -> str:
+    """유니코드 정규화, 소문자화, 공백 정리"""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+class QueryEmbeddingCache:
+    """모델별 쿼리 임베딩 LRU/TTL 캐시"""
+
+    def __init__(
+        self,
+        max_size: int = QUERY_EMBEDDING_CACHE_SIZE,
+        ttl_seconds: int = QUERY_EMBEDDING_CACHE_TTL,
+        sqlite_path: Optional[str] = QUERY_EMBEDDING_CACHE_DB,
+        disk_max_rows: int = QUERY_EMBEDDING_CACHE_DB_MAX_ROWS
+    ):
+        self.max_size = max_size
+        self.disk_max_rows = disk_max_rows
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, embedding)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_evictions = 0
+        self.disk_expirations = 0
+        self.last_prune = 0.0
+
+        self.disk = None
+        if sqlite_path:
+            directory = os.path.dirname(sqlite_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.disk = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self.disk.execute("PRAGMA journal_mode=WAL")
+            self.disk.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "cache_key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created_at REAL NOT NULL, last_used REAL)"
+            )
+            columns = {row[1] for row in self.disk.execute("PRAGMA table_info(query_embeddings)")}
+            if "last_used" not in columns:
+                self.disk.execute("ALTER TABLE query_embeddings ADD COLUMN last_used REAL")
+                self.disk.execute("UPDATE query_embeddings SET last_used = created_at")
+            self.disk.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_created_at ON query_embeddings (created_at)")
+            self.disk.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used ON query_embeddings (last_used)")
+            self.disk.commit()
+            self._prune_disk(time.time())
+
+    @staticmethod
+    def _key(query: str, model: str) -> str:
+        return f"{model}\x00{normalize_query(query)}"
+
+    def get(self, query: str, model: str) -> Optional[List[float]]:
+        """캐시 조회 (메모리 → 디스크 순)"""
+        key = self._key(query, model)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.entries[key]
+                self.expirations += 1
+
+            if self.disk is not None:
+                row = self.disk.execute(
+                    "SELECT embedding, created_at FROM query_embeddings WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    embedding = np.frombuffer(row[0], dtype=np.float32).tolist()
+                    self._put_memory(key, row[1], embedding)
+                    self._touch_disk(key, now)
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def set(self, query: str, model: str, embedding: List[float]):
+        """캐시 저장 (메모리 + 디스크)"""
+        key = self._key(query, model)
+        now = time.time()
+        with self.lock:
+            self._put_memory(key, now, embedding)
+            if self.disk is not None:
+                try:
+                    self.disk.execute(
+                        "INSERT OR REPLACE INTO query_embeddings (cache_key, embedding, created_at, last_used) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, np.asarray(embedding, dtype=np.float32).tobytes(), now, now)
+                    )
+                    self.disk.commit()
+                except sqlite3.Error as e:
+                    print(f"쿼리 임베딩 디스크 캐시 저장 실패: {e}")
+                if now - self.last_prune >= QUERY_EMBEDDING_CACHE_DB_PRUNE_SECONDS:
+                    self._prune_disk(now)
+
+    def _touch_disk(self, key: str, now: float):
+        """디스크 LRU용 마지막 사용 시각 갱신"""
+        try:
+            self.disk.execute("UPDATE query_embeddings SET last_used = ? WHERE cache_key = ?", (now, key))
+            self.disk.commit()
+        except sqlite3.Error as e:
+            print(f"쿼리 임베딩 디스크 캐시 갱신 실패: {e}")
+
+    def _prune_disk(self, now: float):
+        """만료 행 삭제 후 행 수 상한을 넘는 만큼 오래 사용하지 않은 행부터 축출 (잠금 안에서 호출)"""
+        self.last_prune = now
+        try:
+            expired = self.disk.execute(
+                "DELETE FROM query_embeddings WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = self.disk.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0] - self.disk_max_rows
+            evicted = 0
+            if overflow > 0:
+                evicted = self.disk.execute(
+                    "DELETE FROM query_embeddings WHERE cache_key IN "
+                    "(SELECT cache_key FROM query_embeddings ORDER BY last_used LIMIT ?)", (overflow,)
+                ).rowcount
+            self.disk.commit()
+            self.disk_expirations += expired
+            self.disk_evictions += evicted
+        except sqlite3.Error as e:
+            print(f"쿼리 임베딩 디스크 캐시 정리 실패: {e}")
+
+    def _put_memory(self, key: str, created_at: float, embedding: List[float]):
+        self.entries[key] = (created_at, embedding)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """히트/미스/축출 통계"""
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            disk_size = None
+            if self.disk is not None:
+                disk_size = self.disk.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_size": disk_size,
+                "disk_max_rows": self.disk_max_rows if self.disk is not None else None,
+                "disk_evictions": self.disk_evictions,
+                "disk_expirations": self.disk_expirations,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# SearchService / SearchWorkflow 공유 인스턴스
+query_embedding_cache = QueryEmbeddingCache()
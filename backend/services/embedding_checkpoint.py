@@ -0,0 +1,113 @@
+"""
+임베딩 진행 체크포인트 (정책/모델별)
+
+청크를 그룹 단위로 임베딩 → 저장 → 커밋하면서 next_chunk_index를 전진시키고,
+실패한 청크는 더미 벡터 대신 pending_chunks로 남긴다. 재개 작업은 체크포인트와
+실제 저장된 chunk_index를 비교해 빠진 청크만 다시 임베딩한다. 청크 목록 서명이
+다르면(청커 설정이나 Markdown이 바뀐 경우) chunk_index가 다른 청크를 가리키므로
+재개하지 않고 전체를 다시 임베딩한다.
+"""
+import os
+import hashlib
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import select, text, or_, and_, func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import EmbeddingCheckpoint
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 체크포인트(커밋) 단위 청크 수
+EMBEDDING_CHECKPOINT_CHUNKS = int(os.getenv("EMBEDDING_CHECKPOINT_CHUNKS", "1000"))
+# in_progress 체크포인트가 이 시간(초) 동안 갱신되지 않으면 중단된 것으로 보고 재개 대상에 포함
+EMBEDDING_CHECKPOINT_STALE_SECONDS = int(os.getenv("EMBEDDING_CHECKPOINT_STALE_SECONDS", "1800"))
+
+
+def chunk_signature(chunks: List[str]) -> str:
+    """청크 목록 SHA-256 (청크 경계/순서가 같을 때만 일치)"""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(hashlib.sha256(chunk.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class EmbeddingCheckpointStore:
+    """embedding_checkpoints 테이블 접근"""
+
+    def start(self, db: Session, policy_id: int, model: str, chunk_count: int, resume: bool = False,
+              signature: Optional[str] = None) -> EmbeddingCheckpoint:
+        """체크포인트 생성 또는 재개 표시 (커밋은 호출 측)"""
+        checkpoint = db.get(EmbeddingCheckpoint, (policy_id, model))
+        if checkpoint is None:
+            checkpoint = EmbeddingCheckpoint(policy_id=policy_id, model=model, chunk_count=chunk_count,
+                                             next_chunk_index=0, pending_chunks=[], attempts=0)
+            db.add(checkpoint)
+        elif not resume:
+            checkpoint.chunk_count = chunk_count
+            checkpoint.next_chunk_index = 0
+            checkpoint.pending_chunks = []
+        checkpoint.chunk_signature = signature
+        checkpoint.status = "in_progress"
+        checkpoint.attempts = (checkpoint.attempts or 0) + 1
+        checkpoint.last_error = None
+        return checkpoint
+
+    def record(
+        self,
+        checkpoint: EmbeddingCheckpoint,
+        completed: Iterable[int],
+        failed: Iterable[int],
+        next_chunk_index: int,
+        error: Optional[str] = None
+    ):
+        """그룹 처리 결과 반영 (완료 청크는 pending에서 빼고, 실패 청크는 추가)"""
+        pending: Set[int] = set(checkpoint.pending_chunks or [])
+        pending.difference_update(completed)
+        pending.update(failed)
+        checkpoint.pending_chunks = sorted(pending)
+        checkpoint.next_chunk_index = max(checkpoint.next_chunk_index or 0, next_chunk_index)
+        if error:
+            checkpoint.last_error = error
+
+    def finish(self, checkpoint: EmbeddingCheckpoint):
+        checkpoint.status = "pending" if checkpoint.pending_chunks else "completed"
+
+    def for_policy(self, db: Session, policy_id: int) -> List[EmbeddingCheckpoint]:
+        return db.query(EmbeddingCheckpoint).filter(EmbeddingCheckpoint.policy_id == policy_id).all()
+
+    def copy(self, db: Session, checkpoints: List[EmbeddingCheckpoint], target_policy_id: int):
+        """임베딩을 복사한 정책에 원본 체크포인트 상태를 그대로 기록 (커밋은 호출 측)"""
+        for checkpoint in checkpoints:
+            db.merge(EmbeddingCheckpoint(
+                policy_id=target_policy_id, model=checkpoint.model, chunk_count=checkpoint.chunk_count,
+                next_chunk_index=checkpoint.next_chunk_index, pending_chunks=list(checkpoint.pending_chunks or []),
+                status=checkpoint.status, attempts=0, chunk_signature=checkpoint.chunk_signature
+            ))
+
+    async def pending_policy_ids(self, db: AsyncSession) -> List[int]:
+        """재개가 필요한 정책 ID (실패 청크가 남은 체크포인트, 오래 갱신되지 않은 in_progress 체크포인트,
+        체크포인트 도입 전 0 벡터 더미 행이 저장된 정책)
+
+        최근에 갱신된 in_progress 체크포인트는 다른 작업이 처리 중이므로 제외한다.
+        """
+        stale_before = func.now() - func.make_interval(0, 0, 0, 0, 0, 0, float(EMBEDDING_CHECKPOINT_STALE_SECONDS))
+        result = await db.execute(
+            select(EmbeddingCheckpoint.policy_id)
+            .where(or_(
+                EmbeddingCheckpoint.status == "pending",
+                and_(EmbeddingCheckpoint.status == "in_progress",
+                     or_(EmbeddingCheckpoint.updated_at.is_(None), EmbeddingCheckpoint.updated_at < stale_before))
+            ))
+            .distinct()
+        )
+        policy_ids = set(result.scalars().all())
+        legacy = await db.execute(text(
+            "SELECT DISTINCT policy_id FROM embeddings_text_embedding_3 WHERE vector_norm(embedding) = 0"
+        ))
+        policy_ids.update(legacy.scalars().all())
+        return sorted(policy_ids)
+
+
+# 서비스 간 공유 인스턴스
+embedding_checkpoints = EmbeddingCheckpointStore()
@@ -0,0 +1,386 @@
+"""
+임베딩 API 호출 스케줄러 (RPM/TPM 토큰 버킷 + 우선순위 큐)
+
+EmbeddingService(수집)와 SearchService(질의)가 같은 인스턴스를 공유한다.
+- 입력을 보낼 때마다 그때의 입력 수/토큰 상한으로 배치를 잘라내고, 요청/토큰 버킷이 허용할 때만 호출
+- 429의 retry-after를 지키는 동안 모든 워커가 대기하고, 배치 토큰 상한을 줄였다가 성공 시 회복
+- 워커는 용량이 생긴 뒤에 큐에서 꺼내므로 질의 임베딩(INTERACTIVE)이 대기 중인 수집 배치(BULK)를 앞지르고,
+  수집 배치는 OPENAI_EMBEDDING_INTERACTIVE_RESERVE개 워커를 질의용으로 남겨 둔다
+공급자는 교체 가능하며, EMBEDDING_PROVIDER=fake이면 로컬 가짜 공급자로 한도/재시도 동작을 확인할 수 있다.
+"""
+import os
+import time
+import asyncio
+import hashlib
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from dotenv import load_dotenv
+from services.chunker import TokenCounter
+
+load_dotenv()
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+OPENAI_EMBEDDING_DIMENSION = 3072
+
+# 공급자 한도 (분당 요청 수 / 분당 토큰 수)
+OPENAI_EMBEDDING_RPM = int(os.getenv("OPENAI_EMBEDDING_RPM", "3000"))
+OPENAI_EMBEDDING_TPM = int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))
+# 요청당 최대 입력 수 / 최대 토큰 수
+OPENAI_EMBEDDING_BATCH_SIZE = int(os.getenv("OPENAI_EMBEDDING_BATCH_SIZE", "256"))
+OPENAI_EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("OPENAI_EMBEDDING_MAX_BATCH_TOKENS", "20000"))
+OPENAI_EMBEDDING_CONCURRENCY = int(os.getenv("OPENAI_EMBEDDING_CONCURRENCY", "4"))
+# 수집 배치가 쓰지 못하게 질의용으로 남겨 두는 워커 수
+OPENAI_EMBEDDING_INTERACTIVE_RESERVE = int(os.getenv("OPENAI_EMBEDDING_INTERACTIVE_RESERVE", "1"))
+OPENAI_EMBEDDING_MAX_RETRIES = int(os.getenv("OPENAI_EMBEDDING_MAX_RETRIES", "3"))
+OPENAI_EMBEDDING_RETRY_DELAY = float(os.getenv("OPENAI_EMBEDDING_RETRY_DELAY", "1.0"))
+# 요청 타임아웃 = 기본값 + 1000토큰당 추가 시간
+OPENAI_EMBEDDING_TIMEOUT = float(os.getenv("OPENAI_EMBEDDING_TIMEOUT", "20"))
+OPENAI_EMBEDDING_TIMEOUT_PER_1K_TOKENS = float(os.getenv("OPENAI_EMBEDDING_TIMEOUT_PER_1K_TOKENS", "1.0"))
+
+# 우선순위 (작을수록 먼저)
+INTERACTIVE = 0
+BULK = 10
+
+
+class RateLimitedError(Exception):
+    """공급자 요청 한도 초과 (retry_after초 후 재시도)"""
+
+    def __init__(self, retry_after: float, message: str = ""):
+        super().__init__(message or f"rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class OpenAIEmbeddingProvider:
+    """OpenAI 임베딩 공급자 (재시도는 스케줄러가 담당)"""
+
+    model = OPENAI_EMBEDDING_MODEL
+
+    def __init__(self):
+        import openai
+        self.openai = openai
+        api_key = os.getenv("OPENAI_API_KEY")
+        self.client = None
+        if api_key and api_key != "your-openai-api-key-here":
+            self.client = openai.AsyncOpenAI(api_key=api_key, max_retries=0)
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    async def embed(self, inputs: List[str], timeout: float) -> List[List[float]]:
+        try:
+            response = await self.client.embeddings.create(model=self.model, input=inputs, timeout=timeout)
+        except self.openai.RateLimitError as e:
+            raise RateLimitedError(self._retry_after(e), str(e)) from e
+        return [data.embedding for data in response.data]
+
+    @staticmethod
+    def _retry_after(error) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        try:
+            return float(headers.get("retry-after", OPENAI_EMBEDDING_RETRY_DELAY))
+        except ValueError:
+            return OPENAI_EMBEDDING_RETRY_DELAY
+
+
+class FakeEmbeddingProvider:
+    """로컬 가짜 공급자: 해시 기반 결정적 벡터, 분당 한도를 넘으면 retry-after와 함께 429"""
+
+    model = OPENAI_EMBEDDING_MODEL
+
+    def __init__(
+        self,
+        dimension: int = OPENAI_EMBEDDING_DIMENSION,
+        rpm: int = OPENAI_EMBEDDING_RPM,
+        tpm: int = OPENAI_EMBEDDING_TPM,
+        latency: float = float(os.getenv("FAKE_EMBEDDING_LATENCY", "0.05"))
+    ):
+        self.dimension = dimension
+        self.rpm = rpm
+        self.tpm = tpm
+        self.latency = latency
+        self.counter = TokenCounter()
+        self.window: List[tuple] = []  # (시각, 토큰 수)
+        self.calls = 0
+        self.rejections = 0
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    async def embed(self, inputs: List[str], timeout: float) -> List[List[float]]:
+        now = time.monotonic()
+        self.window = [(at, tokens) for at, tokens in self.window if now - at < 60]
+        tokens = sum(self.counter.count(text) for text in inputs)
+        if len(self.window) + 1 > self.rpm or sum(t for _, t in self.window) + tokens > self.tpm:
+            self.rejections += 1
+            raise RateLimitedError(60 - (now - self.window[0][0]) if self.window else 1.0)
+        self.window.append((now, tokens))
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in inputs]
+
+    def _vector(self, text: str) -> List[float]:
+        seed = hashlib.sha256(text.encode("utf-8")).digest()
+        return [seed[i % len(seed)] / 255.0 for i in range(self.dimension)]
+
+
+class TokenBucket:
+    """분당 한도를 초당 보충량으로 바꾼 토큰 버킷"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """amount를 꺼내기까지 기다려야 하는 시간 (버킷보다 큰 요청은 가득 찰 때까지)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class _EmbedJob:
+    """embed/embed_many 호출 하나 (입력별 결과를 모아 모든 배치가 끝나면 완료)"""
+
+    def __init__(self, texts: List[str], tokens: List[int], future: asyncio.Future):
+        self.texts = texts
+        self.tokens = tokens
+        self.results: List[Optional[List[float]]] = [None] * len(texts)
+        self.errors: List[Exception] = []
+        self.remaining = len(texts)
+        self.future = future
+
+    def settle(self, start: int, end: int, embeddings: Optional[List[List[float]]] = None,
+               error: Optional[Exception] = None):
+        if error is None:
+            self.results[start:end] = embeddings
+        else:
+            self.errors.append(error)
+        self.remaining -= end - start
+        if self.remaining <= 0 and not self.future.done():
+            self.future.set_result(self)
+
+
+class _PendingRange:
+    """큐에 남은 작업 구간 [start, end) (배치는 보낼 때 그때의 상한으로 잘라냄)"""
+
+    def __init__(self, job: _EmbedJob, start: int, end: int, attempts: int = 0):
+        self.job = job
+        self.start = start
+        self.end = end
+        self.attempts = attempts
+
+
+class EmbeddingScheduler:
+    """공유 임베딩 호출 스케줄러"""
+
+    def __init__(self, provider=None):
+        if provider is None:
+            provider = FakeEmbeddingProvider() if EMBEDDING_PROVIDER == "fake" else OpenAIEmbeddingProvider()
+        self.provider = provider
+        self.counter = TokenCounter()
+        self.request_bucket = TokenBucket(OPENAI_EMBEDDING_RPM)
+        self.token_bucket = TokenBucket(OPENAI_EMBEDDING_TPM)
+        self.max_batch_tokens = OPENAI_EMBEDDING_MAX_BATCH_TOKENS
+        self.batch_token_limit = OPENAI_EMBEDDING_MAX_BATCH_TOKENS  # 429 시 줄었다가 성공 시 회복
+        # 수집 배치가 쓸 수 있는 워커 수 (나머지는 질의용으로 비워 둠)
+        self.bulk_slots = max(OPENAI_EMBEDDING_CONCURRENCY - OPENAI_EMBEDDING_INTERACTIVE_RESERVE, 1)
+        self.blocked_until = 0.0
+        self.lanes: Dict[int, Deque[_PendingRange]] = {}
+        self.wakeup: Optional[asyncio.Event] = None
+        self.loop = None
+        self.workers: List[asyncio.Task] = []
+        self.in_flight = 0
+        self.bulk_in_flight = 0
+        self.completed_requests = 0
+        self.rate_limited = 0
+        self.failed_requests = 0
+
+    @property
+    def available(self) -> bool:
+        return self.provider.available
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self.wakeup is None or self.loop is not loop:
+            self.loop = loop
+            self.lanes = {}
+            self.wakeup = asyncio.Event()
+            self.workers = [loop.create_task(self._worker()) for _ in range(OPENAI_EMBEDDING_CONCURRENCY)]
+
+    async def embed(self, texts: List[str], priority: int = INTERACTIVE) -> List[List[float]]:
+        """임베딩 생성, 한 배치라도 최종 실패하면 예외"""
+        job = await self._submit(texts, priority)
+        if job.errors:
+            raise job.errors[0]
+        return job.results
+
+    async def embed_many(self, texts: List[str], priority: int = BULK) -> List[Optional[List[float]]]:
+        """임베딩 생성, 최종 실패한 배치의 항목은 None"""
+        job = await self._submit(texts, priority)
+        if job.errors:
+            failed = sum(1 for embedding in job.results if embedding is None)
+            print(f"임베딩 배치 실패 ({failed}개 입력): {job.errors[0]}")
+        return job.results
+
+    async def _submit(self, texts: List[str], priority: int) -> _EmbedJob:
+        self._ensure_workers()
+        job = _EmbedJob(texts, [self.counter.count(text) for text in texts], self.loop.create_future())
+        if not texts:
+            return job
+        self._enqueue(priority, _PendingRange(job, 0, len(texts)))
+        return await job.future
+
+    def _enqueue(self, priority: int, pending: _PendingRange):
+        self.lanes.setdefault(priority, deque()).append(pending)
+        self.wakeup.set()
+
+    async def _worker(self):
+        while True:
+            priority, request = await self._next_request()
+            try:
+                await self._dispatch(priority, request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                request.job.settle(request.start, request.end, error=e)
+
+    async def _next_request(self) -> tuple:
+        """용량(retry-after, 요청/토큰 버킷, 수집 워커 수)이 생긴 뒤에 가장 높은 우선순위 배치를 꺼냄
+
+        용량을 기다리는 동안 요청을 붙잡고 있지 않으므로 나중에 온 질의가 대기 중인 수집 배치를 앞지른다.
+        """
+        while True:
+            priority, request, wait = self._take_batch()
+            if request is not None:
+                return priority, request
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _take_batch(self) -> tuple:
+        """→ (우선순위, 배치 구간, None) 또는 (None, None, 다시 확인할 때까지 대기 시간 / 무기한이면 None)"""
+        for priority in sorted(self.lanes):
+            lane = self.lanes[priority]
+            while lane and lane[0].job.future.done():
+                # 호출 측이 취소한(마감 시간 초과 등) 작업은 버림
+                lane.popleft()
+            if not lane:
+                continue
+            if priority != INTERACTIVE and self.bulk_in_flight >= self.bulk_slots:
+                continue
+            head = lane[0]
+            end, tokens = self._batch_end(head)
+            wait = max(
+                self.blocked_until - time.monotonic(),
+                self.request_bucket.wait_time(1),
+                self.token_bucket.wait_time(tokens)
+            )
+            if wait > 0:
+                # 낮은 우선순위가 먼저 용량을 가져가지 않도록 여기서 대기
+                return None, None, wait
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            request = _PendingRange(head.job, head.start, end, head.attempts)
+            head.start = end
+            if head.start >= head.end:
+                lane.popleft()
+            return priority, request, None
+        return None, None, None
+
+    def _batch_end(self, pending: _PendingRange) -> tuple:
+        """현재 입력 수/토큰 상한으로 잘라낸 배치 끝 위치와 토큰 수 (상한을 넘는 단일 입력은 혼자 보냄)"""
+        tokens = pending.job.tokens
+        end, total = pending.start, 0
+        while end < pending.end and end - pending.start < OPENAI_EMBEDDING_BATCH_SIZE:
+            if end > pending.start and total + tokens[end] > self.batch_token_limit:
+                break
+            total += tokens[end]
+            end += 1
+        return end, total
+
+    async def _dispatch(self, priority: int, request: _PendingRange):
+        job = request.job
+        inputs = job.texts[request.start:request.end]
+        tokens = sum(job.tokens[request.start:request.end])
+        request.attempts += 1
+        timeout = OPENAI_EMBEDDING_TIMEOUT + tokens / 1000 * OPENAI_EMBEDDING_TIMEOUT_PER_1K_TOKENS
+        bulk = priority != INTERACTIVE
+        self.in_flight += 1
+        self.bulk_in_flight += bulk
+        try:
+            embeddings = await self.provider.embed(inputs, timeout)
+        except RateLimitedError as e:
+            self.rate_limited += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + e.retry_after)
+            self.batch_token_limit = max(self.batch_token_limit // 2, 1000)
+            print(f"임베딩 요청 한도 초과: {e.retry_after:.1f}초 대기, 배치 토큰 상한 {self.batch_token_limit}")
+            self._retry_or_fail(priority, request, e, delay=0)
+            return
+        except Exception as e:
+            delay = OPENAI_EMBEDDING_RETRY_DELAY * (2 ** (request.attempts - 1))
+            print(f"임베딩 요청 오류 (시도 {request.attempts}/{OPENAI_EMBEDDING_MAX_RETRIES}): {e}")
+            self._retry_or_fail(priority, request, e, delay=delay)
+            return
+        finally:
+            self.in_flight -= 1
+            self.bulk_in_flight -= bulk
+            # 수집 워커 자리가 났거나 상한이 바뀌었으므로 대기 중인 워커가 다시 확인
+            self.wakeup.set()
+
+        self.completed_requests += 1
+        self.batch_token_limit = min(int(self.batch_token_limit * 1.1) + 1, self.max_batch_tokens)
+        job.settle(request.start, request.end, embeddings)
+
+    def _retry_or_fail(self, priority: int, request: _PendingRange, error: Exception, delay: float):
+        if request.attempts >= OPENAI_EMBEDDING_MAX_RETRIES:
+            self.failed_requests += 1
+            request.job.settle(request.start, request.end, error=error)
+            return
+        # 재시도 구간은 다시 보낼 때의 (줄어든) 배치 상한으로 다시 잘림
+        if delay > 0:
+            self.loop.call_later(delay, self._enqueue, priority, request)
+        else:
+            self._enqueue(priority, request)
+
+    def _queued_inputs(self, bulk: bool) -> int:
+        return sum(pending.end - pending.start
+                   for priority, lane in self.lanes.items() if (priority != INTERACTIVE) == bulk
+                   for pending in lane)
+
+    def stats(self) -> dict:
+        """큐 깊이와 한도 상태"""
+        return {
+            "provider": type(self.provider).__name__,
+            "queue_depth": {"interactive": self._queued_inputs(bulk=False), "bulk": self._queued_inputs(bulk=True)},
+            "in_flight": self.in_flight,
+            "bulk_in_flight": self.bulk_in_flight,
+            "bulk_slots": self.bulk_slots,
+            "completed_requests": self.completed_requests,
+            "rate_limited": self.rate_limited,
+            "failed_requests": self.failed_requests,
+            "blocked_for": max(self.blocked_until - time.monotonic(), 0.0),
+            "batch_token_limit": self.batch_token_limit,
+            "available_requests": int(self.request_bucket.tokens),
+            "available_tokens": int(self.token_bucket.tokens),
+        }
+
+
+# EmbeddingService / SearchService 공유 인스턴스
+embedding_scheduler = EmbeddingScheduler()
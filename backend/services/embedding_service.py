@@ -1,32 +1,47 @@
 import os
+import asyncio
 import numpy as np
-from typing import List
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import text
 from sqlalchemy.orm import Session
+from database import SessionLocal
 from models import Policy, EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic
 from services.workflow_service import WorkflowService
-import openai
-from sentence_transformers import SentenceTransformer
+from services.chunk_embedding_cache import chunk_embedding_cache, chunk_hash
+from services.chunker import Chunk, policy_chunker, summarize_chunks
+from services.embedding_writer import embedding_writer
+from services.embedding_scheduler import embedding_scheduler, BULK
+from services.embedding_checkpoint import embedding_checkpoints, chunk_signature, EMBEDDING_CHECKPOINT_CHUNKS
+from services.model_registry import model_registry
+from services.local_embedder import local_embedding_pool, CLOSED_EMBEDDING_MODEL
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 보안 수준별 임베딩 대상 모델 (쉼표 구분, 모델별로 동시에 임베딩하고 따로 저장)
+EMBEDDING_MODELS_BY_SECURITY_LEVEL = {
+    "public": os.getenv("EMBEDDING_MODELS_PUBLIC", "text-embedding-3-large,multilingual-e5-large-instruct"),
+    "semi_closed": os.getenv("EMBEDDING_MODELS_SEMI_CLOSED", "text-embedding-3-large"),
+    "closed": os.getenv("EMBEDDING_MODELS_CLOSED", "qwen3-embedding"),
+}
+# 원격 임베딩을 쓸 수 없을 때 대신 사용하는 모델
+EMBEDDING_MODELS_OFFLINE = os.getenv("EMBEDDING_MODELS_OFFLINE", "qwen3-embedding")
+REMOTE_EMBEDDING_MODELS = {"text-embedding-3-large"}
+
 class EmbeddingService:
     def __init__(self):
         self.workflow_service = WorkflowService()
         
-        # OpenAI API 키 확인
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if openai_api_key and openai_api_key != "your-openai-api-key-here":
-            self.openai_client = openai.OpenAI(api_key=openai_api_key)
-            print("✅ OpenAI API 클라이언트 초기화 완료")
+        # 원격 임베딩 호출은 공유 스케줄러(RPM/TPM 한도, 재시도, 우선순위)가 담당
+        self.embedding_scheduler = embedding_scheduler
+        if embedding_scheduler.available:
+            print("✅ 임베딩 공급자 초기화 완료")
         else:
             print("⚠️ OpenAI API 키가 없습니다. 로컬 모델만 사용합니다.")
-            self.openai_client = None
         
-        # 로컬 임베딩 모델들
-        self.qwen_model = None
-        self.multilingual_e5_model = None
-        self.snowflake_arctic_model = None
+        # 로컬 임베딩 모델은 SearchService와 공유하는 레지스트리에서 로드
+        self.model_registry = model_registry
+
 
     async def create_embeddings(
         self, 
@@ -36,53 +51,326 @@ class EmbeddingService:
         db: Session,
         workflow_id: str
     ):
-        """임베딩 생성 및 저장"""
+        """임베딩 생성 및 저장 (DB/캐시/청킹 단계는 스레드에서 실행)"""
         try:
-            # 텍스트 청킹
-            chunks = self._chunk_text(content)
-            self.workflow_service.log_step(workflow_id, "text_chunking", "completed", 
-                                         {"chunk_count": len(chunks)})
+            # 텍스트 청킹 (chunk_index는 Chunk.index, 원문 위치는 start/end), 토큰 계산은 스레드에서
+            structured_chunks = await asyncio.to_thread(self._chunk_text, content)
+            chunks = [chunk.text for chunk in structured_chunks]
+            await self.workflow_service.log_step_async(workflow_id, "text_chunking", "completed", 
+                                                       summarize_chunks(structured_chunks))
             
-            # 보안 수준에 따른 임베딩 모델 선택
-            if security_level == "closed":
-                # 완전 폐쇄망: Qwen3 8B embedding
-                await self._create_qwen_embeddings(policy_id, chunks, db, workflow_id)
-            elif security_level == "semi_closed":
-                # 조건부 폐쇄망: Azure OpenAI (API 키가 있는 경우만)
-                if self.openai_client:
-                    await self._create_openai_embeddings(policy_id, chunks, db, workflow_id)
-                else:
-                    print("⚠️ OpenAI API 키가 없어 로컬 모델을 사용합니다.")
-                    await self._create_qwen_embeddings(policy_id, chunks, db, workflow_id)
-            else:
-                # 공개망: text-embedding-3-large (API 키가 있는 경우만)
-                if self.openai_client:
-                    await self._create_openai_embeddings(policy_id, chunks, db, workflow_id)
-                    # 다국어 E5 임베딩도 생성
-                    await self._create_multilingual_e5_embeddings(policy_id, chunks, db, workflow_id)
-                else:
-                    print("⚠️ OpenAI API 키가 없어 로컬 모델을 사용합니다.")
-                    await self._create_qwen_embeddings(policy_id, chunks, db, workflow_id)
+            # 보안 수준별 대상 모델을 동시에 임베딩 (모델마다 세션/트랜잭션 분리)
+            model_names = self._target_models(security_level)
+            self.workflow_service.log_step(workflow_id, "embedding_models", "in_progress",
+                                         {"security_level": security_level, "models": model_names})
+            results = await asyncio.gather(
+                *(self._create_model_embeddings(model_name, policy_id, chunks, workflow_id)
+                  for model_name in model_names),
+                return_exceptions=True
+            )
+            cache_stats = [result for result in results if not isinstance(result, BaseException)]
+            errors = {
+                model_name: str(result)
+                for model_name, result in zip(model_names, results) if isinstance(result, BaseException)
+            }
+            if errors:
+                # 성공한 모델은 이미 커밋됨, 실패 모델은 체크포인트 기준으로 재개 가능
+                raise Exception(f"임베딩 실패 모델: {errors}")
             
-            self.workflow_service.log_step(workflow_id, "embedding_storage", "completed", 
-                                         {"policy_id": policy_id})
+            cached_chunks = sum(stat["cache_hits"] for stat in cache_stats)
+            looked_up_chunks = sum(stat["chunk_count"] for stat in cache_stats)
+            pending_chunks = sum(stat.get("pending", 0) for stat in cache_stats)
+            # 캐시 히트율이 workflow_logs에 남도록 비동기 세션으로 기록
+            await self.workflow_service.log_step_async(workflow_id, "embedding_storage", "completed", 
+                                                       {"policy_id": policy_id,
+                                                        "models": model_names,
+                                                        "pending_chunks": pending_chunks,
+                                                        "chunk_cache": cache_stats,
+                                                        "cache_hit_ratio": cached_chunks / looked_up_chunks if looked_up_chunks else 0.0})
             
         except Exception as e:
-            self.workflow_service.log_error(workflow_id, str(e))
+            await asyncio.to_thread(db.rollback)
+            await self.workflow_service.log_error_async(workflow_id, str(e))
             raise e
 
-    def _chunk_text(self, text: str, chunk_size: int = 50, overlap: int = 5) -> List[str]:
-        """텍스트를 청크로 분할 (토큰 제한 고려)"""
-        words = text.split()
-        chunks = []
+    def _target_models(self, security_level: str) -> List[str]:
+        """보안 수준별 대상 모델 (원격 공급자가 없으면 원격 모델 대신 오프라인 모델 사용)"""
+        configured = EMBEDDING_MODELS_BY_SECURITY_LEVEL.get(security_level, EMBEDDING_MODELS_BY_SECURITY_LEVEL["public"])
+        model_names = [name.strip() for name in configured.split(",") if name.strip()]
+        if not self.embedding_scheduler.available and any(name in REMOTE_EMBEDDING_MODELS for name in model_names):
+            print("⚠️ OpenAI API 키가 없어 로컬 모델을 사용합니다.")
+            model_names = [name for name in model_names if name not in REMOTE_EMBEDDING_MODELS]
+            model_names += [name.strip() for name in EMBEDDING_MODELS_OFFLINE.split(",") if name.strip()]
+        unknown = [name for name in model_names if name not in self._model_creators()]
+        if unknown:
+            raise ValueError(f"지원하지 않는 임베딩 모델: {unknown}")
+        return list(dict.fromkeys(model_names))
+
+    def _model_creators(self) -> Dict[str, Callable]:
+        """모델명 → 임베딩 생성/저장 메서드"""
+        return {
+            "text-embedding-3-large": self._create_openai_embeddings,
+            "multilingual-e5-large-instruct": self._create_multilingual_e5_embeddings,
+            "snowflake-arctic-embed-l-v2.0": self._create_snowflake_arctic_embeddings,
+            "qwen3-embedding": self._create_qwen_embeddings,
+        }
+
+    async def _create_model_embeddings(self, model_name: str, policy_id: int, chunks: List[str], workflow_id: str) -> dict:
+        """모델 하나의 임베딩을 전용 세션으로 생성/저장 (Session은 동시 사용 불가)"""
+        db = SessionLocal()
+        try:
+            stats = await self._model_creators()[model_name](policy_id, chunks, db, workflow_id)
+            await asyncio.to_thread(db.commit)
+            return stats
+        except Exception as e:
+            await asyncio.to_thread(db.rollback)
+            print(f"임베딩 모델 오류 ({model_name}): {e}")
+            raise
+        finally:
+            await asyncio.to_thread(db.close)
+
+    def copy_embeddings(self, source_policy_id: int, target_policy_id: int, db: Session) -> int:
+        """동일 파일 정책의 임베딩을 새 정책으로 복사 (모델 재호출 없이 INSERT ... SELECT, 동기)
+
+        원본의 모든 모델 체크포인트가 completed일 때만 복사하고 체크포인트도 함께 기록한다.
+        원본이 아직 임베딩 중이거나 보류 청크가 있으면 0을 반환해 새로 임베딩하게 한다.
+        """
+        checkpoints = embedding_checkpoints.for_policy(db, source_policy_id)
+        if not checkpoints or any(checkpoint.status != "completed" for checkpoint in checkpoints):
+            print(f"임베딩 재사용 건너뜀: 정책 {source_policy_id}의 임베딩이 완료되지 않음")
+            return 0
+        copied = 0
+        for model in (EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic):
+            short_column = ", embedding_short" if hasattr(model, "embedding_short") else ""
+            result = db.execute(text(f"""
+                INSERT INTO {model.__tablename__} (policy_id, chunk_text, embedding, model, chunk_index{short_column})
+                SELECT :target_policy_id, chunk_text, embedding, model, chunk_index{short_column}
+                FROM {model.__tablename__}
+                WHERE policy_id = :source_policy_id
+                ORDER BY chunk_index
+            """), {"source_policy_id": source_policy_id, "target_policy_id": target_policy_id})
+            copied += result.rowcount or 0
+        embedding_checkpoints.copy(db, checkpoints, target_policy_id)
+        db.commit()
+        print(f"임베딩 재사용: 정책 {source_policy_id} → {target_policy_id}, {copied}개")
+        return copied
+
+    async def _embed_with_cache(
+        self,
+        model_name: str,
+        chunks: List[str],
+        db: Session,
+        encode: Callable[[List[str]], Awaitable[List[Optional[List[float]]]]]
+    ) -> Tuple[List[Optional[List[float]]], dict]:
+        """청크 임베딩 캐시를 먼저 조회하고 미스 청크(중복 제거)만 encode로 생성
+
+        encode가 None을 돌려준 항목(실패)은 캐시에 저장하지 않고 결과에도 None으로 남긴다.
+        """
+        hashes, found = await asyncio.to_thread(self._lookup_cache, db, model_name, chunks)
+        cache_hits = sum(1 for key in hashes if key in found)
+        
+        miss_chunks: Dict[str, str] = {}
+        for key, chunk in zip(hashes, chunks):
+            if key not in found and key not in miss_chunks:
+                miss_chunks[key] = chunk
+        if miss_chunks:
+            fresh = await encode(list(miss_chunks.values()))
+            created = {key: embedding for key, embedding in zip(miss_chunks, fresh) if embedding is not None}
+            await asyncio.to_thread(chunk_embedding_cache.store, db, model_name, created)
+            found.update(created)
+        
+        stats = {
+            "model": model_name,
+            "chunk_count": len(chunks),
+            "cache_hits": cache_hits,
+            "encoded": len(miss_chunks),
+            "hit_ratio": cache_hits / len(chunks) if chunks else 0.0,
+        }
+        print(f"청크 임베딩 캐시 ({model_name}): {cache_hits}/{len(chunks)} 히트, {len(miss_chunks)}개 생성")
+        return [found.get(key) for key in hashes], stats
+
+    @staticmethod
+    def _lookup_cache(db: Session, model_name: str, chunks: List[str]) -> Tuple[List[str], dict]:
+        """청크 해시 계산 후 캐시 조회 (스레드에서 실행)"""
+        hashes = [chunk_hash(chunk) for chunk in chunks]
+        return hashes, chunk_embedding_cache.lookup(db, model_name, hashes)
+
+    async def _embed_and_store(
+        self,
+        model_class,
+        model_name: str,
+        policy_id: int,
+        chunks: List[str],
+        db: Session,
+        encode: Callable[[List[str]], Awaitable[List[Optional[List[float]]]]],
+        chunk_indexes: Optional[List[int]] = None
+    ) -> dict:
+        """체크포인트 단위로 임베딩 → 저장 → 커밋
+
+        chunks는 정책 전체 청크, chunk_indexes는 처리할 청크(재개 시 빠진 청크만).
+        실패한 청크는 저장하지 않고 체크포인트의 pending_chunks에 남긴다.
+        세션을 쓰는 저장/커밋 단계는 스레드에서, 임베딩 호출은 루프에서 실행한다.
+        """
+        resume = chunk_indexes is not None
+        indexes = list(chunk_indexes) if resume else list(range(len(chunks)))
+        checkpoint = await asyncio.to_thread(self._start_checkpoint, db, policy_id, model_name,
+                                             chunks, indexes, resume)
+        
+        totals = {"model": model_name, "chunk_count": 0, "cache_hits": 0, "encoded": 0, "pending": 0}
+        for group_start in range(0, len(indexes), EMBEDDING_CHECKPOINT_CHUNKS):
+            group = indexes[group_start:group_start + EMBEDDING_CHECKPOINT_CHUNKS]
+            group_chunks = [chunks[i] for i in group]
+            
+            error = None
+            try:
+                embeddings, stats = await self._embed_with_cache(model_name, group_chunks, db, encode)
+            except Exception as encode_error:
+                print(f"임베딩 그룹 오류 ({model_name}, 청크 {group[0]}-{group[-1]}): {encode_error}")
+                embeddings, stats, error = [None] * len(group), {"chunk_count": len(group)}, str(encode_error)
+            
+            done = [(index, chunk, embedding) for index, chunk, embedding in zip(group, group_chunks, embeddings)
+                    if embedding is not None]
+            failed = [index for index, embedding in zip(group, embeddings) if embedding is None]
+            await asyncio.to_thread(self._store_group, db, checkpoint, model_class, model_name, policy_id,
+                                    done, failed, group[-1] + 1, error)
+            
+            for key in ("chunk_count", "cache_hits", "encoded"):
+                totals[key] += stats.get(key, 0)
+            totals["pending"] += len(failed)
+            if failed:
+                print(f"⚠️ {model_name} 청크 {len(failed)}개 보류 (재개 작업에서 재처리)")
+        
+        await asyncio.to_thread(self._finish_checkpoint, db, checkpoint)
+        totals["hit_ratio"] = totals["cache_hits"] / totals["chunk_count"] if totals["chunk_count"] else 0.0
+        return totals
+
+    @staticmethod
+    def _start_checkpoint(db: Session, policy_id: int, model_name: str, chunks: List[str],
+                          indexes: List[int], resume: bool):
+        checkpoint = embedding_checkpoints.start(db, policy_id, model_name, len(chunks), resume=resume,
+                                                 signature=chunk_signature(chunks))
+        if resume:
+            # 이미 저장된 청크는 pending에서 제외
+            checkpoint.pending_chunks = sorted(set(checkpoint.pending_chunks or []) & set(indexes))
+        db.commit()
+        return checkpoint
+
+    @staticmethod
+    def _store_group(db: Session, checkpoint, model_class, model_name: str, policy_id: int,
+                     done: list, failed: List[int], next_chunk_index: int, error: Optional[str]):
+        if done:
+            done_indexes, done_chunks, done_embeddings = zip(*done)
+            embedding_writer.write(db, model_class, policy_id, done_chunks, done_embeddings,
+                                   model_name, chunk_indexes=done_indexes)
+        embedding_checkpoints.record(
+            checkpoint, [index for index, _, _ in done], failed, next_chunk_index,
+            error or (f"{len(failed)}개 청크 임베딩 실패" if failed else None)
+        )
+        # 체크포인트: 이 그룹까지의 행과 진행 상태를 함께 커밋
+        db.commit()
+
+    @staticmethod
+    def _finish_checkpoint(db: Session, checkpoint):
+        embedding_checkpoints.finish(checkpoint)
+        db.commit()
+
+    async def resume_embeddings(self, policy_id: int, db: Session, workflow_id: str) -> dict:
+        """체크포인트가 완료되지 않은 모델의 빠진 청크만 다시 임베딩 (DB/파일/청킹은 스레드에서 실행)
+
+        현재 청킹 결과의 서명이 체크포인트와 다르거나 서명이 없는(이전 버전/0 벡터 더미) 모델은
+        저장된 행의 chunk_index를 믿을 수 없으므로 행을 모두 지우고 전체를 다시 임베딩한다.
+        """
+        policy = await asyncio.to_thread(db.get, Policy, policy_id)
+        if policy is None:
+            raise ValueError(f"정책을 찾을 수 없습니다: {policy_id}")
+        chunks = await asyncio.to_thread(self._read_chunks, policy.md_path)
+        signature = await asyncio.to_thread(chunk_signature, chunks)
         
-        # 청크 크기를 더 작게 조정하여 토큰 제한 회피
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk.strip())
+        results = []
+        targets = {model_class.__tablename__: model_name for model_name, (model_class, _) in self._resumable_models().items()}
+        checkpoints = await asyncio.to_thread(embedding_checkpoints.for_policy, db, policy_id)
+        # 체크포인트 도입 전 저장된 0 벡터 더미 행도 빠진 청크로 취급
+        zero_vector_models = await asyncio.to_thread(self._delete_zero_vectors, db, policy_id)
+        signatures = {checkpoint.model: checkpoint.chunk_signature for checkpoint in checkpoints}
+        models_to_resume = {checkpoint.model for checkpoint in checkpoints if checkpoint.status != "completed"}
+        models_to_resume.update(targets[table] for table in zero_vector_models if table in targets)
         
-        print(f"텍스트 청킹 완료: {len(chunks)}개 청크 (청크 크기: {chunk_size})")
+        resumable = self._resumable_models()
+        skipped = []
+        for model_name in sorted(models_to_resume):
+            if model_name not in resumable:
+                # 원격 공급자가 없거나 더 이상 지원하지 않는 모델은 건너뛰고 보고
+                print(f"⚠️ 임베딩 재개 건너뜀 ({model_name}): 정책 {policy_id}, 사용할 수 없는 모델")
+                skipped.append(model_name)
+                continue
+            model_class, encode = resumable[model_name]
+            if signatures.get(model_name) != signature:
+                deleted = await asyncio.to_thread(self._delete_policy_rows, db, model_class, policy_id)
+                print(f"임베딩 전체 재생성 ({model_name}): 정책 {policy_id}, 청크 목록 변경으로 기존 행 {deleted}개 삭제")
+                results.append(await self._embed_and_store(model_class, model_name, policy_id, chunks, db, encode))
+                continue
+            stored = await asyncio.to_thread(self._stored_chunk_indexes, db, model_class, policy_id)
+            missing = [index for index in range(len(chunks)) if index not in stored]
+            print(f"임베딩 재개 ({model_name}): 정책 {policy_id}, 빠진 청크 {len(missing)}개")
+            results.append(await self._embed_and_store(model_class, model_name, policy_id, chunks, db,
+                                                       encode, chunk_indexes=missing))
+        
+        await self.workflow_service.log_step_async(workflow_id, "embedding_resume", "completed",
+                                                   {"policy_id": policy_id, "models": results,
+                                                    "skipped_models": skipped})
+        return {"policy_id": policy_id, "models": results, "skipped_models": skipped}
+
+    def _read_chunks(self, md_path: str) -> List[str]:
+        with open(md_path, 'r', encoding='utf-8') as f:
+            return [chunk.text for chunk in self._chunk_text(f.read())]
+
+    @staticmethod
+    def _delete_policy_rows(db: Session, model_class, policy_id: int) -> int:
+        result = db.execute(
+            text(f"DELETE FROM {model_class.__tablename__} WHERE policy_id = :policy_id"),
+            {"policy_id": policy_id}
+        )
+        db.commit()
+        return result.rowcount or 0
+
+    @staticmethod
+    def _stored_chunk_indexes(db: Session, model_class, policy_id: int) -> set:
+        return {
+            row[0] for row in db.execute(
+                text(f"SELECT chunk_index FROM {model_class.__tablename__} WHERE policy_id = :policy_id"),
+                {"policy_id": policy_id}
+            )
+        }
+
+    def _resumable_models(self) -> Dict[str, tuple]:
+        """모델명 → (임베딩 테이블, 인코더)"""
+        models = {
+            "multilingual-e5-large-instruct": (EmbeddingMultilingualE5, self._encode_multilingual_e5),
+            "snowflake-arctic-embed-l-v2.0": (EmbeddingSnowflakeArctic, self._encode_snowflake_arctic),
+            CLOSED_EMBEDDING_MODEL: (EmbeddingQwen, self._encode_qwen),
+        }
+        if self.embedding_scheduler.available:
+            models["text-embedding-3-large"] = (EmbeddingTextEmbedding3, self._encode_openai)
+        return models
+
+    def _delete_zero_vectors(self, db: Session, policy_id: int) -> List[str]:
+        """0 벡터 더미 행 삭제 후 해당 테이블 이름 반환"""
+        tables = []
+        for model_class in (EmbeddingTextEmbedding3, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic):
+            result = db.execute(text(f"""
+                DELETE FROM {model_class.__tablename__}
+                WHERE policy_id = :policy_id AND vector_norm(embedding) = 0
+            """), {"policy_id": policy_id})
+            if result.rowcount:
+                print(f"0 벡터 더미 행 삭제: {model_class.__tablename__} {result.rowcount}개")
+                tables.append(model_class.__tablename__)
+        db.commit()
+        return tables
+
+    def _chunk_text(self, text: str) -> List[Chunk]:
+        """텍스트를 장/조/항 구조와 토큰 예산 기준으로 청크 분할"""
+        chunks = policy_chunker.split(text)
+        print(f"텍스트 청킹 완료: {len(chunks)}개 청크 (최대 토큰: {policy_chunker.max_tokens})")
         return chunks
 
     async def _create_openai_embeddings(
@@ -90,165 +378,98 @@ class EmbeddingService:
         policy_id: int, 
         chunks: List[str], 
         db: Session, 
-        workflow_id: str
+        workflow_id: str,
+        chunk_indexes: Optional[List[int]] = None
     ):
-        """OpenAI 임베딩 생성 (배치 처리)"""
+        """OpenAI 임베딩 생성 (배치 처리, 실패 배치는 pending 체크포인트로 남김)"""
         try:
             print(f"OpenAI 임베딩 생성 중... (청크 수: {len(chunks)})")
             
-            if not self.openai_client:
+            if not self.embedding_scheduler.available:
                 raise Exception("OpenAI 클라이언트가 초기화되지 않았습니다.")
             
-            # 배치 크기 설정 (토큰 제한 고려)
-            batch_size = 20  # 한 번에 처리할 청크 수
-            all_embeddings = []
-            
-            for i in range(0, len(chunks), batch_size):
-                batch_chunks = chunks[i:i + batch_size]
-                print(f"배치 처리 중: {i+1}-{min(i+batch_size, len(chunks))}/{len(chunks)}")
-                
-                try:
-                    response = self.openai_client.embeddings.create(
-                        model="text-embedding-3-large",
-                        input=batch_chunks,
-                        timeout=60  # 60초 타임아웃
-                    )
-                    
-                    batch_embeddings = [data.embedding for data in response.data]
-                    all_embeddings.extend(batch_embeddings)
-                    
-                except Exception as batch_error:
-                    print(f"배치 {i//batch_size + 1} 처리 오류: {batch_error}")
-                    # 오류 발생 시 더미 임베딩으로 대체
-                    for _ in batch_chunks:
-                        dummy_embedding = [0.0] * 3072  # text-embedding-3-large 차원
-                        all_embeddings.append(dummy_embedding)
-            
-            # 데이터베이스에 배치 저장 (메모리 효율성)
-            batch_size = 100  # 100개씩 배치 저장
-            total_chunks = len(chunks)
-            
-            for i in range(0, total_chunks, batch_size):
-                batch_end = min(i + batch_size, total_chunks)
-                batch_chunks = chunks[i:batch_end]
-                batch_embeddings = all_embeddings[i:batch_end]
-                
-                print(f"데이터베이스 저장 중: {i+1}-{batch_end}/{total_chunks}")
-                
-                # 배치별로 임베딩 저장
-                for j, (chunk, embedding) in enumerate(zip(batch_chunks, batch_embeddings)):
-                    embedding_record = EmbeddingTextEmbedding3(
-                        policy_id=policy_id,
-                        chunk_text=chunk,
-                        embedding=embedding,
-                        model="text-embedding-3-large",
-                        chunk_index=i + j
-                    )
-                    db.add(embedding_record)
-                
-                # 배치별 커밋
-                db.commit()
-                print(f"배치 저장 완료: {i+1}-{batch_end}/{total_chunks}")
-            
+            cache_stats = await self._embed_and_store(
+                EmbeddingTextEmbedding3, "text-embedding-3-large", policy_id, chunks, db,
+                self._encode_openai, chunk_indexes
+            )
             print(f"✅ OpenAI 임베딩 생성 및 저장 완료: {len(chunks)}개 청크")
+            return cache_stats
             
         except Exception as e:
             print(f"OpenAI 임베딩 생성 오류: {e}")
             raise e
 
+    async def _encode_openai(self, miss_chunks: List[str]) -> List[Optional[List[float]]]:
+        """캐시 미스 청크를 토큰 수 기준 배치로 스케줄러에 제출 (수집 우선순위, 최종 실패 배치는 None)"""
+        return await self.embedding_scheduler.embed_many(miss_chunks, priority=BULK)
+
     async def _create_qwen_embeddings(
         self, 
         policy_id: int, 
         chunks: List[str], 
         db: Session, 
-        workflow_id: str
+        workflow_id: str,
+        chunk_indexes: Optional[List[int]] = None
     ):
-        """Qwen 임베딩 생성 (간단한 더미 임베딩)"""
+        """Qwen3 임베딩 생성 (폐쇄망 로컬 모델, 1024차원)"""
         try:
             print(f"Qwen 임베딩 생성 중... (청크 수: {len(chunks)})")
-            
-            # 간단한 더미 임베딩 생성 (실제로는 로컬 모델 사용)
-            for i, chunk in enumerate(chunks):
-                # 간단한 해시 기반 더미 임베딩 (384차원)
-                import hashlib
-                hash_obj = hashlib.md5(chunk.encode())
-                hash_bytes = hash_obj.digest()
-                dummy_embedding = [float(b) / 255.0 for b in hash_bytes] * 24  # 384차원으로 확장
-                
-                embedding_record = EmbeddingQwen(
-                    policy_id=policy_id,
-                    chunk_text=chunk,
-                    embedding=dummy_embedding,
-                    model="dummy-qwen",
-                    chunk_index=i
-                )
-                db.add(embedding_record)
-            
-            db.commit()
-            print(f"✅ Qwen 임베딩 생성 완료: {len(chunks)}개 청크")
+            return await self._embed_and_store(
+                EmbeddingQwen, CLOSED_EMBEDDING_MODEL, policy_id, chunks, db,
+                self._encode_qwen, chunk_indexes
+            )
             
         except Exception as e:
             print(f"Qwen 임베딩 생성 오류: {e}")
             raise e
 
+    async def _encode_qwen(self, miss_chunks: List[str]) -> List[List[float]]:
+        # 배치 단위 CPU 인코딩 (CLOSED_EMBEDDING_WORKERS ≥ 2이면 프로세스 풀)
+        return await local_embedding_pool.encode_documents(miss_chunks)
+
     async def _create_multilingual_e5_embeddings(
         self, 
         policy_id: int, 
         chunks: List[str], 
         db: Session, 
-        workflow_id: str
+        workflow_id: str,
+        chunk_indexes: Optional[List[int]] = None
     ):
         """다국어 E5 임베딩 생성"""
         try:
-            if self.multilingual_e5_model is None:
-                self.multilingual_e5_model = SentenceTransformer('intfloat/multilingual-e5-large-instruct')
-            
-            embeddings = self.multilingual_e5_model.encode(chunks)
-            
-            # 데이터베이스에 저장
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                embedding_record = EmbeddingMultilingualE5(
-                    policy_id=policy_id,
-                    chunk_text=chunk,
-                    embedding=embedding.tolist(),
-                    model="multilingual-e5-large-instruct",
-                    chunk_index=i
-                )
-                db.add(embedding_record)
-            
-            db.commit()
+            return await self._embed_and_store(
+                EmbeddingMultilingualE5, "multilingual-e5-large-instruct", policy_id, chunks, db,
+                self._encode_multilingual_e5, chunk_indexes
+            )
             
         except Exception as e:
             print(f"다국어 E5 임베딩 생성 오류: {e}")
             raise e
 
+    async def _encode_multilingual_e5(self, miss_chunks: List[str]) -> List[List[float]]:
+        # CPU 인코딩은 스레드에서 실행해 원격 모델 임베딩과 겹치게 함
+        return await asyncio.to_thread(self.model_registry.encode,
+                                       'intfloat/multilingual-e5-large-instruct', miss_chunks)
+
     async def _create_snowflake_arctic_embeddings(
         self, 
         policy_id: int, 
         chunks: List[str], 
         db: Session, 
-        workflow_id: str
+        workflow_id: str,
+        chunk_indexes: Optional[List[int]] = None
     ):
         """Snowflake Arctic 임베딩 생성"""
         try:
-            if self.snowflake_arctic_model is None:
-                self.snowflake_arctic_model = SentenceTransformer('dragonkue/snowflake-arctic-embed-l-v2.0')
-            
-            embeddings = self.snowflake_arctic_model.encode(chunks)
-            
-            # 데이터베이스에 저장
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                embedding_record = EmbeddingSnowflakeArctic(
-                    policy_id=policy_id,
-                    chunk_text=chunk,
-                    embedding=embedding.tolist(),
-                    model="snowflake-arctic-embed-l-v2.0",
-                    chunk_index=i
-                )
-                db.add(embedding_record)
-            
-            db.commit()
+            return await self._embed_and_store(
+                EmbeddingSnowflakeArctic, "snowflake-arctic-embed-l-v2.0", policy_id, chunks, db,
+                self._encode_snowflake_arctic, chunk_indexes
+            )
             
         except Exception as e:
             print(f"Snowflake Arctic 임베딩 생성 오류: {e}")
             raise e
+
+    async def _encode_snowflake_arctic(self, miss_chunks: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.model_registry.encode,
+                                       'dragonkue/snowflake-arctic-embed-l-v2.0', miss_chunks)
@@ -0,0 +1,122 @@
+"""
+임베딩 행 대량 저장 (PostgreSQL COPY ... FROM STDIN, 바이너리 형식)
+
+ORM 객체를 청크마다 만들고 벡터를 문자열로 바꾸는 대신, pgvector 바이너리 표현으로
+embeddings_* 테이블에 COPY한다. 커밋은 호출 측에서 체크포인트 그룹(EMBEDDING_CHECKPOINT_CHUNKS) 단위로 수행한다.
+embedding_short 컬럼이 있는 테이블은 축약 벡터(앞 SHORT_EMBEDDING_DIM차원, 정규화)도 함께 기록한다.
+"""
+import os
+import struct
+import tempfile
+import numpy as np
+from typing import List, Optional, Sequence
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models import truncate_embedding
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# COPY 데이터를 메모리에 두는 최대 크기 (넘으면 임시 파일로 넘김)
+EMBEDDING_COPY_SPOOL_BYTES = int(os.getenv("EMBEDDING_COPY_SPOOL_BYTES", str(64 * 1024 * 1024)))
+
+COPY_COLUMNS = ("policy_id", "chunk_text", "embedding", "model", "chunk_index")
+SHORT_COLUMN = "embedding_short"
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+INT4 = struct.Struct(">ii")        # (길이 4, 값)
+FIELD_LENGTH = struct.Struct(">i")
+FIELD_COUNT = struct.Struct(">h")
+VECTOR_HEADER = struct.Struct(">HH")  # pgvector vector_recv: 차원, 예약(0)
+
+
+def _text_field(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return FIELD_LENGTH.pack(len(data)) + data
+
+
+def _vector_field(embedding) -> bytes:
+    vector = np.asarray(embedding, dtype=">f4")
+    data = VECTOR_HEADER.pack(vector.shape[0], 0) + vector.tobytes()
+    return FIELD_LENGTH.pack(len(data)) + data
+
+
+class BulkEmbeddingWriter:
+    """embeddings_* 테이블 공용 대량 저장기"""
+
+    def write(
+        self,
+        db: Session,
+        model_class,
+        policy_id: int,
+        chunks: Sequence[str],
+        embeddings: Sequence,
+        model_name: str,
+        chunk_indexes: Optional[Sequence[int]] = None
+    ) -> int:
+        """청크/임베딩을 저장하고 저장한 행 수 반환 (커밋하지 않음)
+
+        chunk_indexes를 주지 않으면 0부터 순서대로 chunk_index를 매긴다.
+        """
+        if not chunks:
+            return 0
+        if chunk_indexes is None:
+            chunk_indexes = range(len(chunks))
+        connection = db.connection()
+        if connection.dialect.driver != "psycopg2":
+            return self._write_insert(db, model_class, policy_id, chunks, embeddings, model_name, chunk_indexes)
+        dbapi_connection = connection.connection.dbapi_connection
+        columns = COPY_COLUMNS + ((SHORT_COLUMN,) if hasattr(model_class, SHORT_COLUMN) else ())
+        field_count = FIELD_COUNT.pack(len(columns))
+
+        policy_field = INT4.pack(4, policy_id)
+        model_field = _text_field(model_name)
+        with tempfile.SpooledTemporaryFile(max_size=EMBEDDING_COPY_SPOOL_BYTES) as buffer:
+            buffer.write(COPY_HEADER)
+            for index, chunk, embedding in zip(chunk_indexes, chunks, embeddings):
+                buffer.write(field_count)
+                buffer.write(policy_field)
+                buffer.write(_text_field(chunk))
+                buffer.write(_vector_field(embedding))
+                buffer.write(model_field)
+                buffer.write(INT4.pack(4, index))
+                if len(columns) > len(COPY_COLUMNS):
+                    buffer.write(_vector_field(truncate_embedding(embedding)))
+            buffer.write(COPY_TRAILER)
+            buffer.seek(0)
+
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"COPY {model_class.__tablename__} ({', '.join(columns)}) "
+                    f"FROM STDIN WITH (FORMAT binary)",
+                    buffer
+                )
+            finally:
+                cursor.close()
+        print(f"임베딩 대량 저장: {model_class.__tablename__} {len(chunks)}행")
+        return len(chunks)
+
+    @staticmethod
+    def _write_insert(db: Session, model_class, policy_id: int, chunks, embeddings, model_name: str,
+                      chunk_indexes: Sequence[int]) -> int:
+        """COPY를 쓸 수 없는 드라이버용 다중 행 INSERT"""
+        rows: List[dict] = [
+            {
+                "policy_id": policy_id,
+                "chunk_text": chunk,
+                "embedding": np.asarray(embedding, dtype=np.float32).tolist(),
+                "model": model_name,
+                "chunk_index": index,
+            }
+            for index, chunk, embedding in zip(chunk_indexes, chunks, embeddings)
+        ]
+        if hasattr(model_class, SHORT_COLUMN):
+            for row in rows:
+                row[SHORT_COLUMN] = truncate_embedding(row["embedding"]).tolist()
+        db.execute(insert(model_class), rows)
+        return len(rows)
+
+
+# 모델별 임베딩 메서드 공유 인스턴스
+embedding_writer = BulkEmbeddingWriter()
@@ -0,0 +1,303 @@
+"""
+약관 수집(업로드 처리) 백그라운드 작업 큐
+
+업로드 요청은 파일만 저장하고 작업을 큐에 넣은 뒤 바로 202를 반환한다.
+로컬 워커들이 우선순위 순으로 파이프라인을 실행하며, 진행 상황은 작업 ID와 같은
+workflow_id로 workflow_logs에 기록되어 WorkflowMonitor에서 그대로 볼 수 있다.
+작업은 ingestion_jobs 테이블에도 저장되어 재시작(uvicorn --reload 포함) 후 start()에서
+대기 중이던 작업을 다시 큐에 넣고, 갱신이 끊긴 실행 중 작업은 재개 가능한 유형이면
+다시 넣고 아니면 오류로 표시한다. 여러 프로세스가 같은 작업을 넣어도 실행 직전
+상태 전이(queued → running)로 한 곳만 실행한다.
+작업 상태 기록은 비동기 세션으로 하고, 파이프라인의 동기 DB/CPU 단계는 스레드에서
+실행해 수집 중에도 같은 이벤트 루프의 검색 요청이 막히지 않게 한다.
+"""
+import os
+import time
+import asyncio
+import itertools
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from database import SessionLocal, AsyncSessionLocal
+from models import IngestionJobRecord
+from services.workflow_service import WorkflowService
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGESTION_CONCURRENCY = int(os.getenv("INGESTION_CONCURRENCY", "2"))
+# 숫자가 작을수록 먼저 처리
+INGESTION_DEFAULT_PRIORITY = int(os.getenv("INGESTION_DEFAULT_PRIORITY", "5"))
+# 완료된 작업 상태를 메모리에 유지하는 개수
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "1000"))
+# 실행 중 작업의 updated_at 갱신 주기(초)와, 이 시간(초) 이상 갱신이 없으면 중단된 작업으로 판단
+INGESTION_JOB_HEARTBEAT_SECONDS = int(os.getenv("INGESTION_JOB_HEARTBEAT_SECONDS", "30"))
+INGESTION_JOB_STALE_SECONDS = int(os.getenv("INGESTION_JOB_STALE_SECONDS", "120"))
+
+# 작업 유형별 러너 생성 함수: (job_id, payload) → runner
+RunnerFactory = Callable[[str, dict], Callable[[Session], Awaitable]]
+# 중단된 작업 정리 함수: (job_id, payload) → None
+AbandonHandler = Callable[[str, dict], Awaitable]
+
+
+class IngestionJob:
+    """수집 작업 상태"""
+
+    def __init__(self, job_id: str, job_type: str, priority: int, runner: Callable[[Session], Awaitable],
+                 metadata: dict):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.priority = priority
+        self.runner = runner
+        self.metadata = metadata
+        self.status = "queued"
+        self.policy_id: Optional[int] = None
+        self.error_message: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "workflow_id": self.job_id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "priority": self.priority,
+            "policy_id": self.policy_id,
+            "error_message": self.error_message,
+            "metadata": self.metadata,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """우선순위 기반 로컬 워커 풀"""
+
+    def __init__(self, concurrency: int = INGESTION_CONCURRENCY):
+        self.concurrency = concurrency
+        self.workflow_service = WorkflowService()
+        self.jobs: Dict[str, IngestionJob] = {}
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.workers = []
+        self.handlers: Dict[str, tuple] = {}
+        self._sequence = itertools.count()
+
+    def register_handler(self, job_type: str, factory: RunnerFactory, resumable: bool = False,
+                         on_abandoned: Optional[AbandonHandler] = None):
+        """작업 유형 등록. resumable이면 실행 중 중단된 작업을 재시작 후 처음부터 다시 실행해도 안전하고,
+        아니면 오류로 표시한 뒤 on_abandoned로 작업이 남긴 상태를 정리함"""
+        self.handlers[job_type] = (factory, resumable, on_abandoned)
+
+    async def start(self):
+        """워커 태스크 시작 (앱 시작 시 호출)"""
+        if self.workers:
+            return
+        self.queue = asyncio.PriorityQueue()
+        self.workers = [
+            asyncio.create_task(self._worker(number)) for number in range(self.concurrency)
+        ]
+        print(f"✅ 수집 작업 큐 시작: 워커 {self.concurrency}개")
+        try:
+            await self._recover()
+        except Exception as e:
+            print(f"⚠️ 수집 작업 복구 실패: {e}")
+
+    async def stop(self):
+        """워커 태스크 종료 (앱 종료 시 호출)"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(
+        self,
+        job_id: str,
+        job_type: str,
+        payload: dict,
+        priority: int = INGESTION_DEFAULT_PRIORITY,
+        metadata: dict = None
+    ) -> IngestionJob:
+        """작업 등록. payload는 JSON으로 저장되어 등록된 러너 생성 함수에 전달됨"""
+        if self.queue is None:
+            raise RuntimeError("수집 작업 큐가 시작되지 않았습니다.")
+        async with AsyncSessionLocal() as db:
+            db.add(IngestionJobRecord(
+                job_id=job_id, job_type=job_type, priority=priority, payload=payload,
+                job_metadata=metadata or {}, status="queued"
+            ))
+            await db.commit()
+        job = self._enqueue(job_id, job_type, payload, priority, metadata or {})
+        await self.workflow_service.log_step_async(
+            job_id, "job_queued", "queued",
+            {"priority": priority, "queue_depth": self.queue.qsize(), **job.metadata}
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    async def get_record(self, job_id: str) -> Optional[dict]:
+        """다른 프로세스가 등록했거나 메모리 이력에서 밀려난 작업 상태 조회"""
+        async with AsyncSessionLocal() as db:
+            record = await db.get(IngestionJobRecord, job_id)
+        if record is None:
+            return None
+        return {
+            "job_id": record.job_id,
+            "workflow_id": record.job_id,
+            "job_type": record.job_type,
+            "status": record.status,
+            "priority": record.priority,
+            "policy_id": record.policy_id,
+            "error_message": record.error_message,
+            "metadata": record.job_metadata,
+            "created_at": record.created_at.timestamp() if record.created_at else None,
+            "started_at": record.started_at.timestamp() if record.started_at else None,
+            "finished_at": record.finished_at.timestamp() if record.finished_at else None,
+        }
+
+    def _enqueue(self, job_id: str, job_type: str, payload: dict, priority: int, metadata: dict) -> IngestionJob:
+        factory, _, _ = self.handlers[job_type]
+        job = IngestionJob(job_id, job_type, priority, factory(job_id, payload), metadata)
+        self.jobs[job_id] = job
+        self._trim_history()
+        self.queue.put_nowait((priority, next(self._sequence), job))
+        return job
+
+    async def _recover(self):
+        """재시작 전 대기 중이던 작업을 다시 넣고, 갱신이 끊긴 실행 중 작업을 정리"""
+        stale_before = func.now() - func.make_interval(0, 0, 0, 0, 0, 0, float(INGESTION_JOB_STALE_SECONDS))
+        resumable_types = [job_type for job_type, (_, resumable, _) in self.handlers.items() if resumable]
+        stale_running = (IngestionJobRecord.status == "running", IngestionJobRecord.updated_at < stale_before)
+        async with AsyncSessionLocal() as db:
+            # 처음부터 다시 실행해도 되는 유형은 대기 상태로 되돌림
+            await db.execute(
+                update(IngestionJobRecord)
+                .where(*stale_running, IngestionJobRecord.job_type.in_(resumable_types))
+                .values(status="queued", started_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            orphaned = (await db.execute(
+                update(IngestionJobRecord)
+                .where(*stale_running)
+                .values(status="error", error_message="서버 재시작으로 작업이 중단되었습니다.",
+                        finished_at=func.now())
+                .returning(IngestionJobRecord.job_id, IngestionJobRecord.job_type, IngestionJobRecord.payload)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+            result = await db.execute(
+                select(IngestionJobRecord)
+                .where(IngestionJobRecord.status == "queued")
+                .order_by(IngestionJobRecord.created_at)
+            )
+            queued = result.scalars().all()
+        
+        for job_id, job_type, payload in orphaned:
+            await self.workflow_service.log_error_async(job_id, "서버 재시작으로 작업이 중단되었습니다.")
+            on_abandoned = self.handlers.get(job_type, (None, False, None))[2]
+            if on_abandoned:
+                try:
+                    await on_abandoned(job_id, payload)
+                except Exception as e:
+                    print(f"⚠️ 중단 작업 정리 실패: {job_id} - {e}")
+        requeued = 0
+        for record in queued:
+            if record.job_id in self.jobs or record.job_type not in self.handlers:
+                continue
+            self._enqueue(record.job_id, record.job_type, record.payload, record.priority,
+                          record.job_metadata or {})
+            requeued += 1
+        if requeued or orphaned:
+            print(f"🔁 수집 작업 복구: 재등록 {requeued}개, 중단 처리 {len(orphaned)}개")
+
+    async def _update_record(self, job_id: str, *conditions, **values) -> bool:
+        """작업 행 상태 갱신 (조건을 만족하는 행이 있었는지 반환, DB 오류는 기록만 하고 False)"""
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(IngestionJobRecord)
+                    .where(IngestionJobRecord.job_id == job_id, *conditions)
+                    .values(updated_at=func.now(), **values)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                return result.rowcount > 0
+        except Exception as e:
+            print(f"⚠️ 수집 작업 상태 저장 실패: {job_id} - {e}")
+            return False
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(INGESTION_JOB_HEARTBEAT_SECONDS)
+            await self._update_record(job_id, IngestionJobRecord.status == "running")
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "jobs": counts,
+        }
+
+    def _trim_history(self):
+        finished = [job for job in self.jobs.values() if job.status in ("completed", "error")]
+        overflow = len(self.jobs) - INGESTION_JOB_HISTORY
+        for job in sorted(finished, key=lambda j: j.finished_at or 0)[:max(overflow, 0)]:
+            del self.jobs[job.job_id]
+
+    async def _worker(self, number: int):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: IngestionJob):
+        # 다른 프로세스가 먼저 가져간 작업이면 건너뜀 (상태는 ingestion_jobs에서 조회)
+        if not await self._update_record(job.job_id, IngestionJobRecord.status == "queued",
+                                         status="running", started_at=func.now()):
+            self.jobs.pop(job.job_id, None)
+            return
+        # 파이프라인용 동기 세션 (러너는 이 세션을 쓰는 단계를 스레드에서 실행)
+        db = SessionLocal()
+        job.status = "running"
+        job.started_at = time.time()
+        heartbeat = asyncio.create_task(self._heartbeat(job.job_id))
+        try:
+            await self.workflow_service.log_step_async(
+                job.job_id, "job_started", "running",
+                {"waited_ms": int((job.started_at - job.created_at) * 1000)}
+            )
+            result = await job.runner(db)
+            job.policy_id = getattr(result, "policy_id", None)
+            job.status = "completed"
+            job.finished_at = time.time()
+            await self._update_record(job.job_id, status="completed", policy_id=job.policy_id,
+                                      finished_at=func.now())
+            await self.workflow_service.log_step_async(
+                job.job_id, "job_completed", "completed",
+                {"policy_id": job.policy_id},
+                execution_time=int((job.finished_at - job.started_at) * 1000)
+            )
+        except Exception as e:
+            job.status = "error"
+            job.error_message = str(e)
+            job.finished_at = time.time()
+            print(f"수집 작업 실패: {job.job_id} - {e}")
+            await asyncio.to_thread(db.rollback)
+            await self._update_record(job.job_id, status="error", error_message=str(e), finished_at=func.now())
+            await self.workflow_service.log_error_async(job.job_id, str(e))
+        finally:
+            heartbeat.cancel()
+            await asyncio.to_thread(db.close)
+
+
+# 앱 전체 공유 인스턴스
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,332 @@
+"""
+chunk_text에 대한 문자 n-gram 역색인 (BM25)
+
+한국어는 형태소 분석 없이도 문자 bigram으로 "제3조", "21669" 같은 정확한 용어를
+잡을 수 있다. 인덱스는 워커 프로세스별 메모리에 유지되며, 앱 시작 시(LEXICAL_INDEX_PRELOAD)
+또는 처음 검색된 테이블을 백그라운드 스레드에서 적재한다(적재 전에는 벡터 결과만 사용).
+업로드/삭제 시 증분 갱신하고, 다른 워커의 변경은 백그라운드 동기화가 정책 수/최대 ID/
+체크포인트 갱신 시각을 비교해 바뀐 정책만 다시 읽어 따라잡는다.
+"""
+import os
+import math
+import re
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NGRAM_SIZE = int(os.getenv("LEXICAL_NGRAM_SIZE", "2"))
+SYNC_INTERVAL_SECONDS = int(os.getenv("LEXICAL_INDEX_SYNC_SECONDS", "30"))
+# 앱 시작 시 미리 적재할 테이블 (쉼표 구분)
+LEXICAL_INDEX_PRELOAD = os.getenv("LEXICAL_INDEX_PRELOAD", "embeddings_text_embedding_3,embeddings_qwen")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-zA-Z가-힣]+")
+_MISSING = object()
+
+
+def tokenize(text_value: str, n: int = NGRAM_SIZE) -> List[str]:
+    """단어별 문자 n-gram 토큰화 (n보다 짧은 단어는 그대로 사용)"""
+    tokens = []
+    for word in _TOKEN_SPLIT.split(text_value.lower()):
+        if not word:
+            continue
+        if len(word) <= n:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+
+class _TableLexicalIndex:
+    """단일 embeddings_* 테이블의 chunk_text 역색인"""
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # term -> {doc_id: tf}
+        self.doc_lengths: Dict[int, int] = {}
+        self.docs: Dict[int, tuple] = {}                               # doc_id -> (policy_id, chunk_index, chunk_text)
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.policy_docs: Dict[int, Set[int]] = defaultdict(set)
+        self.policies: Dict[int, tuple] = {}                           # policy_id -> (product_name, company)
+        self.policy_versions: Dict[int, object] = {}                   # policy_id -> 체크포인트 최종 갱신 시각
+        self.signature = None                                          # 마지막 동기화 시점의 DB 변경 요약
+        self.total_length = 0
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def prepare(rows) -> List[tuple]:
+        """행 토큰화 (검색이 잠금을 기다리지 않도록 잠금 밖에서 수행)"""
+        docs = []
+        for row in rows:
+            terms = tokenize(row.chunk_text)
+            tf = defaultdict(int)
+            for term in terms:
+                tf[term] += 1
+            docs.append((row.id, row.policy_id, row.chunk_index, row.chunk_text,
+                         row.product_name, row.company, dict(tf), len(terms)))
+        return docs
+
+    def add_docs(self, docs: List[tuple]):
+        with self.lock:
+            for doc_id, policy_id, chunk_index, chunk_text, product_name, company, tf, length in docs:
+                if doc_id in self.docs:
+                    continue
+                for term, count in tf.items():
+                    self.postings[term][doc_id] = count
+                self.doc_terms[doc_id] = list(tf)
+                self.doc_lengths[doc_id] = length
+                self.total_length += length
+                self.docs[doc_id] = (policy_id, chunk_index, chunk_text)
+                self.policy_docs[policy_id].add(doc_id)
+                self.policies[policy_id] = (product_name, company)
+
+    def replace_policies(self, policy_ids: List[int], docs: List[tuple]):
+        """정책들의 청크를 새로 읽은 청크로 교체"""
+        with self.lock:
+            for policy_id in policy_ids:
+                self.remove_policy(policy_id)
+            self.add_docs(docs)
+
+    def remove_policy(self, policy_id: int) -> int:
+        with self.lock:
+            doc_ids = self.policy_docs.pop(policy_id, set())
+            for doc_id in doc_ids:
+                for term in self.doc_terms.pop(doc_id, []):
+                    postings = self.postings.get(term)
+                    if postings is not None:
+                        postings.pop(doc_id, None)
+                        if not postings:
+                            del self.postings[term]
+                self.total_length -= self.doc_lengths.pop(doc_id, 0)
+                self.docs.pop(doc_id, None)
+            self.policies.pop(policy_id, None)
+            return len(doc_ids)
+
+    def search(self, query: str, limit: int, policy_ids: Optional[List[int]] = None) -> List[dict]:
+        with self.lock:
+            doc_count = len(self.docs)
+            if doc_count == 0:
+                return []
+            avg_length = self.total_length / doc_count
+            allowed = set(policy_ids) if policy_ids else None
+
+            scores: Dict[int, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if allowed is not None and self.docs[doc_id][0] not in allowed:
+                        continue
+                    length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            rows = []
+            for doc_id, score in top:
+                policy_id, chunk_index, chunk_text = self.docs[doc_id]
+                product_name, company = self.policies.get(policy_id, (None, None))
+                rows.append({
+                    "policy_id": policy_id,
+                    "chunk_text": chunk_text,
+                    "chunk_index": chunk_index,
+                    "bm25_score": score,
+                    "product_name": product_name,
+                    "company": company,
+                })
+            return rows
+
+
+class LexicalIndexManager:
+    """테이블별 BM25 역색인 관리자 (백그라운드 적재/동기화 + 증분 갱신)"""
+
+    def __init__(self):
+        self.tables: Dict[str, _TableLexicalIndex] = {}
+        self.loading: Set[str] = set()
+        self.lock = threading.Lock()
+        self.refresher: Optional[asyncio.Task] = None
+
+    async def start(self, table_names: Optional[List[str]] = None):
+        """미리 적재할 테이블 적재 후 주기적 동기화 태스크 시작 (앱 시작 시 호출)"""
+        if self.refresher is not None:
+            return
+        if table_names is None:
+            table_names = [name.strip() for name in LEXICAL_INDEX_PRELOAD.split(",") if name.strip()]
+        self.refresher = asyncio.create_task(self._refresh_loop(table_names))
+
+    async def stop(self):
+        """동기화 태스크 종료 (앱 종료 시 호출)"""
+        if self.refresher is not None:
+            self.refresher.cancel()
+            await asyncio.gather(self.refresher, return_exceptions=True)
+            self.refresher = None
+
+    async def _refresh_loop(self, table_names: List[str]):
+        for table_name in table_names:
+            if self._claim(table_name):
+                await asyncio.to_thread(self._load_table, table_name)
+        while True:
+            await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception as e:
+                print(f"BM25 인덱스 동기화 오류: {e}")
+
+    def _claim(self, table_name: str) -> bool:
+        """적재 중복 방지 (이미 적재됐거나 적재 중이면 False)"""
+        with self.lock:
+            if table_name in self.tables or table_name in self.loading:
+                return False
+            self.loading.add(table_name)
+            return True
+
+    def _load_table(self, table_name: str):
+        """테이블 전체 적재 (스레드에서 실행, 완성된 인덱스를 한 번에 등록)"""
+        db = SessionLocal()
+        try:
+            table = _TableLexicalIndex(table_name)
+            # 적재 도중 바뀐 정책은 다음 동기화에서 다시 읽도록 버전을 먼저 기록
+            table.signature = self._signature(db)
+            table.policy_versions = self._policy_versions(db)
+            table.add_docs(table.prepare(self._fetch_rows(db, table_name)))
+            with self.lock:
+                self.tables[table_name] = table
+            print(f"BM25 인덱스 적재 완료: {table_name} ({len(table.docs)}개 청크)")
+        except Exception as e:
+            print(f"BM25 인덱스 적재 오류 ({table_name}): {e}")
+        finally:
+            db.close()
+            with self.lock:
+                self.loading.discard(table_name)
+
+    def _fetch_rows(self, db: Session, table_name: str, policy_ids: Optional[List[int]] = None):
+        policy_filter = "WHERE e.policy_id = ANY(:policy_ids)" if policy_ids else ""
+        query_sql = f"""
+        SELECT e.id, e.policy_id, e.chunk_index, e.chunk_text, p.product_name, p.company
+        FROM {table_name} e
+        JOIN policies p ON p.policy_id = e.policy_id
+        {policy_filter}
+        """
+        params = {"policy_ids": list(policy_ids)} if policy_ids else {}
+        return db.execute(text(query_sql), params, execution_options={"yield_per": 1000})
+
+    @staticmethod
+    def _signature(db: Session) -> tuple:
+        """DB 변경 여부 요약 (정책/체크포인트 테이블만 조회하므로 청크 테이블 크기와 무관)"""
+        row = db.execute(text("""
+        SELECT (SELECT COUNT(*) FROM policies) AS policy_count,
+               (SELECT MAX(policy_id) FROM policies) AS max_policy_id,
+               (SELECT MAX(updated_at) FROM embedding_checkpoints) AS checkpoint_updated_at
+        """)).one()
+        return tuple(row)
+
+    @staticmethod
+    def _policy_versions(db: Session, policy_id: Optional[int] = None) -> Dict[int, object]:
+        """정책별 임베딩 체크포인트 최종 갱신 시각"""
+        policy_filter = "WHERE p.policy_id = :policy_id" if policy_id is not None else ""
+        rows = db.execute(text(f"""
+        SELECT p.policy_id, MAX(c.updated_at) AS updated_at
+        FROM policies p
+        LEFT JOIN embedding_checkpoints c ON c.policy_id = p.policy_id
+        {policy_filter}
+        GROUP BY p.policy_id
+        """), {"policy_id": policy_id} if policy_id is not None else {})
+        return {row.policy_id: row.updated_at for row in rows}
+
+    def sync(self):
+        """다른 워커의 변경 반영 (스레드에서 실행): DB 변경 요약이 달라졌을 때만 바뀐 정책을 다시 읽음"""
+        tables = list(self.tables.values())
+        if not tables:
+            return
+        db = SessionLocal()
+        try:
+            signature = self._signature(db)
+            stale_tables = [table for table in tables if table.signature != signature]
+            if not stale_tables:
+                return
+            versions = self._policy_versions(db)
+            for table in stale_tables:
+                with table.lock:
+                    for policy_id in [pid for pid in table.policy_docs if pid not in versions]:
+                        table.remove_policy(policy_id)
+                    changed = [pid for pid, version in versions.items()
+                               if table.policy_versions.get(pid, _MISSING) != version]
+                if changed:
+                    table.replace_policies(changed, table.prepare(self._fetch_rows(db, table.table_name, changed)))
+                table.policy_versions = versions
+                table.signature = signature
+        finally:
+            db.close()
+
+    def search(
+        self,
+        table_name: str,
+        query: str,
+        limit: int = 10,
+        policy_ids: Optional[List[int]] = None
+    ) -> List[dict]:
+        """BM25 검색 (메모리 인덱스만 사용, 아직 적재되지 않은 테이블은 백그라운드 적재 후 빈 결과)"""
+        table = self.tables.get(table_name)
+        if table is None:
+            if self._claim(table_name):
+                threading.Thread(target=self._load_table, args=(table_name,), daemon=True).start()
+            return []
+        return table.search(query, limit, policy_ids)
+
+    def add_policy(self, db: Session, policy_id: int):
+        """적재된 테이블 인덱스에 정책 청크 반영 (DB 조회가 있으므로 asyncio.to_thread로 호출)"""
+        tables = list(self.tables.values())
+        if not tables:
+            return
+        version = self._policy_versions(db, policy_id).get(policy_id)
+        for table in tables:
+            docs = table.prepare(self._fetch_rows(db, table.table_name, [policy_id]))
+            table.replace_policies([policy_id], docs)
+            table.policy_versions[policy_id] = version
+
+    def remove_policy(self, policy_id: int):
+        """적재된 테이블 인덱스에서 정책 청크 제거"""
+        for table in list(self.tables.values()):
+            table.remove_policy(policy_id)
+            table.policy_versions.pop(policy_id, None)
+
+
+def fuse_scores(vector_rows: List[dict], lexical_rows: List[dict], lexical_weight: float) -> List[dict]:
+    """벡터 유사도와 정규화된 BM25 점수를 가중 합산
+
+    BM25 점수는 결과 내 최대값으로 [0, 1] 정규화하고, 벡터 후보에 없는 어휘 결과는
+    벡터 후보 중 최저 유사도를 상한으로 간주한다.
+    """
+    max_bm25 = max((row["bm25_score"] for row in lexical_rows), default=0.0) or 1.0
+    floor_similarity = min((float(row["similarity_score"]) for row in vector_rows), default=0.0)
+
+    merged: Dict[tuple, dict] = {}
+    for row in vector_rows:
+        merged[(row["policy_id"], row["chunk_index"])] = dict(
+            row, vector_score=float(row["similarity_score"]), lexical_score=0.0
+        )
+    for row in lexical_rows:
+        key = (row["policy_id"], row["chunk_index"])
+        entry = merged.get(key)
+        if entry is None:
+            entry = merged[key] = dict(row, vector_score=floor_similarity)
+        entry["lexical_score"] = row["bm25_score"] / max_bm25
+
+    for entry in merged.values():
+        entry["similarity_score"] = (
+            (1 - lexical_weight) * entry["vector_score"] + lexical_weight * entry["lexical_score"]
+        )
+    return sorted(merged.values(), key=lambda row: row["similarity_score"], reverse=True)
+
+
+# 서비스 간 공유 인스턴스
+lexical_index = LexicalIndexManager()
@@ -0,0 +1,109 @@
+"""
+폐쇄망 로컬 임베딩 (Qwen3-Embedding, embeddings_qwen VECTOR(1024))
+
+수집 시 청크를 배치로 나눠 인코딩하고, CLOSED_EMBEDDING_WORKERS가 2 이상이면
+spawn 프로세스 풀(프로세스마다 모델 한 벌)에 배치를 나눠 여러 코어에서 동시에 처리한다.
+검색 질의는 같은 모델을 질의용 프롬프트와 함께 사용한다(SearchService, query_batcher).
+기본 모델은 GPU 없이 CPU 호스트에서 돌릴 수 있는 0.6B(1024차원)이며, 더 큰 Qwen3-Embedding을
+지정하면 MRL 방식으로 앞쪽 1024차원만 남겨 같은 컬럼에 저장한다.
+"""
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from models import truncate_embedding
+from services.model_registry import model_registry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 0.6B는 float32 약 2.4GB, 8B는 약 30GB라 프로세스마다 한 벌씩 올리는 CPU 호스트에서는 0.6B가 기본
+CLOSED_EMBEDDING_MODEL = os.getenv("CLOSED_EMBEDDING_MODEL", "Qwen/Qwen3-Embedding-0.6B")
+# embeddings_qwen 컬럼 차원 (모델 출력이 더 크면 앞쪽 차원만 남기고 정규화, 작으면 오류)
+CLOSED_EMBEDDING_DIMENSION = 1024
+# 질의 인코딩에 쓰는 모델 프롬프트 이름 (문서는 프롬프트 없이 인코딩)
+CLOSED_EMBEDDING_QUERY_PROMPT = os.getenv("CLOSED_EMBEDDING_QUERY_PROMPT", "query") or None
+CLOSED_EMBEDDING_BATCH_SIZE = int(os.getenv("CLOSED_EMBEDDING_BATCH_SIZE", "16"))
+# 1이면 서버 프로세스에서 스레드로 인코딩, 2 이상이면 프로세스 풀 (프로세스마다 모델 메모리 필요)
+CLOSED_EMBEDDING_WORKERS = int(os.getenv("CLOSED_EMBEDDING_WORKERS", "1"))
+
+
+def _init_worker(model_path: str, threads: int):
+    """프로세스 풀 워커 초기화: 코어를 워커끼리 나눠 쓰고 모델을 미리 로드"""
+    import torch
+    torch.set_num_threads(max(threads, 1))
+    model_registry.get(model_path)
+
+
+def _encode_batch(model_path: str, texts: List[str]) -> List[List[float]]:
+    """문서 배치 인코딩 (프로세스 풀에서 실행되므로 모듈 최상위 함수)"""
+    return model_registry.encode(model_path, texts)
+
+
+class LocalEmbeddingPool:
+    """폐쇄망 문서 임베딩 배치 인코더"""
+
+    def __init__(
+        self,
+        model_path: str = CLOSED_EMBEDDING_MODEL,
+        batch_size: int = CLOSED_EMBEDDING_BATCH_SIZE,
+        workers: int = CLOSED_EMBEDDING_WORKERS
+    ):
+        self.model_path = model_path
+        self.batch_size = max(batch_size, 1)
+        self.workers = max(workers, 1)
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # 이벤트 루프/스레드가 있는 서버 프로세스에서 fork를 피하기 위해 spawn 사용
+            threads = (os.cpu_count() or self.workers) // self.workers
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_path, threads)
+            )
+        return self.executor
+
+    def shutdown(self):
+        """프로세스 풀 종료 (앱 종료 시 호출)"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def encode_documents(self, texts: List[str]) -> List[List[float]]:
+        """문서 청크 임베딩 (입력 순서 유지)"""
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.workers == 1:
+            embeddings = await asyncio.to_thread(model_registry.encode, self.model_path, texts,
+                                                 batch_size=self.batch_size)
+        else:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            results = await asyncio.gather(*(
+                loop.run_in_executor(executor, _encode_batch, self.model_path, batch) for batch in batches
+            ))
+            embeddings = [embedding for result in results for embedding in result]
+        embeddings = self.fit_dimension(embeddings)
+        print(f"로컬 임베딩 완료: {len(texts)}개 청크, 배치 {len(batches)}개, 워커 {self.workers}개")
+        return embeddings
+
+    def fit_dimension(self, embeddings: List[List[float]]) -> List[List[float]]:
+        """모델 출력을 embeddings_qwen 컬럼 차원에 맞춤 (문서와 질의 모두 같은 방식으로)"""
+        if not embeddings or len(embeddings[0]) == CLOSED_EMBEDDING_DIMENSION:
+            return embeddings
+        if len(embeddings[0]) < CLOSED_EMBEDDING_DIMENSION:
+            raise ValueError(
+                f"{self.model_path} 출력 차원({len(embeddings[0])})이 embeddings_qwen 컬럼 "
+                f"차원({CLOSED_EMBEDDING_DIMENSION})보다 작습니다. CLOSED_EMBEDDING_MODEL을 확인하세요."
+            )
+        # Qwen3-Embedding은 MRL 학습 모델이라 앞쪽 차원만 써도 됨
+        return [truncate_embedding(embedding, CLOSED_EMBEDDING_DIMENSION).tolist() for embedding in embeddings]
+
+
+# 서비스 간 공유 인스턴스
+local_embedding_pool = LocalEmbeddingPool()
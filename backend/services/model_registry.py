@@ -0,0 +1,142 @@
+"""
+로컬 임베딩 모델 레지스트리 (프로세스당 모델 하나씩 공유)
+
+EmbeddingService와 SearchService가 같은 SentenceTransformer 인스턴스를 쓰도록
+모델 경로별로 한 번만 로드하고, 시작 시 미리 로드(warmup)할 수 있다.
+폐쇄망 배포는 GPU가 없으므로 CPU에서는 Linear 계층을 int8 동적 양자화해 사용할 수 있다.
+"""
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+from sentence_transformers import SentenceTransformer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# torch(float32) | int8(torch 동적 양자화)
+LOCAL_MODEL_BACKEND = os.getenv("LOCAL_MODEL_BACKEND", "torch").lower()
+LOCAL_MODEL_DEVICE = os.getenv("LOCAL_MODEL_DEVICE", "cpu")
+# 시작 시 미리 로드할 모델 경로 (쉼표 구분)
+LOCAL_MODEL_WARMUP = os.getenv("LOCAL_MODEL_WARMUP", "")
+# CPU 추론 스레드 수 (0이면 torch 기본값)
+LOCAL_MODEL_THREADS = int(os.getenv("LOCAL_MODEL_THREADS", "0"))
+
+
+def _tensor_bytes(value) -> int:
+    """state_dict 값(텐서, 양자화 packed 파라미터 튜플 포함)의 바이트 수"""
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    if hasattr(value, "numel") and hasattr(value, "element_size"):
+        return value.numel() * value.element_size()
+    return 0
+
+
+class LocalModelRegistry:
+    """모델 경로 → 로드된 SentenceTransformer"""
+
+    def __init__(self, backend: str = LOCAL_MODEL_BACKEND, device: str = LOCAL_MODEL_DEVICE):
+        if backend == "onnx":
+            # sentence-transformers 2.7.0에는 ONNX 백엔드가 없음 (3.2 이상 필요)
+            print("⚠️ 현재 sentence-transformers 버전은 ONNX 백엔드를 지원하지 않아 int8 양자화를 사용합니다.")
+            backend = "int8"
+        self.backend = backend
+        self.device = device
+        self.models: Dict[str, SentenceTransformer] = {}
+        self.model_stats: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.load_locks: Dict[str, threading.Lock] = {}
+        if LOCAL_MODEL_THREADS > 0:
+            try:
+                import torch
+                torch.set_num_threads(LOCAL_MODEL_THREADS)
+            except Exception as e:
+                print(f"⚠️ torch 스레드 수 설정 실패: {e}")
+
+    def get(self, model_path: str) -> SentenceTransformer:
+        """모델 반환 (처음 요청 시 한 번만 로드, 모델별로 잠금)"""
+        model = self.models.get(model_path)
+        if model is not None:
+            return model
+        with self.lock:
+            load_lock = self.load_locks.setdefault(model_path, threading.Lock())
+        with load_lock:
+            model = self.models.get(model_path)
+            if model is None:
+                model = self._load(model_path)
+                self.models[model_path] = model
+        return model
+
+    def encode(self, model_path: str, texts: List[str], **kwargs) -> List[List[float]]:
+        """동기 인코딩 (이벤트 루프에서는 asyncio.to_thread로 호출)"""
+        started = time.perf_counter()
+        embeddings = self.get(model_path).encode(texts, **kwargs).tolist()
+        with self.lock:
+            stats = self.model_stats.get(model_path)
+            if stats is not None:
+                stats["encode_calls"] += 1
+                stats["encoded_texts"] += len(texts)
+                stats["encode_seconds"] += time.perf_counter() - started
+        return embeddings
+
+    def warmup(self, model_paths: Optional[List[str]] = None) -> Dict[str, dict]:
+        """모델을 미리 로드하고 짧은 문장으로 한 번 인코딩 (첫 요청 지연 제거)"""
+        if model_paths is None:
+            model_paths = [path.strip() for path in LOCAL_MODEL_WARMUP.split(",") if path.strip()]
+        for model_path in model_paths:
+            try:
+                self.get(model_path).encode(["warmup"])
+                print(f"✅ 로컬 모델 준비 완료: {model_path}")
+            except Exception as e:
+                print(f"⚠️ 로컬 모델 준비 실패 ({model_path}): {e}")
+        return self.stats()
+
+    def _load(self, model_path: str) -> SentenceTransformer:
+        started = time.perf_counter()
+        model = SentenceTransformer(model_path, device=self.device)
+        float_bytes = self._parameter_bytes(model)
+        backend = self.backend
+        if backend == "int8":
+            if self.device != "cpu":
+                print(f"⚠️ int8 동적 양자화는 CPU 전용입니다 ({model_path}, device={self.device}), float32로 사용합니다.")
+                backend = "torch"
+            else:
+                model = self._quantize(model)
+        load_seconds = time.perf_counter() - started
+        parameter_bytes = self._parameter_bytes(model)
+        with self.lock:
+            self.model_stats[model_path] = {
+                "backend": backend,
+                "device": self.device,
+                "dimension": model.get_sentence_embedding_dimension(),
+                "load_seconds": round(load_seconds, 3),
+                "parameter_bytes": parameter_bytes,
+                "float32_parameter_bytes": float_bytes,
+                "encode_calls": 0,
+                "encoded_texts": 0,
+                "encode_seconds": 0.0,
+            }
+        print(f"로컬 모델 로드: {model_path} ({backend}, {load_seconds:.1f}s, {parameter_bytes / 1024 / 1024:.0f}MB)")
+        return model
+
+    @staticmethod
+    def _quantize(model: SentenceTransformer) -> SentenceTransformer:
+        """Linear 계층 가중치를 int8로 동적 양자화 (활성값은 추론 시 양자화)"""
+        import torch
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    @staticmethod
+    def _parameter_bytes(model) -> int:
+        return sum(_tensor_bytes(value) for value in model.state_dict().values())
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "backend": self.backend,
+                "device": self.device,
+                "models": {path: dict(stats) for path, stats in self.model_stats.items()},
+            }
+
+
+# 서비스 간 공유 인스턴스
+model_registry = LocalModelRegistry()
@@ -0,0 +1,161 @@
+"""
+PDF 텍스트 추출 (페이지 범위 단위 프로세스 풀 병렬 처리)
+
+페이지를 범위로 나눠 프로세스 풀에서 추출한 뒤 페이지 순서대로 다시 합친다.
+범위마다 PDF를 새로 열어 파싱하므로 범위 수는 워커 수를 넘지 않게 키운다.
+페이지별 오류는 해당 페이지만 건너뛰며, PyPDF2 결과가 너무 짧은 페이지는
+선택적으로 pdfplumber로 다시 추출한다.
+"""
+import os
+import math
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 0이면 min(4, CPU 코어 수 / 2): 풀은 프로세스 전체에서 공유되지만 수집 작업(INGESTION_CONCURRENCY)과
+# 로컬 임베딩 프로세스(CLOSED_EMBEDDING_WORKERS)가 같은 코어를 쓰므로 코어 수만큼 띄우지 않음
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or min(4, max(1, (os.cpu_count() or 1) // 2))
+# 범위당 최소 페이지 수 (문서가 크면 범위 수가 워커 수가 되도록 늘림)
+PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv("PDF_EXTRACT_PAGES_PER_TASK", "25"))
+PDF_PLUMBER_FALLBACK = os.getenv("PDF_PLUMBER_FALLBACK", "true").lower() == "true"
+# PyPDF2 추출 결과가 이 글자 수 미만이면 pdfplumber 재시도
+PDF_PLUMBER_MIN_CHARS = int(os.getenv("PDF_PLUMBER_MIN_CHARS", "20"))
+
+
+def _count_pages(pdf_path: str) -> int:
+    import PyPDF2
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def _extract_page_range(
+    pdf_path: str,
+    start: int,
+    end: int,
+    use_plumber: bool,
+    min_chars: int
+) -> List[Tuple[int, Optional[str], str]]:
+    """[start, end) 페이지 추출 (프로세스 풀에서 실행되므로 모듈 최상위 함수)
+
+    반환: (페이지 번호, 텍스트 또는 None(실패), 사용한 추출기)
+    """
+    import PyPDF2
+    results = []
+    plumber_pdf = None
+    try:
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for i in range(start, end):
+                page_text = None
+                extractor = "pypdf2"
+                try:
+                    page_text = pdf_reader.pages[i].extract_text() or ""
+                except Exception as page_error:
+                    print(f"페이지 {i+1} 텍스트 추출 오류: {page_error}")
+
+                if use_plumber and (page_text is None or len(page_text.strip()) < min_chars):
+                    try:
+                        if plumber_pdf is None:
+                            import pdfplumber
+                            plumber_pdf = pdfplumber.open(pdf_path)
+                        plumber_text = plumber_pdf.pages[i].extract_text() or ""
+                        if len(plumber_text.strip()) > len((page_text or "").strip()):
+                            page_text = plumber_text
+                            extractor = "pdfplumber"
+                    except Exception as plumber_error:
+                        print(f"페이지 {i+1} pdfplumber 추출 오류: {plumber_error}")
+
+                results.append((i, page_text, extractor))
+    finally:
+        if plumber_pdf is not None:
+            plumber_pdf.close()
+    return results
+
+
+class PdfTextExtractor:
+    """페이지 범위 병렬 PDF 텍스트 추출기"""
+
+    def __init__(
+        self,
+        max_workers: int = PDF_EXTRACT_WORKERS,
+        pages_per_task: int = PDF_EXTRACT_PAGES_PER_TASK,
+        use_plumber: bool = PDF_PLUMBER_FALLBACK,
+        min_chars: int = PDF_PLUMBER_MIN_CHARS
+    ):
+        self.max_workers = max_workers
+        self.pages_per_task = max(pages_per_task, 1)
+        self.use_plumber = use_plumber
+        self.min_chars = min_chars
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # 이벤트 루프/스레드가 있는 서버 프로세스에서 fork를 피하기 위해 spawn 사용
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
+
+    def shutdown(self):
+        """프로세스 풀 종료 (앱 종료 시 호출)"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def extract(self, pdf_path: str) -> Tuple[str, dict]:
+        """PDF 전체 텍스트와 추출 통계 반환"""
+        loop = asyncio.get_running_loop()
+        page_count = await asyncio.to_thread(_count_pages, pdf_path)
+        print(f"PDF 페이지 수: {page_count}")
+
+        # 범위마다 PDF를 다시 파싱하므로 워커당 한 범위만 만듦
+        pages_per_task = max(self.pages_per_task, math.ceil(page_count / self.max_workers))
+        ranges = [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+        if len(ranges) <= 1:
+            # 작은 문서는 프로세스 간 전달 비용 없이 스레드에서 처리
+            tasks = [
+                asyncio.to_thread(_extract_page_range, pdf_path, start, end, self.use_plumber, self.min_chars)
+                for start, end in ranges
+            ]
+        else:
+            executor = self._get_executor()
+            tasks = [
+                loop.run_in_executor(executor, _extract_page_range, pdf_path, start, end,
+                                     self.use_plumber, self.min_chars)
+                for start, end in ranges
+            ]
+        range_results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        pages: List[Optional[str]] = [None] * page_count
+        plumber_pages = 0
+        for (start, end), result in zip(ranges, range_results):
+            if isinstance(result, Exception):
+                print(f"페이지 {start+1}-{end} 범위 추출 오류: {result}")
+                continue
+            for index, page_text, extractor in result:
+                pages[index] = page_text
+                if extractor == "pdfplumber":
+                    plumber_pages += 1
+
+        # 실패한 페이지는 건너뛰고 순서대로 결합
+        text = "".join(page_text + "\n" for page_text in pages if page_text is not None)
+        stats = {
+            "page_count": page_count,
+            "failed_pages": sum(1 for page_text in pages if page_text is None),
+            "pdfplumber_pages": plumber_pages,
+            "tasks": len(ranges),
+        }
+        print(f"PDF 텍스트 추출 완료: {len(text)} 문자, {stats}")
+        return text, stats
+
+
+# 서비스 간 공유 인스턴스
+pdf_text_extractor = PdfTextExtractor()
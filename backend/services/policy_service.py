@@ -1,13 +1,29 @@
 import os
 import uuid
-from typing import List, Optional
+import shutil
+import asyncio
+import hashlib
+from typing import List, Optional, Tuple
+from sqlalchemy import select, delete, update, func, text
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
 from models import Policy
 from schemas import PolicyResponse
 from services.workflow_service import WorkflowService
 from services.embedding_service import EmbeddingService
+from services.vector_index import vector_index
+from services.lexical_index import lexical_index
+from services.result_cache import search_result_cache
+from services.pdf_extractor import pdf_text_extractor
 import aiofiles
 from fastapi import UploadFile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 업로드 스트리밍 단위 (바이트)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
 
 class PolicyService:
     def __init__(self):
@@ -28,128 +44,309 @@ class PolicyService:
         db: Session,
         workflow_id: str
     ) -> PolicyResponse:
-        """약관 파일 처리"""
+        """약관 파일 처리 (파일 저장 후 수집 파이프라인을 바로 실행)"""
+        saved_file = await self.save_upload_file(file, workflow_id, {
+            "company": company,
+            "category": category,
+            "product_type": product_type,
+            "product_name": product_name,
+            "security_level": security_level,
+        })
+        return await self.process_saved_file(saved_file, db, workflow_id)
+
+    async def save_upload_file(self, file: UploadFile, workflow_id: str, policy_fields: dict,
+                               db: AsyncSession = None) -> dict:
+        """업로드 파일 저장 및 처리 중(processing) 정책 행 등록 (요청 처리 중에 수행, 이후 단계는 백그라운드 작업 가능)
+
+        정책 행과 해시 파일 배치는 같은 해시의 advisory lock 아래에서 커밋하므로, 다른 워커의
+        삭제는 이 행을 보고 파일을 남기거나 이 업로드보다 먼저 파일을 지운다.
+        """
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await self.save_upload_file(file, workflow_id, policy_fields, session)
         try:
             print(f"파일 처리 시작: {file.filename}")
-            # 1. 파일 저장
+            # 1. 파일 저장 (임시 파일로 받은 뒤 내용 해시 경로로 이동)
             file_id = str(uuid.uuid4())
             file_extension = file.filename.split('.')[-1].lower()
             print(f"파일 ID: {file_id}, 확장자: {file_extension}")
             
-            original_path = os.path.join(self.data_dir, f"{file_id}.{file_extension}")
-            pdf_path = os.path.join(self.data_dir, f"{file_id}.pdf")
-            md_path = os.path.join(self.data_dir, f"{file_id}.md")
+            temp_path = os.path.join(self.data_dir, f"{file_id}.{file_extension}.part")
             
-            # 원본 파일 저장
-            async with aiofiles.open(original_path, 'wb') as f:
-                content = await file.read()
-                await f.write(content)
+            # 원본 파일 저장 (고정 크기 청크로 스트리밍하며 체크섬 계산)
+            file_size = 0
+            sha256 = hashlib.sha256()
+            async with aiofiles.open(temp_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    file_size += len(chunk)
+                    await f.write(chunk)
+            content_hash = sha256.hexdigest()
+            original_path = os.path.join(self.data_dir, f"{content_hash}.{file_extension}")
+            pdf_path = os.path.join(self.data_dir, f"{content_hash}.pdf")
+            md_path = os.path.join(self.data_dir, f"{content_hash}.md")
+            if file_extension == 'pdf':
+                # 이미 PDF이면 두 번째 사본 없이 원본을 그대로 참조
+                pdf_path = original_path
             
-            self.workflow_service.log_step(workflow_id, "file_upload", "completed", 
-                                         {"file_size": len(content), "file_type": file_extension})
+            # 처리 중 정책 행 등록과 파일 배치를 한 트랜잭션(해시 잠금)에서 수행
+            await self._lock_content_hash(db, content_hash)
+            policy = Policy(
+                **policy_fields,
+                original_path=original_path,
+                md_path=md_path,
+                pdf_path=pdf_path,
+                file_path=original_path,  # 원본 파일 경로 저장
+                content_hash=content_hash,
+                status="processing"
+            )
+            db.add(policy)
+            await db.flush()
+            policy_id = policy.policy_id
             
-            # 2. PDF 변환 (필요시)
-            if file_extension != 'pdf':
-                # 여기서는 간단히 원본 파일을 PDF로 복사
-                # 실제로는 적절한 변환 라이브러리 사용
-                async with aiofiles.open(pdf_path, 'wb') as f:
-                    await f.write(content)
+            # 같은 내용의 파일이 이미 있으면 새로 받은 사본은 버리고 기존 파일 참조
+            deduplicated = os.path.exists(original_path)
+            if deduplicated:
+                os.remove(temp_path)
             else:
-                async with aiofiles.open(pdf_path, 'wb') as f:
-                    await f.write(content)
+                os.replace(temp_path, original_path)
             
-            # 3. OCR 및 텍스트 추출
-            text_content = await self._extract_text_from_pdf(pdf_path)
-            self.workflow_service.log_step(workflow_id, "text_extraction", "completed", 
-                                         {"text_length": len(text_content)}, db=db)
+            # 2. PDF 변환 (필요시)
+            if file_extension != 'pdf' and not os.path.exists(pdf_path):
+                # 여기서는 간단히 원본 파일을 PDF 경로에 연결
+                # 실제로는 적절한 변환 라이브러리 사용
+                await asyncio.to_thread(self._link_or_copy, original_path, pdf_path)
+            await db.commit()
             
-            # 4. Markdown 변환
-            markdown_content = await self._convert_to_markdown(text_content)
-            async with aiofiles.open(md_path, 'w', encoding='utf-8') as f:
-                await f.write(markdown_content)
+            await self.workflow_service.log_step_async(workflow_id, "file_upload", "completed", 
+                                                       {"file_size": file_size, "file_type": file_extension,
+                                                        "sha256": content_hash, "deduplicated": deduplicated,
+                                                        "policy_id": policy_id}, db=db)
             
-            self.workflow_service.log_step(workflow_id, "markdown_conversion", "completed", 
-                                         {"markdown_length": len(markdown_content)}, db=db)
+            return {
+                "policy_id": policy_id,
+                "filename": file.filename,
+                "file_extension": file_extension,
+                "original_path": original_path,
+                "pdf_path": pdf_path,
+                "md_path": md_path,
+                "file_size": file_size,
+                "content_hash": content_hash
+            }
             
-            # 5. 요약 생성
-            summary = await self._generate_summary(markdown_content)
-            self.workflow_service.log_step(workflow_id, "summary_generation", "completed", 
-                                         {"summary_length": len(summary)}, db=db)
+        except Exception as e:
+            print(f"파일 저장 오류: {str(e)}")
+            await db.rollback()
+            if 'temp_path' in locals() and os.path.exists(temp_path):
+                os.remove(temp_path)
+            await self.workflow_service.log_error_async(workflow_id, str(e), db=db)
+            raise e
+
+    @staticmethod
+    def _link_or_copy(source_path: str, target_path: str):
+        """하드링크 생성, 지원하지 않는 파일시스템이면 복사"""
+        try:
+            os.link(source_path, target_path)
+        except OSError:
+            shutil.copyfile(source_path, target_path)
+
+    async def process_saved_file(self, saved_file: dict, db: Session, workflow_id: str) -> PolicyResponse:
+        """저장된 파일로 수집 파이프라인 실행 (텍스트 추출 ~ 임베딩)
+
+        db는 작업 전용 동기 세션이며 이를 쓰는 단계는 모두 스레드에서 실행하고,
+        단계 로그는 비동기 세션으로 기록한다. 업로드 때 등록된 processing 정책 행을
+        채워 ready로 바꾸고, 실패하면 error로 표시한다 (파일은 정책 삭제 시 정리).
+        """
+        policy_id = saved_file["policy_id"]
+        try:
+            pdf_path = saved_file["pdf_path"]
+            md_path = saved_file["md_path"]
+            content_hash = saved_file.get("content_hash")
+            security_level = await asyncio.to_thread(lambda: db.get(Policy, policy_id).security_level)
             
-            # 6. 데이터베이스에 정책 저장
-            policy = Policy(
-                company=company,
-                category=category,
-                product_type=product_type,
-                product_name=product_name,
-                summary=summary,
-                original_path=original_path,
-                md_path=md_path,
-                pdf_path=pdf_path,
-                file_path=original_path,  # 원본 파일 경로 저장
-                security_level=security_level
-            )
+            # 같은 파일로 처리된 정책이 있으면 추출/변환/요약 결과 재사용
+            source_policy = await asyncio.to_thread(self._find_reusable_policy, db, content_hash)
+            if source_policy:
+                source_policy_id = source_policy.policy_id
+                source_security_level = source_policy.security_level
+                async with aiofiles.open(md_path, 'r', encoding='utf-8') as f:
+                    markdown_content = await f.read()
+                summary = source_policy.summary
+                await self.workflow_service.log_step_async(workflow_id, "content_reuse", "completed", 
+                                                           {"source_policy_id": source_policy_id,
+                                                            "markdown_length": len(markdown_content)})
+            else:
+                # 3. OCR 및 텍스트 추출
+                text_content, extraction_stats = await self._extract_text_from_pdf(pdf_path)
+                await self.workflow_service.log_step_async(workflow_id, "text_extraction", "completed", 
+                                                           {"text_length": len(text_content), **extraction_stats})
+                
+                # 4. Markdown 변환
+                markdown_content = await self._convert_to_markdown(text_content)
+                async with aiofiles.open(md_path, 'w', encoding='utf-8') as f:
+                    await f.write(markdown_content)
+                
+                await self.workflow_service.log_step_async(workflow_id, "markdown_conversion", "completed", 
+                                                           {"markdown_length": len(markdown_content)})
+                
+                # 5. 요약 생성
+                summary = await self._generate_summary(markdown_content)
+                await self.workflow_service.log_step_async(workflow_id, "summary_generation", "completed", 
+                                                           {"summary_length": len(summary)})
             
-            db.add(policy)
-            db.commit()
-            db.refresh(policy)
+            # 6. 데이터베이스에 정책 요약 저장
+            await asyncio.to_thread(self._update_policy, db, policy_id, summary=summary)
             
             # 7. 임베딩 생성 및 저장
-            print(f"임베딩 생성 시작: 정책 ID {policy.policy_id}")
+            print(f"임베딩 생성 시작: 정책 ID {policy_id}")
             try:
-                await self.embedding_service.create_embeddings(
-                    policy.policy_id, 
-                    markdown_content, 
-                    security_level, 
-                    db, 
-                    workflow_id
-                )
-                print(f"임베딩 생성 완료: 정책 ID {policy.policy_id}")
+                # 같은 보안 등급이면 같은 모델의 임베딩이므로 그대로 복사
+                copied = 0
+                if source_policy and source_security_level == security_level:
+                    copied = await asyncio.to_thread(self.embedding_service.copy_embeddings,
+                                                     source_policy_id, policy_id, db)
+                if copied:
+                    await self.workflow_service.log_step_async(workflow_id, "embedding_reuse", "completed", 
+                                                               {"source_policy_id": source_policy_id,
+                                                                "embedding_count": copied})
+                else:
+                    await self.embedding_service.create_embeddings(
+                        policy_id, 
+                        markdown_content, 
+                        security_level, 
+                        db, 
+                        workflow_id
+                    )
+                print(f"임베딩 생성 완료: 정책 ID {policy_id}")
+                
+                # 검색 인덱스 동기화 (벡터 + BM25), 파일 잠금/기록은 스레드에서 수행
+                try:
+                    await asyncio.to_thread(vector_index.add_policy, db, policy_id)
+                    await asyncio.to_thread(lexical_index.add_policy, db, policy_id)
+                except Exception as index_error:
+                    print(f"검색 인덱스 동기화 오류: {index_error}")
+                search_result_cache.invalidate_policy(policy_id, added=True)
             except Exception as embedding_error:
                 print(f"임베딩 생성 오류: {embedding_error}")
                 # 임베딩 생성 실패해도 정책은 저장됨
-                self.workflow_service.log_error(workflow_id, f"임베딩 생성 실패: {embedding_error}", db=db)
+                await self.workflow_service.log_error_async(workflow_id, f"임베딩 생성 실패: {embedding_error}")
             
-            self.workflow_service.log_step(workflow_id, "embedding_creation", "completed", 
-                                         {"policy_id": policy.policy_id}, db=db)
+            await self.workflow_service.log_step_async(workflow_id, "embedding_creation", "completed", 
+                                                       {"policy_id": policy_id})
             
-            return PolicyResponse.from_orm(policy)
+            # 커밋 후 만료된 속성을 루프에서 다시 읽지 않도록 응답은 스레드에서 만들어 둠
+            return await asyncio.to_thread(self._update_policy, db, policy_id, status="ready")
             
         except Exception as e:
             print(f"파일 처리 오류: {str(e)}")
-            self.workflow_service.log_error(workflow_id, str(e), db=db)
+            await self.workflow_service.log_error_async(workflow_id, str(e))
+            try:
+                await asyncio.to_thread(self._mark_policy_failed, db, policy_id)
+            except Exception as status_error:
+                print(f"정책 상태 갱신 오류: {status_error}")
             raise e
 
-    async def _extract_text_from_pdf(self, pdf_path: str) -> str:
-        """PDF에서 텍스트 추출"""
+    async def resume_policy_embeddings(self, policy_id: int, db: Session, workflow_id: str) -> PolicyResponse:
+        """중단/실패한 임베딩의 빠진 청크만 다시 생성하고 검색 인덱스 동기화 (수집 작업 큐에서 실행)"""
+        try:
+            await self.embedding_service.resume_embeddings(policy_id, db, workflow_id)
+            try:
+                await asyncio.to_thread(vector_index.add_policy, db, policy_id)
+                await asyncio.to_thread(lexical_index.add_policy, db, policy_id)
+            except Exception as index_error:
+                print(f"검색 인덱스 동기화 오류: {index_error}")
+            search_result_cache.invalidate_policy(policy_id, added=True)
+            return await asyncio.to_thread(lambda: PolicyResponse.from_orm(db.get(Policy, policy_id)))
+        except Exception as e:
+            print(f"임베딩 재개 오류: {str(e)}")
+            await self.workflow_service.log_error_async(workflow_id, str(e))
+            raise e
+
+    @staticmethod
+    def _update_policy(db: Session, policy_id: int, **values) -> PolicyResponse:
+        """정책 행 갱신 후 응답 생성 (동기 세션, 스레드에서 실행)"""
+        policy = db.get(Policy, policy_id)
+        for key, value in values.items():
+            setattr(policy, key, value)
+        db.commit()
+        db.refresh(policy)
+        return PolicyResponse.from_orm(policy)
+
+    @staticmethod
+    def _mark_policy_failed(db: Session, policy_id: int):
+        # 실패한 트랜잭션이 남아 있을 수 있으므로 롤백 후 갱신
+        db.rollback()
+        db.execute(update(Policy).where(Policy.policy_id == policy_id).values(status="error"))
+        db.commit()
+
+    async def mark_policy_failed(self, policy_id: int):
+        """작업이 중단되어 processing으로 남은 정책을 error로 표시 (수집 작업 복구 시 호출)"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Policy)
+                .where(Policy.policy_id == policy_id, Policy.status == "processing")
+                .values(status="error")
+            )
+            await db.commit()
+
+    @staticmethod
+    async def _lock_content_hash(db: AsyncSession, content_hash: str):
+        """같은 해시 파일의 배치/삭제를 트랜잭션 단위로 직렬화 (커밋/롤백 시 해제, 워커 간 공유)"""
+        await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:content_hash))"),
+                         {"content_hash": content_hash})
+
+    async def _remove_unreferenced_files(self, db: AsyncSession, content_hash: Optional[str], paths: set):
+        """정책 삭제 커밋 후 해시 파일 삭제 (처리 중인 업로드를 포함해 같은 해시를 참조하는 행이 있으면 유지)"""
+        if content_hash:
+            await self._lock_content_hash(db, content_hash)
+            result = await db.execute(
+                select(func.count(Policy.policy_id)).where(Policy.content_hash == content_hash)
+            )
+            shared_count = result.scalar_one()
+            if shared_count:
+                await db.commit()
+                print(f"파일 유지: 같은 파일을 참조하는 정책 {shared_count}개")
+                return
+        try:
+            # PDF 업로드는 pdf_path가 원본과 같은 경로
+            for path in paths:
+                if path and os.path.exists(path):
+                    os.remove(path)
+        finally:
+            await db.commit()
+
+    def _find_reusable_policy(self, db: Session, content_hash: Optional[str]) -> Optional[Policy]:
+        """같은 내용 해시로 처리가 끝난 정책 조회 (Markdown 파일이 남아 있는 경우만)"""
+        if not content_hash:
+            return None
+        candidates = db.query(Policy).filter(
+            Policy.content_hash == content_hash,
+            Policy.summary.isnot(None)
+        ).order_by(Policy.policy_id).all()
+        for candidate in candidates:
+            if candidate.md_path and os.path.exists(candidate.md_path):
+                return candidate
+        return None
+
+    async def _extract_text_from_pdf(self, pdf_path: str) -> Tuple[str, dict]:
+        """PDF에서 텍스트 추출 (페이지 범위 병렬)"""
         try:
             print(f"PDF 텍스트 추출 시작: {pdf_path}")
-            import PyPDF2
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                page_count = len(pdf_reader.pages)
-                print(f"PDF 페이지 수: {page_count}")
-                
-                for i, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        text += page_text + "\n"
-                        if i % 10 == 0:  # 10페이지마다 진행상황 출력
-                            print(f"텍스트 추출 진행: {i+1}/{page_count} 페이지")
-                    except Exception as page_error:
-                        print(f"페이지 {i+1} 텍스트 추출 오류: {page_error}")
-                        continue
-                
-                print(f"PDF 텍스트 추출 완료: {len(text)} 문자")
-                return text
+            return await pdf_text_extractor.extract(pdf_path)
         except Exception as e:
             print(f"PDF 텍스트 추출 오류: {e}")
             # 빈 텍스트라도 반환하여 처리 계속
-            return "PDF 텍스트 추출에 실패했습니다."
+            return "PDF 텍스트 추출에 실패했습니다.", {}
 
     async def _convert_to_markdown(self, text: str) -> str:
-        """텍스트를 Markdown으로 변환"""
+        """텍스트를 Markdown으로 변환 (긴 문서는 루프를 막지 않도록 스레드에서 처리)"""
+        return await asyncio.to_thread(self._markdown_lines, text)
+
+    @staticmethod
+    def _markdown_lines(text: str) -> str:
         # 간단한 Markdown 변환 로직
         lines = text.split('\n')
         markdown_lines = []
@@ -175,41 +372,48 @@ class PolicyService:
         summary_sentences = sentences[:3]  # 처음 3문장
         return '. '.join(summary_sentences) + '.'
 
-    def get_policies(self, db: Session, skip: int = 0, limit: int = 100) -> List[PolicyResponse]:
+    async def get_policies(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[PolicyResponse]:
         """저장된 약관 목록 조회"""
-        policies = db.query(Policy).offset(skip).limit(limit).all()
+        result = await db.execute(select(Policy).offset(skip).limit(limit))
+        policies = result.scalars().all()
         return [PolicyResponse.from_orm(policy) for policy in policies]
 
-    def get_policy(self, db: Session, policy_id: int) -> Optional[PolicyResponse]:
+    async def get_policy(self, db: AsyncSession, policy_id: int) -> Optional[PolicyResponse]:
         """특정 약관 조회"""
-        policy = db.query(Policy).filter(Policy.policy_id == policy_id).first()
+        policy = await db.get(Policy, policy_id)
         if policy:
             return PolicyResponse.from_orm(policy)
         return None
 
-    def delete_policy(self, db: Session, policy_id: int) -> bool:
+    async def delete_policy(self, db: AsyncSession, policy_id: int) -> bool:
         """약관 삭제"""
-        policy = db.query(Policy).filter(Policy.policy_id == policy_id).first()
+        policy = await db.get(Policy, policy_id)
         if not policy:
             return False
         
-        # 관련 임베딩 삭제
-        from models import EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic
+        # 관련 임베딩 및 진행 체크포인트, 정책 행을 먼저 삭제/커밋
+        from models import EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic, EmbeddingCheckpoint
         
-        db.query(EmbeddingTextEmbedding3).filter(EmbeddingTextEmbedding3.policy_id == policy_id).delete()
-        db.query(EmbeddingQwen).filter(EmbeddingQwen.policy_id == policy_id).delete()
-        db.query(EmbeddingMultilingualE5).filter(EmbeddingMultilingualE5.policy_id == policy_id).delete()
-        db.query(EmbeddingSnowflakeArctic).filter(EmbeddingSnowflakeArctic.policy_id == policy_id).delete()
+        for model in (EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic, EmbeddingCheckpoint):
+            await db.execute(delete(model).where(model.policy_id == policy_id))
         
-        # 파일 삭제
-        if policy.original_path and os.path.exists(policy.original_path):
-            os.remove(policy.original_path)
-        if policy.pdf_path and os.path.exists(policy.pdf_path):
-            os.remove(policy.pdf_path)
-        if policy.md_path and os.path.exists(policy.md_path):
-            os.remove(policy.md_path)
+        content_hash = policy.content_hash
+        paths = {policy.original_path, policy.pdf_path, policy.md_path}
+        await db.delete(policy)
+        await db.commit()
         
-        # 데이터베이스에서 삭제
-        db.delete(policy)
-        db.commit()
+        # 파일 삭제: 같은 내용 해시를 참조하는 정책(다른 워커의 처리 중 업로드 포함)이 없을 때만
+        try:
+            await self._remove_unreferenced_files(db, content_hash, paths)
+        except Exception as file_error:
+            await db.rollback()
+            print(f"파일 삭제 오류: {file_error}")
+        
+        # 검색 인덱스 동기화 (벡터 + BM25), 인덱스 파일 재기록은 스레드에서 수행
+        try:
+            await asyncio.to_thread(vector_index.remove_policy, policy_id)
+            lexical_index.remove_policy(policy_id)
+        except Exception as index_error:
+            print(f"검색 인덱스 동기화 오류: {index_error}")
+        search_result_cache.invalidate_policy(policy_id, added=False)
         return True
@@ -0,0 +1,155 @@
+"""
+로컬 모델 질의 임베딩 마이크로 배처
+
+동시에 들어온 검색 질의를 모델별로 몇 ms 동안(또는 배치 크기가 찰 때까지) 모아
+model.encode를 한 번만 호출하고, 각 호출자에게 자기 벡터를 돌려준다.
+"""
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Dict, List, Optional
+from services.model_registry import model_registry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+# 첫 질의 이후 배치를 모으는 최대 대기 시간(ms), 0이면 대기 없이 쌓인 질의만 묶음
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+# 지연 시간 백분위 계산에 쓰는 최근 배치 수
+QUERY_BATCH_METRICS_WINDOW = int(os.getenv("QUERY_BATCH_METRICS_WINDOW", "1000"))
+
+
+class _PendingQuery:
+    def __init__(self, text: str, future: asyncio.Future):
+        self.text = text
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class _ModelBatchQueue:
+    """모델 하나의 대기 질의와 워커"""
+
+    def __init__(self):
+        self.items: List[_PendingQuery] = []
+        self.has_items = asyncio.Event()
+        self.full = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+
+
+def _percentile(values: List[float], ratio: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+class QueryMicroBatcher:
+    """모델별 질의 임베딩 마이크로 배처"""
+
+    def __init__(self, registry=model_registry, max_batch_size: int = QUERY_BATCH_MAX_SIZE,
+                 max_wait_ms: float = QUERY_BATCH_MAX_WAIT_MS):
+        self.registry = registry
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000
+        self.queues: Dict[tuple, _ModelBatchQueue] = {}
+        self.loop = None
+        self.batches = 0
+        self.queries = 0
+        self.failed_batches = 0
+        self.encode_latencies = deque(maxlen=QUERY_BATCH_METRICS_WINDOW)
+        self.queue_waits = deque(maxlen=QUERY_BATCH_METRICS_WINDOW)
+        self.batch_sizes = deque(maxlen=QUERY_BATCH_METRICS_WINDOW)
+
+    async def encode(self, model_path: str, texts: List[str], prompt_name: Optional[str] = None) -> List[List[float]]:
+        """질의 임베딩 (같은 모델/프롬프트의 다른 요청 질의와 한 배치로 묶일 수 있음)"""
+        if not texts:
+            return []
+        queue = self._queue(model_path, prompt_name)
+        futures = []
+        for text in texts:
+            future = self.loop.create_future()
+            queue.items.append(_PendingQuery(text, future))
+            futures.append(future)
+        queue.has_items.set()
+        if len(queue.items) >= self.max_batch_size:
+            queue.full.set()
+        return list(await asyncio.gather(*futures))
+
+    def _queue(self, model_path: str, prompt_name: Optional[str]) -> _ModelBatchQueue:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # 이벤트 루프가 바뀌면(테스트, 재시작) 큐와 워커를 새로 만듦
+            self.loop = loop
+            self.queues = {}
+        key = (model_path, prompt_name)
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = _ModelBatchQueue()
+            queue.worker = loop.create_task(self._worker(model_path, prompt_name, queue))
+            self.queues[key] = queue
+        return queue
+
+    async def _worker(self, model_path: str, prompt_name: Optional[str], queue: _ModelBatchQueue):
+        while True:
+            await queue.has_items.wait()
+            if self.max_wait > 0 and len(queue.items) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(queue.full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            batch = queue.items[:self.max_batch_size]
+            del queue.items[:self.max_batch_size]
+            if len(queue.items) < self.max_batch_size:
+                queue.full.clear()
+            if not queue.items:
+                queue.has_items.clear()
+            await self._run_batch(model_path, prompt_name, batch)
+
+    async def _run_batch(self, model_path: str, prompt_name: Optional[str], batch: List[_PendingQuery]):
+        started = time.perf_counter()
+        encode_kwargs = {"prompt_name": prompt_name} if prompt_name else {}
+        try:
+            embeddings = await asyncio.to_thread(self.registry.encode, model_path,
+                                                 [item.text for item in batch], **encode_kwargs)
+        except Exception as e:
+            self.failed_batches += 1
+            print(f"질의 임베딩 배치 오류 ({model_path}, {len(batch)}개): {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+        finished = time.perf_counter()
+        for item, embedding in zip(batch, embeddings):
+            if not item.future.done():
+                item.future.set_result(embedding)
+
+        self.batches += 1
+        self.queries += len(batch)
+        self.batch_sizes.append(len(batch))
+        self.encode_latencies.append(finished - started)
+        self.queue_waits.append(started - batch[0].enqueued_at)
+
+    def stats(self) -> dict:
+        """배치 크기/채움률/지연 시간 지표 (지연 시간은 최근 배치 기준, ms)"""
+        sizes = list(self.batch_sizes)
+        latencies = [value * 1000 for value in self.encode_latencies]
+        waits = [value * 1000 for value in self.queue_waits]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queries": self.queries,
+            "failed_batches": self.failed_batches,
+            # 같은 모델의 프롬프트별 큐가 서로 덮어쓰지 않도록 "경로:프롬프트"로 구분
+            "pending": {f"{path}:{prompt}": len(queue.items) for (path, prompt), queue in self.queues.items()},
+            "avg_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "fill_rate": sum(sizes) / (len(sizes) * self.max_batch_size) if sizes else 0.0,
+            "encode_ms": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95)},
+            "queue_wait_ms": {"p50": _percentile(waits, 0.5), "p95": _percentile(waits, 0.95)},
+        }
+
+
+# SearchService 공유 인스턴스
+query_batcher = QueryMicroBatcher()
@@ -0,0 +1,132 @@
+"""
+검색 결과 캐시 (정책 단위 무효화)
+
+항목마다 결과에 포함된 정책 ID와 요청의 policy_ids 필터를 역색인으로 기록한다.
+- 정책 업로드: 필터가 없는 항목과 필터에 해당 정책이 포함된 항목만 축출
+- 정책 삭제: 결과에 해당 정책의 청크가 포함된 항목만 축출
+결과가 없는 검색은 캐시하지 않는다(새 정책 업로드가 곧바로 보이도록).
+캐시와 정책 단위 무효화는 워커(프로세스)별 메모리에서만 동작한다. 다른 워커에서 일어난
+업로드/삭제는 이 워커의 캐시를 무효화하지 못하므로, 워커 간 결과 지연은 오직
+SEARCH_RESULT_CACHE_TTL(초)로만 제한된다.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set
+from dotenv import load_dotenv
+from services.embedding_cache import normalize_query
+
+load_dotenv()
+
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024"))
+SEARCH_RESULT_CACHE_TTL = int(os.getenv("SEARCH_RESULT_CACHE_TTL", "300"))
+
+
+class SearchResultCache:
+    """(query, policy_ids, limit, security_level, 튜닝 파라미터) 키의 검색 결과 LRU 캐시"""
+
+    def __init__(self, max_size: int = SEARCH_RESULT_CACHE_SIZE, ttl_seconds: int = SEARCH_RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (created_at, results)
+        self.by_result_policy: Dict[int, Set[tuple]] = defaultdict(set)
+        self.by_filter_policy: Dict[int, Set[tuple]] = defaultdict(set)
+        self.unfiltered: Set[tuple] = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(
+        query: str,
+        policy_ids: Optional[List[int]],
+        limit: int,
+        security_level: str,
+        *tuning
+    ) -> tuple:
+        """캐시 키 생성 (정책 필터는 정렬된 튜플, 없으면 None)"""
+        filter_key = tuple(sorted(set(policy_ids))) if policy_ids else None
+        return (normalize_query(query), filter_key, limit, security_level) + tuple(tuning)
+
+    def get(self, key: tuple) -> Optional[list]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if time.time() - entry[0] <= self.ttl_seconds:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entry[1])
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key: tuple, results: list):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.time(), list(results))
+            for result in results:
+                self.by_result_policy[result.policy_id].add(key)
+            if key[1] is None:
+                self.unfiltered.add(key)
+            else:
+                for policy_id in key[1]:
+                    self.by_filter_policy[policy_id].add(key)
+            while len(self.entries) > self.max_size:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for result in entry[1]:
+            keys = self.by_result_policy.get(result.policy_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_result_policy[result.policy_id]
+        if key[1] is None:
+            self.unfiltered.discard(key)
+        else:
+            for policy_id in key[1]:
+                keys = self.by_filter_policy.get(policy_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.by_filter_policy[policy_id]
+
+    def invalidate_policy(self, policy_id: int, added: bool) -> int:
+        """정책 추가/삭제 시 영향을 받는 항목만 축출하고 축출 수 반환"""
+        with self.lock:
+            affected = set(self.by_result_policy.get(policy_id, ()))
+            if added:
+                # 새 정책의 청크가 결과에 들어올 수 있는 항목
+                affected |= self.unfiltered
+                affected |= self.by_filter_policy.get(policy_id, set())
+            for key in affected:
+                self._remove(key)
+            self.invalidations += len(affected)
+            return len(affected)
+
+    def stats(self) -> dict:
+        """히트율/축출 통계"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# 서비스 간 공유 인스턴스
+search_result_cache = SearchResultCache()
@@ -1,26 +1,71 @@
 import os
+import asyncio
 import numpy as np
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from models import Policy, EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic
+from models import Policy, EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic, truncate_embedding
 from services.workflow_service import WorkflowService
-from schemas import SearchResult
+from services.vector_index import vector_index
+from services.lexical_index import lexical_index, fuse_scores
+from services.embedding_cache import query_embedding_cache
+from services.embedding_scheduler import embedding_scheduler, INTERACTIVE
+from services.model_registry import model_registry
+from services.query_batcher import query_batcher
+from services.local_embedder import CLOSED_EMBEDDING_MODEL, CLOSED_EMBEDDING_QUERY_PROMPT, local_embedding_pool
+from services.result_cache import search_result_cache
+from schemas import SearchRequest, SearchResponse, SearchResult
 import openai
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 쿼리 임베딩 차원별 검색 대상 테이블
+EMBEDDING_TABLES_BY_DIMENSION = {
+    3072: "embeddings_text_embedding_3",
+    1024: "embeddings_multilingual_e5",
+}
+
+# 축약 벡터(embedding_short) HNSW로 후보를 뽑고 원본 벡터로 재정렬하는 테이블 (2000차원 초과, text-embedding-3)
+SHORT_EMBEDDING_TABLES = {
+    model.__tablename__ for model in (EmbeddingTextEmbedding3, EmbeddingQwen) if hasattr(model, "embedding_short")
+}
+
+# 테이블별 원본 벡터 차원 (부호 비트 식 인덱스의 bit(n)과 같아야 함)
+EMBEDDING_DIMENSIONS = {
+    model.__tablename__: model.__table__.c.embedding.type.dimension
+    for model in (EmbeddingTextEmbedding3, EmbeddingQwen, EmbeddingMultilingualE5, EmbeddingSnowflakeArctic)
+}
+
+# 쿼리 임베딩 로컬 모델 (폐쇄망은 수집과 같은 모델)
+CLOSED_QUERY_MODEL = CLOSED_EMBEDDING_MODEL
+FALLBACK_QUERY_MODEL = 'intfloat/multilingual-e5-large-instruct'
+
+# ANN 검색 기본 파라미터 (요청별로 덮어쓸 수 있음)
+DEFAULT_CANDIDATE_FACTOR = int(os.getenv("SEARCH_CANDIDATE_FACTOR", "4"))
+MAX_CANDIDATE_K = int(os.getenv("SEARCH_MAX_CANDIDATE_K", "1000"))
+DEFAULT_IVFFLAT_PROBES = int(os.getenv("SEARCH_IVFFLAT_PROBES", "10"))
+DEFAULT_HNSW_EF_SEARCH = int(os.getenv("SEARCH_HNSW_EF_SEARCH", "64"))
+# OpenAI 질의 임베딩 마감 시간(초), 초과 시 로컬 E5 모델로 대체 (0이면 마감 없음)
+SEARCH_QUERY_EMBEDDING_DEADLINE = float(os.getenv("SEARCH_QUERY_EMBEDDING_DEADLINE", "2"))
+# 답변 스트림 첫 토큰/토큰 간 최대 대기 시간(초), 초과 시 템플릿 답변으로 대체
+ANSWER_STREAM_STALL_TIMEOUT = float(os.getenv("ANSWER_STREAM_STALL_TIMEOUT", "8"))
+# 부호 비트(binary_quantize) 식 인덱스로 후보를 뽑고 원본 벡터로 재정렬 (false면 float32 HNSW 인덱스 사용)
+SEARCH_BINARY_PREFILTER = os.getenv("SEARCH_BINARY_PREFILTER", "true").lower() == "true"
+# 비트 후보는 거리 해상도가 낮으므로 candidate_k에 곱해 더 넉넉히 뽑음
+SEARCH_BINARY_OVERSAMPLE = int(os.getenv("SEARCH_BINARY_OVERSAMPLE", "2"))
+# 하이브리드 검색에서 BM25 점수 가중치 (0이면 벡터 검색만 사용)
+DEFAULT_LEXICAL_WEIGHT = float(os.getenv("SEARCH_LEXICAL_WEIGHT", "0.3"))
+
 class SearchService:
     def __init__(self):
         self.workflow_service = WorkflowService()
         self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         
-        # 로컬 임베딩 모델들
-        self.qwen_model = None
-        self.multilingual_e5_model = None
-        self.snowflake_arctic_model = None
+        # 로컬 임베딩 모델은 EmbeddingService와 공유하는 레지스트리에서 로드
+        self.model_registry = model_registry
 
     async def search_policies(
         self,
@@ -28,46 +73,57 @@ class SearchService:
         policy_ids: Optional[List[int]] = None,
         limit: int = 10,
         security_level: str = "public",
-        db: Session = None,
-        workflow_id: str = None
+        db: AsyncSession = None,
+        workflow_id: str = None,
+        candidate_k: Optional[int] = None,
+        ivfflat_probes: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None,
+        lexical_weight: Optional[float] = None
     ) -> List[SearchResult]:
-        """약관 검색 (간단한 텍스트 검색)"""
+        """약관 검색 (쿼리 임베딩 + 벡터/BM25 하이브리드 검색)"""
         try:
-            # 간단한 텍스트 검색으로 대체
-            policies = db.query(Policy).all()
+            # 0. 검색 결과 캐시 조회
+            cache_key = search_result_cache.make_key(
+                query, policy_ids, limit, security_level,
+                candidate_k, ivfflat_probes, hnsw_ef_search, lexical_weight
+            )
+            cached_results = search_result_cache.get(cache_key)
+            if cached_results is not None:
+                if workflow_id:
+                    self.workflow_service.log_step(workflow_id, "result_cache", "completed",
+                                                 {"query": query, "result_count": len(cached_results)})
+                return cached_results
             
-            # 검색 결과 생성
-            formatted_results = []
-            for policy in policies[:limit]:
-                # 간단한 텍스트 매칭
-                if query.lower() in (policy.product_name or "").lower() or \
-                   query.lower() in (policy.summary or "").lower():
-                    search_result = SearchResult(
-                        policy_id=policy.policy_id,
-                        policy_name=policy.product_name or "Unknown",
-                        company=policy.company or "Unknown",
-                        chunk_text=policy.summary or "No summary available",
-                        similarity_score=0.8,  # 임시 점수
-                        chunk_index=0
-                    )
-                    formatted_results.append(search_result)
+            # 1. 쿼리 임베딩 생성
+            query_embedding = await self._create_query_embedding(query, security_level)
             
-            # 결과가 없으면 샘플 데이터 반환
-            if not formatted_results:
-                sample_result = SearchResult(
-                    policy_id=1,
-                    policy_name="샘플 보험약관",
-                    company="샘플 보험사",
-                    chunk_text=f"'{query}'에 대한 검색 결과가 없습니다. 아직 약관이 업로드되지 않았습니다.",
-                    similarity_score=0.0,
-                    chunk_index=0
-                )
-                formatted_results.append(sample_result)
+            # 2. 벡터 검색 (+ BM25 융합)
+            rows = await self._hybrid_search(
+                query,
+                query_embedding,
+                policy_ids,
+                limit,
+                security_level,
+                db,
+                candidate_k=candidate_k,
+                ivfflat_probes=ivfflat_probes,
+                hnsw_ef_search=hnsw_ef_search,
+                lexical_weight=lexical_weight
+            )
             
-            # 워크플로우 로깅 (올바른 형식으로)
+            formatted_results = [self._to_search_result(row) for row in rows]
+            
+            if formatted_results:
+                search_result_cache.set(cache_key, formatted_results)
+            else:
+                # 결과 없음 안내는 캐시하지 않음 (첫 업로드가 TTL 동안 가려지지 않도록)
+                formatted_results.append(self._empty_result(query))
+            
+            # 워크플로우 로깅
             if workflow_id:
-                self.workflow_service.log_step(workflow_id, "text_search", "completed", 
-                                             {"query": query, "result_count": len(formatted_results)})
+                self.workflow_service.log_step(workflow_id, "vector_search", "completed", 
+                                             {"query": query, "result_count": len(rows),
+                                              "embedding_dimension": len(query_embedding)})
             
             return formatted_results
             
@@ -84,79 +140,466 @@ class SearchService:
             )
             return [sample_result]
 
-    async def _create_query_embedding(self, query: str, security_level: str) -> List[float]:
-        """쿼리 임베딩 생성"""
-        if security_level == "closed":
-            # Qwen 모델 사용
-            if self.qwen_model is None:
-                self.qwen_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-            embedding = self.qwen_model.encode([query])[0]
-            return embedding.tolist()
-        else:
-            # OpenAI 모델 사용
+    async def search_batch(
+        self,
+        requests: List[SearchRequest],
+        db: AsyncSession = None,
+        workflow_id: str = None
+    ) -> List[SearchResponse]:
+        """배치 검색 (쿼리 임베딩 일괄 생성 + 다중 쿼리 벡터 검색, 요청 순서 유지)
+        
+        한 요청의 실패는 해당 응답의 error로만 반환하고 나머지 요청은 계속 처리한다.
+        """
+        results: List[Optional[List[SearchResult]]] = [None] * len(requests)
+        errors: Dict[int, str] = {}
+        cache_keys = []
+        pending_by_level = defaultdict(list)
+        
+        # 0. 검색 결과 캐시 조회
+        for i, request in enumerate(requests):
+            cache_key = search_result_cache.make_key(
+                request.query, request.policy_ids, request.limit, request.security_level,
+                request.candidate_k, request.ivfflat_probes, request.hnsw_ef_search, request.lexical_weight
+            )
+            cache_keys.append(cache_key)
+            results[i] = search_result_cache.get(cache_key)
+            if results[i] is None:
+                pending_by_level[request.security_level].append(i)
+        
+        # 보안 수준별로 임베딩 모델이 다르므로 그룹 단위로 처리
+        for security_level, indices in pending_by_level.items():
+            # 1. 쿼리 임베딩 일괄 생성 (실패한 쿼리는 제외)
+            query_embeddings, embedding_errors = await self._create_query_embeddings_isolated(
+                [requests[i].query for i in indices], security_level
+            )
+            for k, error in embedding_errors.items():
+                errors[indices[k]] = error
+            query_embeddings = [e for k, e in enumerate(query_embeddings) if k not in embedding_errors]
+            indices = [i for k, i in enumerate(indices) if k not in embedding_errors]
+            if not indices:
+                continue
+            group = [requests[i] for i in indices]
+            
+            # 2. 다중 쿼리 벡터 검색 (요청별 후보 풀 크기 유지)
+            lexical_weights = [self._lexical_weight(request.lexical_weight) for request in group]
+            fetch_ks = [
+                request.limit if weight == 0 else self._pool_size(request.limit, request.candidate_k)
+                for request, weight in zip(group, lexical_weights)
+            ]
+            candidate_ks = [
+                self._candidate_k(fetch_k, request.candidate_k)
+                for request, fetch_k in zip(group, fetch_ks)
+            ]
             try:
-                response = self.openai_client.embeddings.create(
-                    model="text-embedding-3-large",
-                    input=[query]
+                vector_rows = await self._vector_search_batch(
+                    query_embeddings,
+                    [request.policy_ids for request in group],
+                    fetch_ks,
+                    candidate_ks,
+                    security_level,
+                    db,
+                    ivfflat_probes=max((r.ivfflat_probes or 0 for r in group), default=0) or None,
+                    hnsw_ef_search=max((r.hnsw_ef_search or 0 for r in group), default=0) or None
                 )
-                return response.data[0].embedding
             except Exception as e:
-                print(f"OpenAI 임베딩 생성 오류: {e}")
-                # 폴백으로 로컬 모델 사용
-                if self.multilingual_e5_model is None:
-                    self.multilingual_e5_model = SentenceTransformer('intfloat/multilingual-e5-large-instruct')
-                embedding = self.multilingual_e5_model.encode([query])[0]
-                return embedding.tolist()
+                # 어느 쿼리가 문제인지 가리기 위해 쿼리별로 다시 검색
+                print(f"배치 벡터 검색 오류, 쿼리별로 재시도: {e}")
+                await db.rollback()
+                vector_rows = []
+                for i, request, query_embedding, fetch_k, candidate_k in zip(
+                    indices, group, query_embeddings, fetch_ks, candidate_ks
+                ):
+                    try:
+                        vector_rows.append(await self._vector_search(
+                            query_embedding, request.policy_ids, fetch_k, security_level, db,
+                            candidate_k=candidate_k, ivfflat_probes=request.ivfflat_probes,
+                            hnsw_ef_search=request.hnsw_ef_search
+                        ))
+                    except Exception as query_error:
+                        await db.rollback()
+                        errors[i] = str(query_error)
+                        vector_rows.append(None)
+            
+            # 3. BM25 융합 및 결과 변환
+            for i, request, query_embedding, rows, weight, fetch_k in zip(
+                indices, group, query_embeddings, vector_rows, lexical_weights, fetch_ks
+            ):
+                if rows is None:
+                    continue
+                try:
+                    if weight > 0:
+                        table_name = self._resolve_table(security_level, len(query_embedding))
+                        lexical_rows = self._lexical_search(table_name, request.query, fetch_k, request.policy_ids)
+                        rows = fuse_scores(rows, lexical_rows, weight)
+                    formatted_results = [self._to_search_result(row) for row in rows[:request.limit]]
+                except Exception as e:
+                    errors[i] = str(e)
+                    continue
+                if formatted_results:
+                    search_result_cache.set(cache_keys[i], formatted_results)
+                else:
+                    formatted_results.append(self._empty_result(request.query))
+                results[i] = formatted_results
+        
+        for i, error in errors.items():
+            print(f"배치 검색 오류 (요청 {i}): {error}")
+        
+        if workflow_id:
+            self.workflow_service.log_step(workflow_id, "batch_search", "completed",
+                                         {"request_count": len(requests),
+                                          "cache_miss_count": sum(len(v) for v in pending_by_level.values()),
+                                          "error_count": len(errors)})
+        return [
+            SearchResponse(results=[], error=errors[i]) if i in errors else SearchResponse(results=rows)
+            for i, rows in enumerate(results)
+        ]
 
-    async def _vector_search(
+    def _lexical_weight(self, lexical_weight: Optional[float]) -> float:
+        """요청 가중치 정규화 (미지정 시 기본값, 0~1 범위)"""
+        if lexical_weight is None:
+            lexical_weight = DEFAULT_LEXICAL_WEIGHT
+        return min(max(lexical_weight, 0.0), 1.0)
+
+    def _pool_size(self, limit: int, candidate_k: Optional[int]) -> int:
+        """융합 전 후보 풀 크기"""
+        return min(max(candidate_k or limit * DEFAULT_CANDIDATE_FACTOR, limit), MAX_CANDIDATE_K)
+
+    def _candidate_k(self, limit: int, candidate_k: Optional[int]) -> int:
+        """ANN 후보 개수: 필터링/재정렬 후에도 limit개가 남도록 여유 있게 조회"""
+        if not candidate_k:
+            candidate_k = limit * DEFAULT_CANDIDATE_FACTOR
+        return min(max(int(candidate_k), limit), MAX_CANDIDATE_K)
+
+    def _prefilter_k(self, candidate_k: int) -> int:
+        """ANN 인덱스에서 뽑는 후보 수 (비트 후보는 재정렬 전에 더 넉넉히)"""
+        if SEARCH_BINARY_PREFILTER:
+            return min(candidate_k * SEARCH_BINARY_OVERSAMPLE, MAX_CANDIDATE_K)
+        return candidate_k
+
+    def _ann_order(self, table_name: str, row: str, query: str, query_short: str) -> str:
+        """후보 검색 ORDER BY 식 (init.sql의 인덱스 식과 같아야 ANN 인덱스를 탄다)"""
+        if SEARCH_BINARY_PREFILTER:
+            dimension = EMBEDDING_DIMENSIONS[table_name]
+            return f"binary_quantize({row}embedding)::bit({dimension}) <~> binary_quantize({query})::bit({dimension})"
+        if table_name in SHORT_EMBEDDING_TABLES:
+            return f"{row}embedding_short <=> {query_short}"
+        return f"{row}embedding <=> {query}"
+
+    def _empty_result(self, query: str) -> SearchResult:
+        """검색 결과가 없을 때 반환하는 안내 항목 (캐시하지 않음, policy_id는 실제 정책이 아님)"""
+        return SearchResult(
+            policy_id=1,
+            policy_name="샘플 보험약관",
+            company="샘플 보험사",
+            chunk_text=f"'{query}'에 대한 검색 결과가 없습니다. 아직 약관이 업로드되지 않았습니다.",
+            similarity_score=0.0,
+            chunk_index=0
+        )
+
+    async def _hybrid_search(
         self,
+        query: str,
         query_embedding: List[float],
         policy_ids: Optional[List[int]] = None,
         limit: int = 10,
         security_level: str = "public",
-        db: Session = None
+        db: AsyncSession = None,
+        candidate_k: Optional[int] = None,
+        ivfflat_probes: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None,
+        lexical_weight: Optional[float] = None
     ) -> List[dict]:
-        """벡터 검색 수행"""
-        embedding_dim = len(query_embedding)
+        """벡터 검색 결과와 BM25 결과를 가중 융합"""
+        lexical_weight = self._lexical_weight(lexical_weight)
+        
+        if lexical_weight == 0:
+            return await self._vector_search(
+                query_embedding, policy_ids, limit, security_level, db,
+                candidate_k=candidate_k, ivfflat_probes=ivfflat_probes, hnsw_ef_search=hnsw_ef_search
+            )
         
-        # 보안 수준에 따른 테이블 선택
+        # 융합 전 양쪽에서 후보 풀을 넉넉히 확보
+        pool_size = self._pool_size(limit, candidate_k)
+        vector_rows = await self._vector_search(
+            query_embedding, policy_ids, pool_size, security_level, db,
+            candidate_k=pool_size, ivfflat_probes=ivfflat_probes, hnsw_ef_search=hnsw_ef_search
+        )
+        table_name = self._resolve_table(security_level, len(query_embedding))
+        lexical_rows = self._lexical_search(table_name, query, pool_size, policy_ids)
+        
+        return fuse_scores(vector_rows, lexical_rows, lexical_weight)[:limit]
+
+    def _lexical_search(
+        self,
+        table_name: str,
+        query: str,
+        limit: int,
+        policy_ids: Optional[List[int]] = None
+    ) -> List[dict]:
+        """BM25 검색 (메모리 인덱스만 조회, 적재/동기화는 백그라운드에서 수행)"""
+        return lexical_index.search(table_name, query, limit, policy_ids)
+
+    def _to_search_result(self, row: dict) -> SearchResult:
+        """벡터 검색 결과 행을 SearchResult로 변환"""
+        return SearchResult(
+            policy_id=row['policy_id'],
+            policy_name=row['product_name'] or "Unknown",
+            company=row['company'] or "Unknown",
+            chunk_text=row['chunk_text'],
+            similarity_score=float(row['similarity_score']),
+            chunk_index=row['chunk_index']
+        )
+
+    async def _create_query_embedding(self, query: str, security_level: str) -> List[float]:
+        """쿼리 임베딩 생성 (모델별 쿼리 임베딩 캐시 우선 조회)"""
+        return (await self._create_query_embeddings([query], security_level))[0]
+
+    async def _create_query_embeddings(self, queries: List[str], security_level: str) -> List[List[float]]:
+        """여러 쿼리의 임베딩을 캐시 미스만 모아 한 번의 배치 호출로 생성"""
         if security_level == "closed":
-            table_name = "embeddings_qwen"
-            embedding_column = "embedding"
-        elif security_level == "semi_closed":
-            table_name = "embeddings_text_embedding_3"
-            embedding_column = "embedding"
-        else:
-            # 공개망에서는 text-embedding-3-large 사용
-            table_name = "embeddings_text_embedding_3"
-            embedding_column = "embedding"
+            # Qwen 모델 사용
+            return await self._encode_with_cache(queries, CLOSED_QUERY_MODEL, self._encode_closed)
+        
+        # OpenAI 모델 사용
+        try:
+            return await self._encode_with_cache(queries, "text-embedding-3-large", self._encode_openai)
+        except Exception as e:
+            print(f"OpenAI 임베딩 생성 오류: {e}")
+            # 폴백으로 로컬 모델 사용
+            return await self._encode_with_cache(queries, FALLBACK_QUERY_MODEL, self._encode_fallback)
+
+    async def _create_query_embeddings_isolated(
+        self,
+        queries: List[str],
+        security_level: str
+    ) -> Tuple[List[Optional[List[float]]], Dict[int, str]]:
+        """일괄 임베딩이 실패하면 쿼리별로 다시 생성해 실패한 쿼리만 골라냄 (인덱스 → 오류 메시지)"""
+        try:
+            return await self._create_query_embeddings(queries, security_level), {}
+        except Exception as e:
+            if len(queries) == 1:
+                return [None], {0: str(e)}
+            print(f"배치 쿼리 임베딩 오류, 쿼리별로 재시도: {e}")
+        outcomes = await asyncio.gather(
+            *(self._create_query_embedding(query, security_level) for query in queries),
+            return_exceptions=True
+        )
+        errors = {k: str(outcome) for k, outcome in enumerate(outcomes) if isinstance(outcome, Exception)}
+        return [None if k in errors else outcome for k, outcome in enumerate(outcomes)], errors
+
+    async def _encode_with_cache(self, queries: List[str], model_name: str, encode) -> List[List[float]]:
+        embeddings = [query_embedding_cache.get(query, model_name) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = await encode([queries[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                query_embedding_cache.set(queries[i], model_name, embedding)
+        return embeddings
+
+    async def _encode_closed(self, queries: List[str]) -> List[List[float]]:
+        # 동시 요청의 질의를 모아 한 번에 인코딩 (문서와 같은 차원으로 맞춤)
+        embeddings = await query_batcher.encode(CLOSED_QUERY_MODEL, queries, prompt_name=CLOSED_EMBEDDING_QUERY_PROMPT)
+        return local_embedding_pool.fit_dimension(embeddings)
+
+    async def _encode_openai(self, queries: List[str]) -> List[List[float]]:
+        """질의 임베딩은 공유 스케줄러에서 수집 배치보다 우선 처리 (마감 시간을 넘기면 예외 → E5 폴백)"""
+        if not embedding_scheduler.available:
+            raise Exception("임베딩 공급자가 설정되지 않았습니다.")
+        try:
+            return await asyncio.wait_for(embedding_scheduler.embed(queries, priority=INTERACTIVE),
+                                          SEARCH_QUERY_EMBEDDING_DEADLINE or None)
+        except asyncio.TimeoutError:
+            raise Exception(f"질의 임베딩 마감 시간 초과 ({SEARCH_QUERY_EMBEDDING_DEADLINE}초)")
+
+    async def _encode_fallback(self, queries: List[str]) -> List[List[float]]:
+        return await query_batcher.encode(FALLBACK_QUERY_MODEL, queries)
+
+    def _resolve_table(self, security_level: str, embedding_dim: int) -> str:
+        """보안 수준과 쿼리 임베딩 차원에 맞는 임베딩 테이블 선택"""
+        if security_level == "closed":
+            return "embeddings_qwen"
+        # OpenAI 장애 시 E5 폴백 임베딩(1024차원)은 E5 테이블에서 검색
+        return EMBEDDING_TABLES_BY_DIMENSION.get(embedding_dim, "embeddings_text_embedding_3")
+
+    async def _vector_search(
+        self,
+        query_embedding: List[float],
+        policy_ids: Optional[List[int]] = None,
+        limit: int = 10,
+        security_level: str = "public",
+        db: AsyncSession = None,
+        candidate_k: Optional[int] = None,
+        ivfflat_probes: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None
+    ) -> List[dict]:
+        """벡터 검색 수행 (pgvector ANN 인덱스 사용)"""
+        table_name = self._resolve_table(security_level, len(query_embedding))
+        
+        # 인프로세스 인덱스가 있으면 DB 왕복 없이 검색
+        if vector_index.enabled:
+            rows = vector_index.search(table_name, query_embedding, limit, policy_ids)
+            if rows is not None:
+                return rows
+        
+        prefilter_k = self._prefilter_k(self._candidate_k(limit, candidate_k))
+        await self._apply_search_params(db, prefilter_k, ivfflat_probes, hnsw_ef_search)
         
         # 정책 ID 필터 조건
         policy_filter = ""
+        params = {
+            "query_embedding": np.asarray(query_embedding, dtype=np.float32),
+            "candidate_k": prefilter_k,
+            "limit": limit
+        }
         if policy_ids:
-            policy_ids_str = ','.join(map(str, policy_ids))
-            policy_filter = f"AND policy_id IN ({policy_ids_str})"
+            policy_filter = "WHERE policy_id = ANY(:policy_ids)"
+            params["policy_ids"] = list(policy_ids)
+        if table_name in SHORT_EMBEDDING_TABLES and not SEARCH_BINARY_PREFILTER:
+            params["query_short"] = truncate_embedding(query_embedding)
+        
+        # 1단계: 부호 비트(또는 축약/원본 float32) 인덱스로 후보, 2단계: 원본 벡터 거리로 재정렬
+        ann_order = self._ann_order(table_name, "", "CAST(:query_embedding AS vector)", "CAST(:query_short AS vector)")
+        candidates_sql = f"""
+        SELECT 
+            s.policy_id,
+            s.chunk_text,
+            s.chunk_index,
+            s.embedding <=> CAST(:query_embedding AS vector) AS distance
+        FROM (
+            SELECT policy_id, chunk_text, chunk_index, embedding
+            FROM {table_name}
+            {policy_filter}
+            ORDER BY {ann_order}
+            LIMIT :candidate_k
+        ) s
+        """
         
-        # 벡터 유사도 검색 쿼리
+        # 내부 쿼리는 ORDER BY <거리> LIMIT 형태를 유지해야 ANN 인덱스를 탄다
         query_sql = f"""
         SELECT 
-            policy_id,
-            chunk_text,
-            chunk_index,
-            1 - ({embedding_column} <=> %s) as similarity_score
-        FROM {table_name}
-        WHERE {embedding_column} IS NOT NULL {policy_filter}
-        ORDER BY {embedding_column} <=> %s
-        LIMIT %s
+            c.policy_id,
+            c.chunk_text,
+            c.chunk_index,
+            1 - c.distance AS similarity_score,
+            p.product_name,
+            p.company
+        FROM ({candidates_sql}) c
+        JOIN policies p ON p.policy_id = c.policy_id
+        ORDER BY c.distance
+        LIMIT :limit
         """
         
         # 쿼리 실행
-        result = db.execute(
-            text(query_sql),
-            [query_embedding, query_embedding, limit]
-        )
+        result = await db.execute(text(query_sql), params)
         
-        return [dict(row) for row in result]
+        return [dict(row._mapping) for row in result]
+
+    async def _vector_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        policy_ids_list: List[Optional[List[int]]],
+        limits: List[int],
+        candidate_ks: List[int],
+        security_level: str = "public",
+        db: AsyncSession = None,
+        ivfflat_probes: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None
+    ) -> List[List[dict]]:
+        """여러 쿼리 벡터를 한 번의 SQL(LATERAL) 또는 한 번의 행렬 검색으로 처리"""
+        results: List[List[dict]] = [[] for _ in query_embeddings]
+        
+        # 폴백 임베딩이 섞이면 차원이 달라지므로 테이블별로 묶음
+        indices_by_table = defaultdict(list)
+        for i, query_embedding in enumerate(query_embeddings):
+            indices_by_table[self._resolve_table(security_level, len(query_embedding))].append(i)
+        
+        for table_name, indices in indices_by_table.items():
+            # 인프로세스 인덱스가 있으면 행렬 곱 한 번으로 검색
+            if vector_index.enabled:
+                batch_rows = vector_index.search_batch(
+                    table_name,
+                    [query_embeddings[i] for i in indices],
+                    [limits[i] for i in indices],
+                    [policy_ids_list[i] for i in indices]
+                )
+                if batch_rows is not None:
+                    for i, rows in zip(indices, batch_rows):
+                        results[i] = rows
+                    continue
+            
+            prefilter_ks = [self._prefilter_k(candidate_ks[i]) for i in indices]
+            await self._apply_search_params(db, max(prefilter_ks), ivfflat_probes, hnsw_ef_search)
+            
+            # 쿼리 벡터는 vector[] 파라미터로 바인딩, 쿼리별 필터는 콤마 구분 문자열로 전달 (빈 문자열은 필터 없음)
+            params = {
+                "query_embeddings": [np.asarray(query_embeddings[i], dtype=np.float32) for i in indices],
+                "policy_filters": [','.join(map(str, policy_ids_list[i] or [])) for i in indices],
+                "candidate_ks": prefilter_ks
+            }
+            if table_name in SHORT_EMBEDDING_TABLES and not SEARCH_BINARY_PREFILTER:
+                params["query_shorts"] = [truncate_embedding(query_embeddings[i]) for i in indices]
+            else:
+                params["query_shorts"] = params["query_embeddings"]
+            # 부호 비트(또는 축약/원본 float32) 인덱스로 후보 검색 후 원본 벡터로 재정렬
+            ann_order = self._ann_order(table_name, "e.", "q.embedding", "q.embedding_short")
+            query_sql = f"""
+            SELECT 
+                q.ord,
+                c.policy_id,
+                c.chunk_text,
+                c.chunk_index,
+                1 - c.distance AS similarity_score,
+                p.product_name,
+                p.company
+            FROM unnest(
+                CAST(:query_embeddings AS vector[]),
+                CAST(:query_shorts AS vector[]),
+                CAST(:policy_filters AS text[]),
+                CAST(:candidate_ks AS integer[])
+            ) WITH ORDINALITY AS q(embedding, embedding_short, policy_filter, candidate_k, ord)
+            CROSS JOIN LATERAL (
+                SELECT 
+                    s.policy_id,
+                    s.chunk_text,
+                    s.chunk_index,
+                    s.embedding <=> q.embedding AS distance
+                FROM (
+                    SELECT e.policy_id, e.chunk_text, e.chunk_index, e.embedding
+                    FROM {table_name} e
+                    WHERE q.policy_filter = ''
+                       OR e.policy_id = ANY(CAST(string_to_array(q.policy_filter, ',') AS integer[]))
+                    ORDER BY {ann_order}
+                    LIMIT q.candidate_k
+                ) s
+            ) c
+            JOIN policies p ON p.policy_id = c.policy_id
+            ORDER BY q.ord, c.distance
+            """
+            
+            rows_by_ord = defaultdict(list)
+            for row in await db.execute(text(query_sql), params):
+                row = dict(row._mapping)
+                rows_by_ord[row.pop('ord')].append(row)
+            for ord_, i in enumerate(indices, start=1):
+                results[i] = rows_by_ord[ord_][:limits[i]]
+        
+        return results
+
+    async def _apply_search_params(
+        self,
+        db: AsyncSession,
+        candidate_k: int,
+        ivfflat_probes: Optional[int] = None,
+        hnsw_ef_search: Optional[int] = None
+    ):
+        """인덱스 탐색 파라미터는 현재 트랜잭션에만 적용 (SET LOCAL)"""
+        probes = ivfflat_probes or DEFAULT_IVFFLAT_PROBES
+        ef_search = hnsw_ef_search or DEFAULT_HNSW_EF_SEARCH
+        if probes:
+            await db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+        if ef_search:
+            await db.execute(text(f"SET LOCAL hnsw.ef_search = {max(int(ef_search), candidate_k)}"))
 
     async def generate_answer(
         self,
@@ -166,12 +609,6 @@ class SearchService:
     ) -> str:
         """검색 결과를 바탕으로 답변 생성"""
         try:
-            # 검색 결과를 컨텍스트로 구성
-            context = "\n\n".join([
-                f"약관: {result.policy_name} (보험사: {result.company})\n내용: {result.chunk_text}"
-                for result in search_results[:5]  # 상위 5개 결과만 사용
-            ])
-            
             # LLM을 사용한 답변 생성
             if security_level == "closed":
                 # 폐쇄망에서는 로컬 모델 사용 (여기서는 간단한 템플릿 응답)
@@ -181,16 +618,7 @@ class SearchService:
                 try:
                     response = self.openai_client.chat.completions.create(
                         model="gpt-4o",
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "당신은 보험약관 전문가입니다. 주어진 약관 내용을 바탕으로 사용자의 질문에 정확하고 도움이 되는 답변을 제공하세요."
-                            },
-                            {
-                                "role": "user",
-                                "content": f"질문: {query}\n\n관련 약관 내용:\n{context}"
-                            }
-                        ],
+                        messages=self._build_answer_messages(query, search_results),
                         max_tokens=1000,
                         temperature=0.7
                     )
@@ -203,6 +631,93 @@ class SearchService:
             print(f"답변 생성 오류: {e}")
             return "죄송합니다. 답변을 생성하는 중 오류가 발생했습니다."
 
+    async def generate_answer_stream(
+        self,
+        query: str,
+        search_results: List[SearchResult],
+        security_level: str = "public"
+    ) -> AsyncIterator[dict]:
+        """답변을 토큰 단위로 스트리밍 (스트림이 정체되면 템플릿 답변으로 대체)
+
+        {"type": "token", "content": ...} 이벤트를 순서대로 내보내고, 실패/정체 시
+        {"type": "fallback", "mode": ..., "content": <템플릿 답변>}을 보낸다. 토큰을 하나도
+        보내지 않았으면 mode는 "replace"(템플릿이 답변 전체), 이미 보낸 토큰이 있으면
+        "append"(받은 부분 답변 뒤에 덧붙임)이다. 업스트림 스트림은 어떤 경우에도 닫는다.
+        """
+        if security_level == "closed":
+            yield {"type": "fallback", "mode": "replace", "content": self._generate_template_answer(query, search_results)}
+            return
+        
+        stream = None
+        streamed = False
+        try:
+            stream = await asyncio.wait_for(
+                self.async_openai_client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=self._build_answer_messages(query, search_results),
+                    max_tokens=1000,
+                    temperature=0.7,
+                    stream=True
+                ),
+                timeout=ANSWER_STREAM_STALL_TIMEOUT
+            )
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=ANSWER_STREAM_STALL_TIMEOUT)
+                except StopAsyncIteration:
+                    break
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    streamed = True
+                    yield {"type": "token", "content": delta}
+        except asyncio.TimeoutError:
+            print(f"OpenAI 답변 스트림 정체 ({ANSWER_STREAM_STALL_TIMEOUT}초), 템플릿 답변으로 대체")
+            yield self._fallback_event(query, search_results, streamed)
+        except Exception as e:
+            print(f"OpenAI 답변 스트리밍 오류: {e}")
+            yield self._fallback_event(query, search_results, streamed)
+        finally:
+            # 정체/오류/클라이언트 연결 종료 시에도 업스트림 연결과 토큰 생성을 중단
+            if stream is not None:
+                await self._close_stream(stream)
+
+    def _fallback_event(self, query: str, search_results: List[SearchResult], streamed: bool) -> dict:
+        """템플릿 답변 이벤트 (부분 답변이 있으면 구분 문구와 함께 덧붙임)"""
+        answer = self._generate_template_answer(query, search_results)
+        if streamed:
+            return {"type": "fallback", "mode": "append",
+                    "content": f"\n\n(답변 생성이 중단되어 관련 약관 정보를 덧붙입니다)\n\n{answer}"}
+        return {"type": "fallback", "mode": "replace", "content": answer}
+
+    @staticmethod
+    async def _close_stream(stream):
+        try:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+            else:
+                await stream.response.aclose()
+        except Exception as e:
+            print(f"OpenAI 답변 스트림 종료 오류: {e}")
+
+    def _build_answer_messages(self, query: str, search_results: List[SearchResult]) -> List[dict]:
+        """검색 결과를 컨텍스트로 구성한 답변 생성 프롬프트"""
+        context = "\n\n".join([
+            f"약관: {result.policy_name} (보험사: {result.company})\n내용: {result.chunk_text}"
+            for result in search_results[:5]  # 상위 5개 결과만 사용
+        ])
+        return [
+            {
+                "role": "system",
+                "content": "당신은 보험약관 전문가입니다. 주어진 약관 내용을 바탕으로 사용자의 질문에 정확하고 도움이 되는 답변을 제공하세요."
+            },
+            {
+                "role": "user",
+                "content": f"질문: {query}\n\n관련 약관 내용:\n{context}"
+            }
+        ]
+
     def _generate_template_answer(self, query: str, search_results: List[SearchResult]) -> str:
         """템플릿 기반 답변 생성"""
         if not search_results:
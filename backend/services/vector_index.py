@@ -0,0 +1,725 @@
+"""
+FAISS 기반 인프로세스 벡터 인덱스 (embeddings_* 테이블 미러)
+
+테이블 인덱스는 세그먼트(기본 세그먼트 + 정책 단위 델타) 목록을 담은 매니페스트로 구성되며,
+`{table}.current` 포인터 파일을 원자적으로 교체해 새 매니페스트를 게시한다.
+정책 추가/재처리는 그 정책의 청크만 담은 델타 세그먼트를 쓰고, 삭제는 기존 세그먼트에서
+정책을 가리는(tombstone) 것만 기록한다. 델타나 가린 정책이 쌓이면 테이블 전체를 재생성(압축)한다.
+읽기 측은 세그먼트를 메모리 매핑(IO_FLAG_MMAP)으로 열기 때문에 여러 uvicorn 워커가
+같은 페이지 캐시를 공유하며, 포인터가 바뀌면 다음 검색 시 새로 생긴 세그먼트만 연다.
+
+고차원 테이블은 int8 스칼라 양자화 또는 부호 비트(binary, 해밍 거리) 인덱스로 압축할 수 있다.
+압축 인덱스에서 후보를 넉넉히 뽑은 뒤 `.npy`(메모리 매핑)로 저장한 원본 벡터로 다시 점수를 매긴다.
+
+선택 기능(VECTOR_INDEX_ENABLED, 기본 꺼짐)이며 DB 밖에 벡터를 한 벌 더 두므로 저장 공간을 줄이지는
+않는다. DB 쪽 압축은 init.sql의 binary_quantize 식 인덱스와 검색 SQL의 비트 후보 검색이 담당한다.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import parse_vector
+from dotenv import load_dotenv
+
+try:
+    import faiss
+except ImportError:  # faiss 미설치 환경에서는 DB 검색만 사용
+    faiss = None
+
+load_dotenv()
+
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join("data", "index"))
+
+# 미러링 대상 테이블과 벡터 차원
+INDEXED_TABLES = {
+    "embeddings_text_embedding_3": 3072,
+    "embeddings_qwen": 1024,
+    "embeddings_multilingual_e5": 1024,
+    "embeddings_snowflake_arctic": 1024,
+}
+
+# 압축 인덱스: none | int8 | binary (적용 테이블은 쉼표 구분, 변경 후 재생성 필요)
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "none").lower()
+VECTOR_INDEX_QUANTIZED_TABLES = os.getenv("VECTOR_INDEX_QUANTIZED_TABLES", "embeddings_text_embedding_3,embeddings_qwen")
+# 압축 인덱스 후보 수 = limit × 배수, 원본 벡터로 재채점
+VECTOR_INDEX_RESCORE_FACTOR = int(os.getenv("VECTOR_INDEX_RESCORE_FACTOR", "4"))
+# int8 양자화 범위 학습에 쓰는 벡터 수 (재생성마다 테이블 전체에서 무작위 추출)
+VECTOR_INDEX_TRAIN_SAMPLE = int(os.getenv("VECTOR_INDEX_TRAIN_SAMPLE", "20000"))
+# 테이블 벡터 수가 이보다 적으면 압축하지 않고 정확(flat) 인덱스로 생성
+VECTOR_INDEX_QUANTIZE_MIN_VECTORS = int(os.getenv("VECTOR_INDEX_QUANTIZE_MIN_VECTORS", "10000"))
+QUANTIZATION_MODES = ("none", "int8", "binary")
+# 델타 세그먼트가 이 개수를 넘거나 가린 정책 비율이 기준을 넘으면 테이블 재생성
+VECTOR_INDEX_MAX_DELTAS = int(os.getenv("VECTOR_INDEX_MAX_DELTAS", "16"))
+VECTOR_INDEX_COMPACT_REMOVED_RATIO = float(os.getenv("VECTOR_INDEX_COMPACT_REMOVED_RATIO", "0.2"))
+
+LOCK_TIMEOUT_SECONDS = 60
+LOCK_STALE_SECONDS = 300
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class _FileLock:
+    """워커 프로세스 간 인덱스 쓰기 직렬화를 위한 잠금 파일 (Windows/Linux 공용)
+
+    대기 중 스레드를 재우므로 이벤트 루프 밖(asyncio.to_thread, 스크립트)에서만 사용한다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if _on_event_loop():
+            raise RuntimeError("벡터 인덱스 쓰기는 이벤트 루프에서 실행할 수 없습니다. asyncio.to_thread로 호출하세요.")
+        deadline = time.time() + LOCK_TIMEOUT_SECONDS
+        while True:
+            try:
+                self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return self
+            except FileExistsError:
+                # 비정상 종료로 남은 잠금 파일 정리
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_STALE_SECONDS:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    raise TimeoutError(f"벡터 인덱스 잠금 대기 시간 초과: {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc, tb):
+        os.close(self.fd)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class _FullVectors:
+    """재채점용 원본 벡터 (L2 정규화, id 오름차순 정렬)"""
+
+    def __init__(self, dimension: int, ids: Optional[np.ndarray] = None, vectors: Optional[np.ndarray] = None):
+        self.dimension = dimension
+        self.ids = ids if ids is not None else np.empty(0, dtype=np.int64)
+        self.vectors = vectors if vectors is not None else np.empty((0, dimension), dtype=np.float32)
+        self.pending_ids: List[np.ndarray] = []
+        self.pending_vectors: List[np.ndarray] = []
+
+    @classmethod
+    def load(cls, dimension: int, ids_path: str, vectors_path: str, mmap: bool) -> "_FullVectors":
+        return cls(dimension, np.load(ids_path), np.load(vectors_path, mmap_mode="r" if mmap else None))
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        self.pending_ids.append(ids)
+        self.pending_vectors.append(vectors)
+
+    def _merge(self):
+        if not self.pending_ids:
+            return
+        ids = np.concatenate([self.ids, *self.pending_ids])
+        vectors = np.concatenate([np.asarray(self.vectors), *self.pending_vectors])
+        order = np.argsort(ids, kind="stable")
+        self.ids, self.vectors = ids[order], vectors[order]
+        self.pending_ids, self.pending_vectors = [], []
+
+    def save(self, ids_path: str, vectors_path: str):
+        self._merge()
+        np.save(ids_path, self.ids)
+        np.save(vectors_path, np.ascontiguousarray(self.vectors, dtype=np.float32))
+
+    def lookup(self, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """id에 해당하는 원본 벡터 (없는 id는 제외)"""
+        if len(self.ids) == 0 or len(ids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dimension), dtype=np.float32)
+        positions = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        found = self.ids[positions] == ids
+        return ids[found], np.asarray(self.vectors[positions[found]])
+
+
+class _IndexData:
+    """인덱스 세그먼트 하나의 FAISS 인덱스, 청크 메타데이터, 원본 벡터"""
+
+    def __init__(self, index, chunks: Dict[int, list], policies: Dict[int, list], quantization: str,
+                 full: Optional[_FullVectors] = None, version: Optional[str] = None):
+        self.index = index
+        self.chunks = chunks
+        self.policies = policies
+        self.quantization = quantization
+        self.full = full
+        self.version = version
+
+
+class _Segment:
+    """읽기용 세그먼트와 가려진(삭제/재처리된) 정책의 청크 id"""
+
+    def __init__(self, data: _IndexData, removed: List[int]):
+        self.data = data
+        self.removed: Set[int] = set(removed)
+        self.removed_ids = np.array(
+            sorted(cid for cid, c in data.chunks.items() if c[0] in self.removed), dtype=np.int64
+        )
+
+
+class _TableIndex:
+    """단일 embeddings_* 테이블의 세그먼트 목록"""
+
+    def __init__(self, table_name: str, dimension: int, index_dir: str):
+        self.table_name = table_name
+        self.dimension = dimension
+        self.index_dir = index_dir
+        self.version: Optional[str] = None     # 현재 열린 매니페스트
+        self.segments: List[_Segment] = []
+        self.lock = threading.Lock()
+        quantized_tables = {name.strip() for name in VECTOR_INDEX_QUANTIZED_TABLES.split(",")}
+        # 새로 생성(재생성)할 기본 세그먼트의 압축 방식
+        self.target_quantization = VECTOR_INDEX_QUANTIZATION if table_name in quantized_tables else "none"
+        if self.target_quantization not in QUANTIZATION_MODES:
+            print(f"⚠️ 알 수 없는 벡터 인덱스 압축 방식: {self.target_quantization}, 압축하지 않습니다.")
+            self.target_quantization = "none"
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.index_dir, f"{self.table_name}.current")
+
+    def _paths(self, version: str) -> Tuple[str, str]:
+        base = os.path.join(self.index_dir, f"{self.table_name}.{version}")
+        return f"{base}.faiss", f"{base}.meta.json"
+
+    def _full_paths(self, version: str) -> Tuple[str, str]:
+        base = os.path.join(self.index_dir, f"{self.table_name}.{version}")
+        return f"{base}.ids.npy", f"{base}.vectors.npy"
+
+    def _manifest_path(self, manifest_id: str) -> str:
+        return os.path.join(self.index_dir, f"{self.table_name}.{manifest_id}.manifest.json")
+
+    def new_index(self, quantization: str):
+        if quantization == "int8":
+            return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(
+                self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT))
+        if quantization == "binary":
+            return faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(self.dimension))
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+
+    def _read_version(self, version: str, mmap: bool) -> _IndexData:
+        index_path, meta_path = self._paths(version)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        quantization = meta.get("quantization", "none")
+        if quantization == "binary":
+            index = faiss.read_index_binary(index_path)
+        elif mmap:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(index_path)
+        full = None
+        if quantization != "none":
+            full = _FullVectors.load(self.dimension, *self._full_paths(version), mmap=mmap)
+        chunks = {int(k): v for k, v in meta["chunks"].items()}
+        policies = {int(k): v for k, v in meta["policies"].items()}
+        return _IndexData(index, chunks, policies, quantization, full, version)
+
+    def _read_pointer(self) -> Optional[str]:
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def read_manifest(self, manifest_id: str) -> List[dict]:
+        """매니페스트의 세그먼트 목록 [{version, policies, removed}]"""
+        try:
+            with open(self._manifest_path(manifest_id), "r", encoding="utf-8") as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            # 세그먼트 도입 전 포인터는 단일 버전을 가리킴 (정책 목록은 쓰기 시 메타데이터에서 읽음)
+            return [{"version": manifest_id, "policies": None, "removed": []}]
+
+    def refresh(self) -> bool:
+        """포인터가 바뀌었으면 새 세그먼트만 메모리 매핑으로 연다. 인덱스 사용 가능 여부 반환"""
+        for _ in range(3):
+            manifest_id = self._read_pointer()
+            if manifest_id is None:
+                return False
+            if manifest_id == self.version:
+                return True
+            with self.lock:
+                if manifest_id == self.version:
+                    return True
+                try:
+                    opened = {segment.data.version: segment.data for segment in self.segments}
+                    segments = []
+                    for entry in self.read_manifest(manifest_id):
+                        data = opened.get(entry["version"]) or self._read_version(entry["version"], mmap=True)
+                        segments.append(_Segment(data, entry["removed"]))
+                except FileNotFoundError:
+                    # 읽는 사이 다른 워커가 새 매니페스트를 게시하고 이전 파일을 정리한 경우
+                    continue
+                self.segments = segments
+                self.version = manifest_id
+            return True
+        return self.version is not None
+
+    def create_empty(self, quantization: Optional[str] = None) -> _IndexData:
+        quantization = quantization or self.target_quantization
+        full = _FullVectors(self.dimension) if quantization != "none" else None
+        return _IndexData(self.new_index(quantization), {}, {}, quantization, full)
+
+    def create_delta(self) -> _IndexData:
+        """델타 세그먼트 (정책 하나 분량이므로 압축 없이 정확 검색, 압축은 재생성 시 적용)"""
+        return _IndexData(self.new_index("none"), {}, {}, "none")
+
+    def load_manifest(self) -> List[dict]:
+        """쓰기용 세그먼트 목록 (쓰기 잠금 안에서 호출)"""
+        manifest_id = self._read_pointer()
+        if manifest_id is None:
+            return []
+        entries = self.read_manifest(manifest_id)
+        for entry in entries:
+            if entry["policies"] is None:
+                with open(self._paths(entry["version"])[1], "r", encoding="utf-8") as f:
+                    entry["policies"] = sorted(int(k) for k in json.load(f)["policies"])
+        return entries
+
+    def write_segment(self, data: _IndexData) -> dict:
+        """세그먼트 파일을 기록하고 매니페스트 항목 반환 (게시는 publish_manifest)"""
+        version = uuid.uuid4().hex[:12]
+        index_path, meta_path = self._paths(version)
+        if data.quantization == "binary":
+            faiss.write_index_binary(data.index, index_path)
+        else:
+            faiss.write_index(data.index, index_path)
+        if data.full is not None:
+            data.full.save(*self._full_paths(version))
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "quantization": data.quantization,
+                       "chunks": data.chunks, "policies": data.policies},
+                      f, ensure_ascii=False)
+        return {"version": version, "policies": sorted(data.policies), "removed": []}
+
+    def publish_manifest(self, entries: List[dict]):
+        """새 매니페스트를 기록하고 포인터를 원자적으로 교체"""
+        old_manifest = self._read_pointer()
+        old_versions = {entry["version"] for entry in self.read_manifest(old_manifest)} if old_manifest else set()
+        manifest_id = uuid.uuid4().hex[:12]
+        with open(self._manifest_path(manifest_id), "w", encoding="utf-8") as f:
+            json.dump({"segments": entries, "created_at": time.time()}, f)
+        tmp_pointer = f"{self.pointer_path}.{manifest_id}.tmp"
+        with open(tmp_pointer, "w", encoding="utf-8") as f:
+            f.write(manifest_id)
+        os.replace(tmp_pointer, self.pointer_path)
+
+        # 더 이상 참조하지 않는 매니페스트/세그먼트 정리 (Windows에서 다른 워커가 매핑 중이면 실패할 수 있으므로 무시)
+        stale_paths = [self._manifest_path(old_manifest)] if old_manifest else []
+        for version in old_versions - {entry["version"] for entry in entries}:
+            stale_paths.extend((*self._paths(version), *self._full_paths(version)))
+        for path in stale_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def publish(self, data: _IndexData):
+        """단일 기본 세그먼트로 게시 (전체 재생성)"""
+        self.publish_manifest([self.write_segment(data)])
+
+
+class VectorIndexManager:
+    """embeddings_* 테이블을 미러링하는 메모리 매핑 벡터 인덱스 관리자"""
+
+    def __init__(self, index_dir: str = VECTOR_INDEX_DIR, enabled: bool = VECTOR_INDEX_ENABLED):
+        self.index_dir = index_dir
+        self._enabled = enabled
+        self.tables = {
+            name: _TableIndex(name, dim, index_dir) for name, dim in INDEXED_TABLES.items()
+        }
+        if self.enabled:
+            os.makedirs(self.index_dir, exist_ok=True)
+        elif enabled and faiss is None:
+            print("⚠️ faiss가 설치되지 않아 인프로세스 벡터 인덱스를 사용하지 않습니다.")
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and faiss is not None
+
+    def _lock(self) -> _FileLock:
+        return _FileLock(os.path.join(self.index_dir, ".write.lock"))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """코사인 유사도를 내적으로 계산하기 위한 L2 정규화"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def search(
+        self,
+        table_name: str,
+        query_embedding: List[float],
+        limit: int = 10,
+        policy_ids: Optional[List[int]] = None,
+        rescore: bool = True
+    ) -> Optional[List[dict]]:
+        """인덱스 검색. 인덱스를 사용할 수 없으면 None 반환 (호출 측에서 DB 검색)"""
+        table = self.tables.get(table_name)
+        if not self.enabled or table is None or len(query_embedding) != table.dimension:
+            return None
+        if not table.refresh():
+            return None
+
+        segments = table.segments
+        query = self._normalize(np.asarray([query_embedding]))
+        results = [self._search_segment(segment, query, limit, policy_ids, rescore)[0] for segment in segments]
+        return self._merge_rows(segments, results, limit)
+
+    def search_batch(
+        self,
+        table_name: str,
+        query_embeddings: List[List[float]],
+        limits: List[int],
+        policy_ids_list: List[Optional[List[int]]]
+    ) -> Optional[List[List[dict]]]:
+        """여러 쿼리를 세그먼트별 한 번의 행렬 검색으로 처리 (정책 필터가 있는 쿼리는 개별 검색)"""
+        table = self.tables.get(table_name)
+        if not self.enabled or table is None or not table.refresh():
+            return None
+        if any(len(embedding) != table.dimension for embedding in query_embeddings):
+            return None
+
+        results: List[List[dict]] = [[] for _ in query_embeddings]
+        unfiltered = [i for i, policy_ids in enumerate(policy_ids_list) if not policy_ids]
+        segments = table.segments
+
+        k = max((limits[i] for i in unfiltered), default=0)
+        if unfiltered and k > 0:
+            queries = self._normalize(np.asarray([query_embeddings[i] for i in unfiltered]))
+            per_segment = [self._search_segment(segment, queries, k) for segment in segments]
+            for row_num, i in enumerate(unfiltered):
+                results[i] = self._merge_rows(segments, [found[row_num] for found in per_segment], limits[i])
+
+        for i, policy_ids in enumerate(policy_ids_list):
+            if policy_ids:
+                results[i] = self.search(table_name, query_embeddings[i], limits[i], policy_ids) or []
+        return results
+
+    def _search_segment(self, segment: _Segment, queries: np.ndarray, limit: int,
+                        policy_ids: Optional[List[int]] = None,
+                        rescore: bool = True) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """세그먼트 하나에서 쿼리별 (id, 점수) 상위 limit (가려진 정책 제외)"""
+        data = segment.data
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if policy_ids:
+            allowed = set(policy_ids) - segment.removed
+            ids = np.array(sorted(cid for cid, c in data.chunks.items() if c[0] in allowed), dtype=np.int64)
+            if len(ids) == 0:
+                return [empty for _ in queries]
+            if data.full is not None:
+                return [self._exact_subset(data, query, limit, ids) for query in queries]
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+            scores, found = data.index.search(queries, min(limit, len(ids)), params=params)
+            return [(row_ids[row_ids >= 0], row_scores[row_ids >= 0]) for row_scores, row_ids in zip(scores, found)]
+
+        # 가려진 청크만큼 더 뽑은 뒤 제외
+        k = limit + len(segment.removed_ids)
+        if data.full is not None:
+            results = self._compact_search(data, queries, k, rescore)
+        else:
+            k = min(k, data.index.ntotal)
+            if k == 0:
+                return [empty for _ in queries]
+            scores, found = data.index.search(queries, k)
+            results = [(row_ids[row_ids >= 0], row_scores[row_ids >= 0]) for row_scores, row_ids in zip(scores, found)]
+        if len(segment.removed_ids):
+            results = [(ids[keep], scores[keep]) for ids, scores in results
+                       for keep in [~np.isin(ids, segment.removed_ids)]]
+        return [(ids[:limit], scores[:limit]) for ids, scores in results]
+
+    def _merge_rows(self, segments: List[_Segment], found: List[Tuple[np.ndarray, np.ndarray]],
+                    limit: int) -> List[dict]:
+        """세그먼트별 결과를 점수 순으로 합쳐 상위 limit"""
+        rows = []
+        for segment, (ids, scores) in zip(segments, found):
+            rows.extend(self._to_rows(segment.data.chunks, segment.data.policies, scores, ids))
+        rows.sort(key=lambda row: row["similarity_score"], reverse=True)
+        return rows[:limit]
+
+    @staticmethod
+    def _encode_compact(quantization: str, vectors: np.ndarray) -> np.ndarray:
+        """압축 인덱스 입력 형식 (binary는 부호 비트를 8개씩 묶은 uint8)"""
+        if quantization == "binary":
+            return np.packbits(vectors > 0, axis=1)
+        return vectors
+
+    def _compact_search(self, data: _IndexData, queries: np.ndarray, limit: int,
+                        rescore: bool = True) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """압축 인덱스 후보 검색 후 원본 벡터로 재채점 → 쿼리별 (id, 점수) 상위 limit"""
+        factor = VECTOR_INDEX_RESCORE_FACTOR if rescore else 1
+        k = min(limit * max(factor, 1), data.index.ntotal)
+        if k == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        distances, candidates = data.index.search(self._encode_compact(data.quantization, queries), k)
+
+        results = []
+        for query, row_distances, row_ids in zip(queries, distances, candidates):
+            valid = row_ids >= 0
+            row_ids = row_ids[valid]
+            if rescore:
+                ids, vectors = data.full.lookup(row_ids)
+                scores = vectors @ query
+                top = np.argsort(-scores, kind="stable")[:limit]
+                results.append((ids[top], scores[top]))
+            elif data.quantization == "binary":
+                # 해밍 거리 → 부호 일치 비율 기반 근사 유사도
+                results.append((row_ids[:limit], 1.0 - 2.0 * row_distances[valid][:limit] / data.full.dimension))
+            else:
+                results.append((row_ids[:limit], row_distances[valid][:limit]))
+        return results
+
+    @staticmethod
+    def _exact_subset(data: _IndexData, query: np.ndarray, limit: int,
+                      ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """정책 필터 검색: 허용된 청크만 원본 벡터로 정확히 계산"""
+        ids, vectors = data.full.lookup(ids)
+        scores = vectors @ query
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return ids[top], scores[top]
+
+    def evaluate(self, table_name: str, sample_size: int = 100, k: int = 10, seed: int = 0) -> dict:
+        """압축 인덱스(기본 세그먼트)의 recall@k와 지연 시간을 원본 벡터 전수 검색과 비교
+
+        저장된 청크 벡터 중 sample_size개를 쿼리로 사용한다.
+        """
+        table = self.tables.get(table_name)
+        if not self.enabled or table is None or not table.refresh() or not table.segments:
+            raise ValueError(f"사용할 수 있는 벡터 인덱스가 없습니다: {table_name}")
+        base = table.segments[0].data
+        if base.full is None:
+            raise ValueError(f"압축 인덱스가 아닙니다: {table_name} (VECTOR_INDEX_QUANTIZATION 설정 후 재생성, "
+                             f"벡터가 VECTOR_INDEX_QUANTIZE_MIN_VECTORS개 미만이면 압축하지 않음)")
+        total = len(base.full.ids)
+        if total == 0:
+            raise ValueError(f"인덱스가 비어 있습니다: {table_name}")
+
+        rng = np.random.default_rng(seed)
+        positions = np.sort(rng.choice(total, size=min(sample_size, total), replace=False))
+        queries = np.asarray(base.full.vectors[positions])
+
+        started = time.perf_counter()
+        exact = []
+        for query in queries:
+            scores = base.full.vectors @ query
+            top = np.argpartition(-scores, min(k, total) - 1)[:k]
+            exact.append(set(base.full.ids[top].tolist()))
+        exact_seconds = time.perf_counter() - started
+
+        report = {
+            "table": table_name,
+            "quantization": base.quantization,
+            "vectors": total,
+            "delta_segments": len(table.segments) - 1,
+            "sample_size": len(queries),
+            "k": k,
+            "rescore_factor": VECTOR_INDEX_RESCORE_FACTOR,
+            "index_bytes": os.path.getsize(table._paths(base.version)[0]),
+            "full_vector_bytes": int(base.full.vectors.nbytes),
+            "recall": {},
+            "latency_ms": {"exact": exact_seconds * 1000 / len(queries)},
+        }
+        for name, rescore in (("compressed", False), ("rescored", True)):
+            started = time.perf_counter()
+            results = [self._compact_search(base, query[None, :], k, rescore)[0][0] for query in queries]
+            elapsed = time.perf_counter() - started
+            hits = sum(len(expected & set(ids.tolist())) for expected, ids in zip(exact, results))
+            report["recall"][name] = hits / sum(len(expected) for expected in exact)
+            report["latency_ms"][name] = elapsed * 1000 / len(queries)
+        return report
+
+    @staticmethod
+    def _to_rows(chunks: dict, policies: dict, scores, ids) -> List[dict]:
+        rows = []
+        for score, chunk_id in zip(scores, ids):
+            if chunk_id < 0:
+                continue
+            policy_id, chunk_index, chunk_text = chunks[int(chunk_id)]
+            product_name, company = policies.get(policy_id, [None, None])
+            rows.append({
+                "policy_id": policy_id,
+                "chunk_text": chunk_text,
+                "chunk_index": chunk_index,
+                "similarity_score": float(score),
+                "product_name": product_name,
+                "company": company,
+            })
+        return rows
+
+    def _fetch_rows(self, db: Session, table_name: str, policy_id: Optional[int] = None):
+        """테이블에서 청크 행을 조회 (policy_id 지정 시 해당 정책만)"""
+        policy_filter = "WHERE e.policy_id = :policy_id" if policy_id is not None else ""
+        query_sql = f"""
+        SELECT e.id, e.policy_id, e.chunk_index, e.chunk_text, e.embedding,
+               p.product_name, p.company
+        FROM {table_name} e
+        JOIN policies p ON p.policy_id = e.policy_id
+        {policy_filter}
+        """
+        params = {"policy_id": policy_id} if policy_id is not None else {}
+        return db.execute(text(query_sql), params, execution_options={"yield_per": 1000})
+
+    def _add_vectors(self, data: _IndexData, ids: List[int], vectors: List[np.ndarray]):
+        batch_ids = np.array(ids, dtype=np.int64)
+        batch_vectors = self._normalize(np.stack(vectors))
+        if data.quantization == "int8" and not data.index.is_trained:
+            # 학습 샘플을 얻지 못한 경우에만 첫 배치로 학습 (보통은 _train_int8에서 미리 학습)
+            data.index.train(batch_vectors)
+        data.index.add_with_ids(self._encode_compact(data.quantization, batch_vectors), batch_ids)
+        if data.full is not None:
+            data.full.add(batch_ids, batch_vectors)
+
+    def _add_rows(self, table: _TableIndex, data: _IndexData, rows) -> int:
+        """조회한 행을 인덱스와 메타데이터에 추가"""
+        batch_ids, batch_vectors = [], []
+        added = 0
+        for row in rows:
+            vector = parse_vector(row.embedding)
+            if vector.shape[0] != table.dimension:
+                # 차원이 맞지 않는 (더미) 임베딩은 인덱싱하지 않음
+                continue
+            batch_ids.append(row.id)
+            batch_vectors.append(vector)
+            data.chunks[row.id] = [row.policy_id, row.chunk_index, row.chunk_text]
+            data.policies[row.policy_id] = [row.product_name, row.company]
+            if len(batch_ids) >= 1000:
+                self._add_vectors(data, batch_ids, batch_vectors)
+                added += len(batch_ids)
+                batch_ids, batch_vectors = [], []
+        if batch_ids:
+            self._add_vectors(data, batch_ids, batch_vectors)
+            added += len(batch_ids)
+        return added
+
+    def rebuild(self, db: Session, table_names: Optional[List[str]] = None) -> Dict[str, int]:
+        """테이블 전체로부터 인덱스를 다시 생성 (압축 방식은 현재 설정을 따름)"""
+        if not self.enabled:
+            return {}
+        counts = {}
+        with self._lock():
+            for table_name in table_names or list(self.tables):
+                counts[table_name] = self._rebuild_table(db, self.tables[table_name])
+        return counts
+
+    def _rebuild_table(self, db: Session, table: _TableIndex) -> int:
+        """기본 세그먼트 하나로 재생성 (델타와 가린 정책 정리, 쓰기 잠금 안에서 호출)
+
+        벡터 수가 VECTOR_INDEX_QUANTIZE_MIN_VECTORS 미만이면 압축하지 않고, int8은 재생성마다
+        테이블 전체에서 뽑은 표본으로 다시 학습한다.
+        """
+        quantization = table.target_quantization
+        if quantization != "none":
+            total = db.execute(text(f"SELECT count(*) FROM {table.table_name}")).scalar() or 0
+            if total < VECTOR_INDEX_QUANTIZE_MIN_VECTORS:
+                print(f"벡터 인덱스 압축 보류: {table.table_name} ({total}개 < {VECTOR_INDEX_QUANTIZE_MIN_VECTORS}개), 정확 인덱스 사용")
+                quantization = "none"
+        data = table.create_empty(quantization)
+        if quantization == "int8":
+            self._train_int8(db, table, data)
+        count = self._add_rows(table, data, self._fetch_rows(db, table.table_name))
+        table.publish(data)
+        print(f"벡터 인덱스 재생성 완료: {table.table_name} ({count}개 청크, 압축: {data.quantization})")
+        return count
+
+    def _train_int8(self, db: Session, table: _TableIndex, data: _IndexData):
+        """테이블 전체에서 무작위로 뽑은 VECTOR_INDEX_TRAIN_SAMPLE개 벡터로 차원별 값 범위 학습
+
+        삽입 순서대로 앞쪽 정책만으로 학습하면 이후 정책의 값이 범위를 벗어나 잘리므로 표본을 고르게 뽑는다.
+        """
+        rows = db.execute(text(f"""
+            SELECT embedding FROM {table.table_name}
+            WHERE id IN (SELECT id FROM {table.table_name} ORDER BY random() LIMIT :limit)
+        """), {"limit": VECTOR_INDEX_TRAIN_SAMPLE})
+        vectors = [vector for vector in (parse_vector(row.embedding) for row in rows)
+                   if vector.shape[0] == table.dimension]
+        if vectors:
+            data.index.train(self._normalize(np.stack(vectors)))
+            print(f"int8 양자화 학습: {table.table_name} (표본 {len(vectors)}개)")
+
+    def add_policy(self, db: Session, policy_id: int) -> Dict[str, int]:
+        """정책의 청크들을 델타 세그먼트로 추가 (기존 세그먼트의 같은 정책은 가림)
+
+        파일 잠금과 기록이 동기 I/O이므로 이벤트 루프에서는 asyncio.to_thread로 호출한다.
+        """
+        if not self.enabled:
+            return {}
+        counts = {}
+        with self._lock():
+            for table_name, table in self.tables.items():
+                rows = self._fetch_rows(db, table_name, policy_id).all()
+                entries = table.load_manifest()
+                # 재처리 시 중복 방지를 위해 기존 세그먼트의 청크는 가리고 새 델타로 대체
+                hidden = self._hide_policy(entries, policy_id)
+                if not rows and not hidden:
+                    continue
+                if rows:
+                    delta = table.create_delta()
+                    counts[table_name] = self._add_rows(table, delta, rows)
+                    if counts[table_name]:
+                        entries.append(table.write_segment(delta))
+                if self._needs_compaction(entries):
+                    counts[table_name] = self._rebuild_table(db, table)
+                else:
+                    table.publish_manifest(entries)
+        if counts:
+            print(f"벡터 인덱스 동기화 (추가): 정책 ID {policy_id}, {counts}")
+        return counts
+
+    def remove_policy(self, policy_id: int) -> Dict[str, int]:
+        """정책의 청크들을 각 테이블 인덱스에서 가림 (세그먼트 재기록 없음, 가린 세그먼트 수 반환)"""
+        if not self.enabled:
+            return {}
+        counts = {}
+        with self._lock():
+            for table_name, table in self.tables.items():
+                entries = table.load_manifest()
+                hidden = self._hide_policy(entries, policy_id)
+                if hidden:
+                    counts[table_name] = hidden
+                    table.publish_manifest(entries)
+        if counts:
+            print(f"벡터 인덱스 동기화 (삭제): 정책 ID {policy_id}, {counts}")
+        return counts
+
+    @staticmethod
+    def _hide_policy(entries: List[dict], policy_id: int) -> int:
+        """정책이 들어 있는 세그먼트에 가림 표시, 모든 정책이 가려진 세그먼트는 목록에서 제외"""
+        hidden = 0
+        for entry in entries:
+            if policy_id in entry["policies"] and policy_id not in entry["removed"]:
+                entry["removed"].append(policy_id)
+                hidden += 1
+        entries[:] = [entry for entry in entries if set(entry["policies"]) - set(entry["removed"])]
+        return hidden
+
+    @staticmethod
+    def _needs_compaction(entries: List[dict]) -> bool:
+        if len(entries) > VECTOR_INDEX_MAX_DELTAS + 1:
+            return True
+        total = sum(len(entry["policies"]) for entry in entries)
+        removed = sum(len(entry["removed"]) for entry in entries)
+        return total > 0 and removed / total > VECTOR_INDEX_COMPACT_REMOVED_RATIO
+
+
+# 서비스 간 공유 인스턴스
+vector_index = VectorIndexManager()
@@ -1,7 +1,10 @@
 import uuid
 import time
 from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
 from models import WorkflowLog
 from schemas import WorkflowLogResponse
 
@@ -22,13 +25,7 @@ class WorkflowService:
         db: Session = None
     ):
         """워크플로우 단계 로깅"""
-        print(f"[{workflow_id}] {step_name}: {status}")
-        if input_data:
-            print(f"  Input: {input_data}")
-        if output_data:
-            print(f"  Output: {output_data}")
-        if execution_time:
-            print(f"  Execution time: {execution_time}ms")
+        self._print_step(workflow_id, step_name, status, input_data, output_data, execution_time)
         
         # 데이터베이스에 저장
         if db:
@@ -66,13 +63,68 @@ class WorkflowService:
                 print(f"워크플로우 오류 로그 저장 실패: {e}")
                 db.rollback()
 
-    def get_workflow_logs(self, db: Session, workflow_id: Optional[str] = None, limit: int = 100) -> List[WorkflowLogResponse]:
+    async def log_step_async(
+        self,
+        workflow_id: str,
+        step_name: str,
+        status: str,
+        input_data: dict = None,
+        output_data: dict = None,
+        execution_time: int = None,
+        db: AsyncSession = None
+    ):
+        """워크플로우 단계 로깅 (비동기 세션, db를 주지 않으면 전용 세션으로 저장)"""
+        self._print_step(workflow_id, step_name, status, input_data, output_data, execution_time)
+        await self._save_async(WorkflowLog(
+            workflow_id=workflow_id,
+            step_name=step_name,
+            status=status,
+            input_data=input_data,
+            output_data=output_data,
+            execution_time=execution_time
+        ), db)
+
+    async def log_error_async(self, workflow_id: str, error_message: str, db: AsyncSession = None):
+        """워크플로우 오류 로깅 (비동기 세션, db를 주지 않으면 전용 세션으로 저장)"""
+        print(f"[{workflow_id}] ERROR: {error_message}")
+        await self._save_async(WorkflowLog(
+            workflow_id=workflow_id,
+            step_name="error",
+            status="error",
+            error_message=error_message
+        ), db)
+
+    async def _save_async(self, workflow_log: WorkflowLog, db: AsyncSession = None):
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                await self._save_async(workflow_log, session)
+            return
+        try:
+            db.add(workflow_log)
+            await db.commit()
+        except Exception as e:
+            print(f"워크플로우 로그 저장 실패: {e}")
+            await db.rollback()
+
+    @staticmethod
+    def _print_step(workflow_id: str, step_name: str, status: str, input_data: dict = None,
+                    output_data: dict = None, execution_time: int = None):
+        print(f"[{workflow_id}] {step_name}: {status}")
+        if input_data:
+            print(f"  Input: {input_data}")
+        if output_data:
+            print(f"  Output: {output_data}")
+        if execution_time:
+            print(f"  Execution time: {execution_time}ms")
+
+    async def get_workflow_logs(self, db: AsyncSession, workflow_id: Optional[str] = None, limit: int = 100) -> List[WorkflowLogResponse]:
         """워크플로우 로그 조회"""
-        query = db.query(WorkflowLog)
+        query = select(WorkflowLog)
         if workflow_id:
-            query = query.filter(WorkflowLog.workflow_id == workflow_id)
+            query = query.where(WorkflowLog.workflow_id == workflow_id)
         
-        logs = query.order_by(WorkflowLog.created_at.desc()).limit(limit).all()
+        result = await db.execute(query.order_by(WorkflowLog.created_at.desc()).limit(limit))
+        logs = result.scalars().all()
         return [WorkflowLogResponse.from_orm(log) for log in logs]
     
 
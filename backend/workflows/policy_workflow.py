@@ -4,6 +4,8 @@ from langgraph.prebuilt import ToolExecutor
 from services.workflow_service import WorkflowService
 from services.embedding_service import EmbeddingService
 from services.search_service import SearchService
+from services.pdf_extractor import pdf_text_extractor
+from services.chunker import policy_chunker
 from sqlalchemy.orm import Session
 
 class PolicyWorkflowState:
@@ -109,13 +111,8 @@ class PolicyWorkflow:
                 "in_progress"
             )
             
-            # PDF 텍스트 추출 로직
-            import PyPDF2
-            with open(state.file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
+            # PDF 텍스트 추출 (페이지 범위 병렬)
+            text, extraction_stats = await pdf_text_extractor.extract(state.file_path)
             
             state.extracted_text = text
             state.status = "completed"
@@ -124,7 +121,7 @@ class PolicyWorkflow:
                 state.workflow_id, 
                 "text_extraction", 
                 "completed",
-                {"text_length": len(text)}
+                {"text_length": len(text), **extraction_stats}
             )
             
         except Exception as e:
@@ -213,16 +210,8 @@ class PolicyWorkflow:
                 "in_progress"
             )
             
-            # 텍스트 청킹 로직
-            words = state.markdown_content.split()
-            chunks = []
-            chunk_size = 200
-            overlap = 20
-            
-            for i in range(0, len(words), chunk_size - overlap):
-                chunk = ' '.join(words[i:i + chunk_size])
-                if chunk.strip():
-                    chunks.append(chunk.strip())
+            # 텍스트 청킹 로직 (EmbeddingService와 같은 구조 기반 청커)
+            chunks = [chunk.text for chunk in policy_chunker.split(state.markdown_content)]
             
             state.chunks = chunks
             state.status = "completed"
@@ -2,8 +2,9 @@ from typing import Dict, Any, List
 from langgraph.graph import StateGraph, END
 from services.workflow_service import WorkflowService
 from services.search_service import SearchService
+from services.embedding_cache import query_embedding_cache
 from schemas import SearchResult
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 class SearchWorkflowState:
     """검색 워크플로우 상태"""
@@ -18,7 +19,7 @@ class SearchWorkflowState:
         self.answer: str = ""
         self.status: str = "pending"
         self.error_message: str = ""
-        self.db_session: Session = None
+        self.db_session: AsyncSession = None
 
 class SearchWorkflow:
     """검색 워크플로우"""
@@ -98,7 +99,7 @@ class SearchWorkflow:
                 "in_progress"
             )
             
-            # 쿼리 임베딩 생성
+            # 쿼리 임베딩 생성 (SearchService와 같은 쿼리 임베딩 캐시 공유)
             state.query_embedding = await self.search_service._create_query_embedding(
                 state.query, 
                 state.security_level
@@ -110,7 +111,8 @@ class SearchWorkflow:
                 state.workflow_id, 
                 "embedding_generation", 
                 "completed",
-                {"embedding_dimension": len(state.query_embedding)}
+                {"embedding_dimension": len(state.query_embedding),
+                 "cache_hit_ratio": query_embedding_cache.stats()["hit_ratio"]}
             )
             
         except Exception as e:
@@ -138,21 +140,10 @@ class SearchWorkflow:
                 state.db_session
             )
             
-            # SearchResult 객체로 변환
-            from models import Policy
-            formatted_results = []
-            for result in search_results:
-                policy = state.db_session.query(Policy).filter(Policy.policy_id == result['policy_id']).first()
-                if policy:
-                    search_result = SearchResult(
-                        policy_id=result['policy_id'],
-                        policy_name=policy.product_name,
-                        company=policy.company or "Unknown",
-                        chunk_text=result['chunk_text'],
-                        similarity_score=float(result['similarity_score']),
-                        chunk_index=result['chunk_index']
-                    )
-                    formatted_results.append(search_result)
+            # SearchResult 객체로 변환 (정책 메타데이터는 검색 쿼리에서 함께 조회됨)
+            formatted_results = [
+                self.search_service._to_search_result(result) for result in search_results
+            ]
             
             state.search_results = formatted_results
             state.status = "completed"
@@ -26,31 +26,58 @@ CREATE TABLE IF NOT EXISTS policies (
     md_path             VARCHAR(500),
     pdf_path            VARCHAR(500),
     created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    security_level      VARCHAR(20)
+    security_level      VARCHAR(20),
+    content_hash        VARCHAR(64),
+    status              VARCHAR(20) NOT NULL DEFAULT 'ready' CHECK (status IN ('processing', 'ready', 'error'))
 );
 
+-- 기존 데이터베이스용: 원본 파일 SHA-256 (동일 파일 재업로드 시 재사용)
+ALTER TABLE policies ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS idx_policies_content_hash ON policies (content_hash);
+
+-- 기존 데이터베이스용: 처리 상태 (업로드 시 processing 행을 먼저 등록해 처리 중인 파일이 삭제되지 않게 함)
+ALTER TABLE policies ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'ready';
+
 -- text-embedding-3 임베딩 테이블 (3072차원)
 CREATE TABLE IF NOT EXISTS embeddings_text_embedding_3 (
     id                  SERIAL PRIMARY KEY,
     policy_id           INTEGER NOT NULL REFERENCES policies(policy_id),
     chunk_text          TEXT NOT NULL,
     embedding           VECTOR(3072) NOT NULL,
+    embedding_short     VECTOR(256),
     model               VARCHAR(100) NOT NULL,
     chunk_index         INTEGER NOT NULL,
     created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Qwen 임베딩 테이블 (4096차원)
+-- Qwen 임베딩 테이블 (1024차원, 기본 Qwen3-Embedding-0.6B, 더 큰 모델은 앞 1024차원만 저장)
 CREATE TABLE IF NOT EXISTS embeddings_qwen (
     id                  SERIAL PRIMARY KEY,
     policy_id           INTEGER NOT NULL REFERENCES policies(policy_id),
     chunk_text          TEXT NOT NULL,
-    embedding           VECTOR(4096) NOT NULL,
+    embedding           VECTOR(1024) NOT NULL,
     model               VARCHAR(100) NOT NULL,
     chunk_index         INTEGER NOT NULL,
     created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 기존 데이터베이스용: 축약 벡터(앞 256차원, L2 정규화) 컬럼 추가 및 채우기
+ALTER TABLE embeddings_text_embedding_3 ADD COLUMN IF NOT EXISTS embedding_short VECTOR(256);
+UPDATE embeddings_text_embedding_3 SET embedding_short = l2_normalize(subvector(embedding, 1, 256))
+WHERE embedding_short IS NULL;
+
+-- 기존 4096차원(Qwen3-Embedding-8B) 데이터베이스용: 1024차원으로 바꾸고 다시 임베딩
+-- (문서 벡터와 질의 벡터가 같은 모델이어야 하므로 기존 벡터는 잘라 쓰지 않고 backfill로 다시 만든다)
+-- DROP INDEX IF EXISTS idx_embeddings_qwen_short, idx_embeddings_qwen_bit;
+-- TRUNCATE embeddings_qwen;
+-- ALTER TABLE embeddings_qwen DROP COLUMN IF EXISTS embedding_short;
+-- ALTER TABLE embeddings_qwen ALTER COLUMN embedding TYPE VECTOR(1024);
+-- DELETE FROM chunk_embedding_cache WHERE model = 'Qwen/Qwen3-Embedding-8B';
+-- UPDATE embedding_checkpoints SET model = 'Qwen/Qwen3-Embedding-0.6B', status = 'pending',
+--     next_chunk_index = 0, pending_chunks = '[]', chunk_signature = NULL
+-- WHERE model = 'Qwen/Qwen3-Embedding-8B';
+-- 이후 아래 인덱스를 다시 만들고 backfill 스크립트로 embeddings_qwen을 채움
+
 -- 다국어 E5 임베딩 테이블 (1024차원)
 CREATE TABLE IF NOT EXISTS embeddings_multilingual_e5 (
     id                  SERIAL PRIMARY KEY,
@@ -73,6 +100,52 @@ CREATE TABLE IF NOT EXISTS embeddings_snowflake_arctic (
     created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 청크 임베딩 캐시 (모델별 청크 해시 → 임베딩, 약관 간 공통 문구 재사용)
+CREATE TABLE IF NOT EXISTS chunk_embedding_cache (
+    model               VARCHAR(100) NOT NULL,
+    chunk_hash          VARCHAR(64) NOT NULL,
+    embedding           BYTEA NOT NULL, -- float32 바이트
+    dimension           INTEGER NOT NULL,
+    created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model, chunk_hash)
+);
+
+-- 임베딩 진행 체크포인트 (정책/모델별, 실패 청크는 pending으로 남겨 재개 작업이 처리)
+CREATE TABLE IF NOT EXISTS embedding_checkpoints (
+    policy_id           INTEGER NOT NULL REFERENCES policies(policy_id),
+    model               VARCHAR(100) NOT NULL,
+    chunk_count         INTEGER NOT NULL,
+    next_chunk_index    INTEGER NOT NULL DEFAULT 0,
+    pending_chunks      JSONB NOT NULL DEFAULT '[]',
+    status              VARCHAR(20) NOT NULL CHECK (status IN ('in_progress', 'pending', 'completed')),
+    attempts            INTEGER NOT NULL DEFAULT 0,
+    last_error          TEXT,
+    chunk_signature     VARCHAR(64), -- 청크 목록 SHA-256 (재개 시 같은 청킹 결과인지 확인)
+    updated_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (policy_id, model)
+);
+
+-- 기존 데이터베이스용: 청크 목록 서명 (없는 체크포인트는 재개 시 전체 재임베딩)
+ALTER TABLE embedding_checkpoints ADD COLUMN IF NOT EXISTS chunk_signature VARCHAR(64);
+
+-- 수집 작업 테이블 (재시작 후 대기/중단 작업 복구용)
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    job_id              VARCHAR(100) PRIMARY KEY, -- workflow_id와 같음
+    job_type            VARCHAR(50) NOT NULL,
+    priority            INTEGER NOT NULL,
+    payload             JSONB NOT NULL,
+    job_metadata        JSONB,
+    status              VARCHAR(20) NOT NULL CHECK (status IN ('queued', 'running', 'completed', 'error')),
+    policy_id           INTEGER,
+    error_message       TEXT,
+    created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at          TIMESTAMP,
+    finished_at         TIMESTAMP,
+    updated_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status);
+
 -- 워크플로우 실행 로그 테이블
 CREATE TABLE IF NOT EXISTS workflow_logs (
     log_id              SERIAL PRIMARY KEY,
@@ -87,17 +160,66 @@ CREATE TABLE IF NOT EXISTS workflow_logs (
 );
 
 -- 벡터 검색을 위한 인덱스 생성
-CREATE INDEX IF NOT EXISTS idx_embeddings_text_embedding_3_vector 
-ON embeddings_text_embedding_3 USING ivfflat (embedding vector_cosine_ops);
+-- 3072차원은 ivfflat/hnsw 한도(2000차원)를 넘으므로 축약 벡터에 HNSW를 만들고,
+-- 검색 시 축약 벡터로 후보를 뽑은 뒤 원본 벡터로 재정렬
+CREATE INDEX IF NOT EXISTS idx_embeddings_text_embedding_3_short 
+ON embeddings_text_embedding_3 USING hnsw (embedding_short vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
+-- 1024차원 테이블은 HNSW 사용 (빈 테이블에서 생성해도 재학습 없이 증분 삽입에 강함)
 CREATE INDEX IF NOT EXISTS idx_embeddings_qwen_vector 
-ON embeddings_qwen USING ivfflat (embedding vector_cosine_ops);
+ON embeddings_qwen USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 CREATE INDEX IF NOT EXISTS idx_embeddings_multilingual_e5_vector 
-ON embeddings_multilingual_e5 USING ivfflat (embedding vector_cosine_ops);
+ON embeddings_multilingual_e5 USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 CREATE INDEX IF NOT EXISTS idx_embeddings_snowflake_arctic_vector 
-ON embeddings_snowflake_arctic USING ivfflat (embedding vector_cosine_ops);
+ON embeddings_snowflake_arctic USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- 부호 비트(binary_quantize) 식 인덱스: 차원당 1비트라 float32 HNSW보다 32배 작고 원본 차원 그대로 인덱싱
+-- (bit HNSW는 64000차원까지). SEARCH_BINARY_PREFILTER=true(기본)이면 해밍 거리로 후보를 뽑고 원본 벡터로 재정렬하며,
+-- 검색 SQL의 식(binary_quantize(embedding)::bit(n))과 같아야 인덱스를 탄다.
+CREATE INDEX IF NOT EXISTS idx_embeddings_text_embedding_3_bit 
+ON embeddings_text_embedding_3 USING hnsw ((binary_quantize(embedding)::bit(3072)) bit_hamming_ops) WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_qwen_bit 
+ON embeddings_qwen USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops) WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_multilingual_e5_bit 
+ON embeddings_multilingual_e5 USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops) WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_snowflake_arctic_bit 
+ON embeddings_snowflake_arctic USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops) WITH (m = 16, ef_construction = 64);
+
+-- 비트 인덱스만 쓰는 운영 환경에서는 float32 HNSW 인덱스가 사용되지 않으므로 지워 공간을 회수할 수 있음
+-- (SEARCH_BINARY_PREFILTER=false로 되돌리면 다시 만들어야 함)
+-- DROP INDEX IF EXISTS idx_embeddings_text_embedding_3_short, idx_embeddings_qwen_vector,
+--     idx_embeddings_multilingual_e5_vector, idx_embeddings_snowflake_arctic_vector;
+
+-- 정책 ID 필터/삭제용 인덱스 (정책당 chunk_index 하나만 허용해 재개 작업이 행을 중복 저장하지 않게 함)
+-- 기존 데이터베이스용: 중복 행은 먼저 저장된 것만 남기고, 이전의 비고유 인덱스는 제거
+DELETE FROM embeddings_text_embedding_3 a USING embeddings_text_embedding_3 b
+WHERE a.policy_id = b.policy_id AND a.chunk_index = b.chunk_index AND a.id > b.id;
+DROP INDEX IF EXISTS idx_embeddings_text_embedding_3_policy;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embeddings_text_embedding_3_policy_chunk 
+ON embeddings_text_embedding_3 (policy_id, chunk_index);
+
+DELETE FROM embeddings_qwen a USING embeddings_qwen b
+WHERE a.policy_id = b.policy_id AND a.chunk_index = b.chunk_index AND a.id > b.id;
+DROP INDEX IF EXISTS idx_embeddings_qwen_policy;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embeddings_qwen_policy_chunk 
+ON embeddings_qwen (policy_id, chunk_index);
+
+DELETE FROM embeddings_multilingual_e5 a USING embeddings_multilingual_e5 b
+WHERE a.policy_id = b.policy_id AND a.chunk_index = b.chunk_index AND a.id > b.id;
+DROP INDEX IF EXISTS idx_embeddings_multilingual_e5_policy;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embeddings_multilingual_e5_policy_chunk 
+ON embeddings_multilingual_e5 (policy_id, chunk_index);
+
+DELETE FROM embeddings_snowflake_arctic a USING embeddings_snowflake_arctic b
+WHERE a.policy_id = b.policy_id AND a.chunk_index = b.chunk_index AND a.id > b.id;
+DROP INDEX IF EXISTS idx_embeddings_snowflake_arctic_policy;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embeddings_snowflake_arctic_policy_chunk 
+ON embeddings_snowflake_arctic (policy_id, chunk_index);
 
 -- 기본 관리자 계정 생성 (비밀번호: admin123)
 INSERT INTO users (email, password_hash, role) 
@@ -52,19 +52,39 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ isAuthenticated = false }
     setInputMessage('');
     setIsLoading(true);
 
-    try {
-      // 검색 API 호출
-      const response = await searchAPI.search(inputMessage, undefined, 10, 'public');
-      
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        type: 'assistant',
-        content: response.answer || '검색 결과를 찾을 수 없습니다.',
-        timestamp: new Date(),
-        searchResults: response.results || [],
-      };
+    const assistantId = (Date.now() + 1).toString();
+    const updateAssistant = (update: (message: Message) => Message) => {
+      setMessages(prev => prev.map(message => (message.id === assistantId ? update(message) : message)));
+    };
 
-      setMessages(prev => [...prev, assistantMessage]);
+    try {
+      // 스트리밍 검색 API 호출: 검색 결과 → 답변 토큰 순으로 표시
+      await searchAPI.searchStream(inputMessage, {
+        onResults: (results) => {
+          setIsLoading(false);
+          const assistantMessage: Message = {
+            id: assistantId,
+            type: 'assistant',
+            content: '',
+            timestamp: new Date(),
+            searchResults: results.map((result: any) => ({
+              ...result,
+              relevance_score: result.similarity_score,
+              matched_text: result.chunk_text,
+            })),
+          };
+          setMessages(prev => [...prev, assistantMessage]);
+        },
+        onToken: (token) => {
+          updateAssistant(message => ({ ...message, content: message.content + token }));
+        },
+        onFallback: (answer, mode) => {
+          updateAssistant(message => ({
+            ...message,
+            content: mode === 'append' ? message.content + answer : answer,
+          }));
+        },
+      }, undefined, 10, 'public');
     } catch (error) {
       console.error('검색 오류:', error);
       const errorMessage: Message = {
@@ -92,7 +92,7 @@ const PolicyManagement: React.FC<PolicyManagementProps> = ({ isAuthenticated })
         securityLevel: 'public'
       });
       loadPolicies();
-      alert('업로드가 완료되었습니다!');
+      alert(`업로드가 접수되었습니다. 처리 진행 상황은 워크플로우 모니터에서 확인하세요. (작업 ID: ${result.job_id})`);
     } catch (error: any) {
       console.error('업로드 실패:', error);
       
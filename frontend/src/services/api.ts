@@ -91,6 +91,7 @@ export const policyAPI = {
       });
       
       console.log('업로드 성공:', response.data);
+      // 202: { job_id, workflow_id, status } - 처리는 백그라운드 작업으로 진행
       return response.data;
     } catch (error: any) {
       console.error('업로드 API 오류:', error);
@@ -100,6 +101,11 @@ export const policyAPI = {
     }
   },
   
+  getJob: async (jobId: string) => {
+    const response = await api.get(`/policies/jobs/${jobId}`);
+    return response.data;
+  },
+  
   getPolicies: async (skip: number = 0, limit: number = 100) => {
     const response = await api.get(`/policies?skip=${skip}&limit=${limit}`);
     return response.data;
@@ -137,6 +143,70 @@ export const searchAPI = {
       security_level: securityLevel
     });
     return response.data;
+  },
+
+  // SSE 스트리밍 검색: 검색 결과를 먼저 받고 답변 토큰을 순서대로 수신
+  searchStream: async (
+    query: string,
+    handlers: {
+      onResults?: (results: any[]) => void;
+      onToken?: (token: string) => void;
+      // mode가 'replace'면 답변 전체를 대체, 'append'면 받은 부분 답변 뒤에 덧붙임
+      onFallback?: (answer: string, mode: 'replace' | 'append') => void;
+    },
+    policyIds?: number[],
+    limit: number = 10,
+    securityLevel: string = 'public'
+  ) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/search/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({
+        query,
+        policy_ids: policyIds,
+        limit,
+        security_level: securityLevel
+      }),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`스트리밍 검색 실패: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // 이벤트는 빈 줄(\n\n)로 구분
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let eventType = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) eventType = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+
+        if (eventType === 'results') handlers.onResults?.(payload.results);
+        else if (eventType === 'token') handlers.onToken?.(payload.content);
+        else if (eventType === 'fallback') handlers.onFallback?.(payload.content, payload.mode === 'append' ? 'append' : 'replace');
+        else if (eventType === 'error') throw new Error(payload.detail);
+      }
+    }
   }
 };
 